@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+ICS 輸出效能基準
+以合成的書籍資料比較：
+  - kobo_ical.ics_writer（CalendarManager.create_ical / ICSGenerator.generate_ics 使用的串流輸出）
+  - icalendar 物件模型（舊版 CalendarManager.create_ical 的做法）
+  - ics 物件模型（舊版 ICSGenerator.generate_ics 的做法）
+  - 串流輸出 + 已暖機的 VEVENT 片段快取（每日執行時絕大多數事件未變動的情況）
+icalendar / ics 未安裝時略過。回報每秒事件數，並以 icalendar 解析串流輸出確認內容一致。
+
+  python benchmarks/bench_ics.py --events 20000
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from datetime import date, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from kobo_ical.calendar_manager import CALNAME, PRODID, CalendarManager  # noqa: E402
+from kobo_ical.fragment_cache import FragmentCache  # noqa: E402
+from kobo_ical.ics import event_dtstamp, event_uid  # noqa: E402
+
+TITLES = ["戰爭與和平（上）", "電腦視覺入門：從原理到實作", "A;B,C\\D 特殊字元", "長" * 40, "Emoji 📚 書單"]
+
+
+def make_books(count: int):
+    """每天一本，日期互不重複（create_ical 以 (日期, 書名) 去重）"""
+    start = date(2000, 1, 1)
+    books = []
+    for i in range(count):
+        d = start + timedelta(days=i)
+        books.append({
+            "title": f"{TITLES[i % len(TITLES)]} {i}",
+            "book_url": f"https://www.kobo.com/tw/zh/ebook/bench-{i:06d}-{'x' * (i % 40)}",
+            "article_url": f"https://www.kobo.com/zh/blog/weekly-dd99-{d.isocalendar()[0]}-w{d.isocalendar()[1]}",
+            "date_obj": d,
+        })
+    return books
+
+
+def description(book) -> str:
+    return f"書名：{book['title']}\n查看電子書：{book['book_url']}\n來源文章：{book['article_url']}"
+
+
+def render_writer(books) -> bytes:
+    return CalendarManager.create_ical(books)
+
+
+def fragment_renderer(cache_path: str):
+    """使用片段快取的輸出；呼叫端先完整輸出一次填滿快取"""
+    cache = FragmentCache(cache_path)
+    return lambda books: CalendarManager.create_ical(books, cache)
+
+
+def render_icalendar(books) -> bytes:
+    from icalendar import Calendar, Event
+
+    cal = Calendar()
+    cal.add('prodid', PRODID)
+    cal.add('version', '2.0')
+    cal.add('X-WR-CALNAME', CALNAME)
+    for book in books:
+        event = Event()
+        event.add('summary', book['title'])
+        event.add('dtstart', book['date_obj'])
+        event.add('dtstamp', event_dtstamp(book['date_obj']))
+        event.add('uid', event_uid(book['book_url'], book['date_obj']))
+        event.add('description', description(book))
+        event.add('url', book['book_url'])
+        cal.add_component(event)
+    return cal.to_ical()
+
+
+def render_ics(books) -> bytes:
+    from ics import Calendar, Event
+
+    cal = Calendar()
+    cal.creator = PRODID
+    events = []
+    for book in books:
+        event = Event()
+        event.name = book['title']
+        event.begin = book['date_obj']
+        event.description = description(book)
+        event.url = book['book_url']
+        event.uid = event_uid(book['book_url'], book['date_obj'])
+        event.created = event_dtstamp(book['date_obj'])
+        event.make_all_day()
+        events.append(event)
+    cal.events = events
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return str(cal).encode("utf-8")
+
+
+def measure(render, books, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        data = render(books)
+    elapsed = (time.perf_counter() - started) / repeat
+    tracemalloc.start()
+    render(books)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return data, elapsed, peak
+
+
+def parsed_events(data: bytes):
+    from icalendar import Calendar
+
+    cal = Calendar.from_ical(data)
+    return [
+        (str(e['UID']), str(e['SUMMARY']), e.decoded('DTSTART'), e.decoded('DTSTAMP'),
+         str(e['DESCRIPTION']), str(e['URL']))
+        for e in cal.walk('VEVENT')
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ICS serialization benchmark")
+    parser.add_argument("--events", type=int, default=20000, help="number of synthetic events")
+    parser.add_argument("--repeat", type=int, default=3, help="renders per implementation")
+    args = parser.parse_args(argv)
+
+    books = make_books(args.events)
+    cache_dir = tempfile.mkdtemp(prefix="bench-ics-")
+    warm_render = fragment_renderer(f"{cache_dir}/kobo99.json")
+    warm_render(books)
+    renderers = [
+        ("ics_writer", render_writer),
+        ("ics_writer+cache", warm_render),
+        ("icalendar", render_icalendar),
+        ("ics", render_ics),
+    ]
+    outputs = {}
+    print(f"{'implementation':16} {'events/sec':>12} {'seconds':>9} {'peak KiB':>10} {'bytes':>10}")
+    for name, render in renderers:
+        try:
+            data, elapsed, peak = measure(render, books, max(1, args.repeat))
+        except ImportError:
+            print(f"{name:16} {'not installed':>12}")
+            continue
+        outputs[name] = data
+        rate = args.events / elapsed if elapsed else 0.0
+        print(f"{name:16} {rate:>12.0f} {elapsed:>9.3f} {peak / 1024:>10.0f} {len(data):>10}")
+
+    if outputs["ics_writer+cache"] != outputs["ics_writer"]:
+        print("FAIL: rendering from the fragment cache changed the output")
+        return 1
+    try:
+        expected = parsed_events(outputs["icalendar"]) if "icalendar" in outputs else None
+        actual = parsed_events(outputs["ics_writer"])
+    except ImportError:
+        print("icalendar not installed, skipping the equivalence check")
+        return 0
+    if len(actual) != args.events:
+        print(f"FAIL: parsed {len(actual)} events from ics_writer output, expected {args.events}")
+        return 1
+    if expected is not None and expected != actual:
+        print("FAIL: ics_writer output differs from the icalendar object model")
+        return 1
+    print("OK: ics_writer output parses to the same events; cached render is byte-identical")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
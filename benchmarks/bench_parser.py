@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+離線解析效能基準
+對 benchmarks/corpus/ 內保存的 weekly-dd99 文章執行：
+  - KoboCrawler.parse_weekly_article
+  - scraper.Scraper.parse_weekly_article
+  - CalendarManager.process_dates
+回報每秒頁數、各階段耗時與記憶體峰值，並與 benchmarks/baseline.json 比對：
+擷取結果有任何變動或速度低於基準容許範圍時以非零狀態結束。
+
+  python benchmarks/bench_parser.py                 # 比對基準
+  python benchmarks/bench_parser.py --update        # 重新產生基準
+  python benchmarks/bench_parser.py --import-archive  # 從 data/archive 匯入最新文章到語料庫
+"""
+
+import argparse
+import json
+import logging
+import re
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from kobo_ical.archive import HTMLArchive  # noqa: E402
+from kobo_ical.calendar_manager import CalendarManager  # noqa: E402
+from kobo_ical.config import Settings  # noqa: E402
+from kobo_ical.crawler import KoboCrawler  # noqa: E402
+from kobo_ical.parsing import make_soup, resolve_backend  # noqa: E402
+from scraper import Scraper  # noqa: E402
+
+CORPUS_DIR = ROOT / "benchmarks" / "corpus"
+BASELINE_PATH = ROOT / "benchmarks" / "baseline.json"
+BLOG_URL = "https://www.kobo.com/zh/blog"
+# 總耗時低於此秒數的階段誤差太大，不做速度比對
+MIN_TIMED_SECONDS = 0.05
+
+# 不讀寫任何快取、封存或 cookie
+OFFLINE_SETTINGS = dict(
+    http_cache_dir="",
+    archive_dir="",
+    negative_cache_path="",
+    cookie_store_path="",
+)
+
+
+def load_corpus():
+    pages = []
+    for path in sorted(CORPUS_DIR.glob("weekly-dd99-*.html")):
+        slug = path.stem
+        m = re.search(r"weekly-dd99-(\d{4})-w(\d+)", slug)
+        pages.append({
+            "slug": slug,
+            "url": f"{BLOG_URL}/{slug}",
+            "year": int(m.group(1)),
+            "week": int(m.group(2)),
+            "html": path.read_text(encoding="utf-8"),
+        })
+    return pages
+
+
+def import_archive(archive_dir: str) -> int:
+    archive = HTMLArchive(archive_dir)
+    count = 0
+    for y, w in archive.weeks():
+        url = f"{BLOG_URL}/weekly-dd99-{y}-w{w}"
+        html = archive.latest(url)
+        if html:
+            (CORPUS_DIR / f"weekly-dd99-{y}-w{w}.html").write_text(html, encoding="utf-8")
+            count += 1
+    return count
+
+
+def stage_stats(name, pages, repeat, elapsed, peak):
+    return {
+        "stage": name,
+        "seconds": round(elapsed, 4),
+        "pages_per_sec": round(len(pages) * repeat / elapsed, 1) if elapsed else 0.0,
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def measure(func, repeat):
+    """先計時 repeat 次，再另外以 tracemalloc 跑一次量記憶體峰值（避免追蹤拖慢計時）"""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    result = func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def run_stage(name, pages, func, repeat):
+    """對整個語料庫執行一個階段，回傳結果與統計"""
+    results, elapsed, peak = measure(lambda: [func(page) for page in pages], repeat)
+    return results, stage_stats(name, pages, repeat, elapsed, peak)
+
+
+def extract(pages, settings, repeat):
+    stats = []
+    with KoboCrawler(settings) as crawler, Scraper(settings, keep_raw_text=True) as scraper:
+        _, s = run_stage("tree_build", pages, lambda p: make_soup(p["html"], settings.html_parser), repeat)
+        stats.append(s)
+        crawler_books, s = run_stage(
+            "crawler.parse_weekly_article", pages,
+            lambda p: [b.to_dict() for b in crawler.parse_weekly_article(p["html"], p["url"], p["year"], p["week"])],
+            repeat,
+        )
+        stats.append(s)
+        scraper_books, s = run_stage(
+            "scraper.parse_weekly_article", pages,
+            lambda p: scraper.parse_weekly_article(p["html"], p["url"], p["year"], p["week"]),
+            repeat,
+        )
+        stats.append(s)
+
+    # process_dates 會改寫傳入的 dict，每次都給一份複本
+    raw = [dict(b) for books in scraper_books for b in books]
+    processed, elapsed, peak = measure(lambda: list(CalendarManager.process_dates([dict(b) for b in raw])), repeat)
+    stats.append(stage_stats("calendar.process_dates", pages, repeat, elapsed, peak))
+
+    books = {}
+    for page, c_books, s_books in zip(pages, crawler_books, scraper_books):
+        books[page["slug"]] = {"crawler": c_books, "scraper": s_books}
+    books["_processed"] = [{**b, "date_obj": b["date_obj"].isoformat()} for b in processed]
+    return books, stats
+
+
+def diff_books(expected, actual):
+    """回傳有差異的文章清單"""
+    changed = []
+    for slug in sorted(set(expected) | set(actual)):
+        if expected.get(slug) != actual.get(slug):
+            changed.append(slug)
+    return changed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline parser benchmark over saved weekly articles")
+    parser.add_argument("--repeat", type=int, default=20, help="passes over the corpus per stage")
+    parser.add_argument("--backend", default="auto", help="HTML parser backend (auto, lxml, html.parser)")
+    parser.add_argument("--tolerance", type=float, default=0.3,
+                        help="allowed pages/sec slowdown vs. baseline before failing (0.3 = 30%%)")
+    parser.add_argument("--update", action="store_true", help="rewrite benchmarks/baseline.json")
+    parser.add_argument("--import-archive", metavar="DIR", nargs="?", const="data/archive",
+                        help="copy the latest archived articles into the corpus first")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.CRITICAL)
+    if args.import_archive:
+        print(f"Imported {import_archive(args.import_archive)} archived articles into {CORPUS_DIR}")
+
+    pages = load_corpus()
+    if not pages:
+        print(f"No pages in {CORPUS_DIR}")
+        return 1
+    settings = Settings(html_parser=args.backend, **OFFLINE_SETTINGS)
+    backend = resolve_backend(args.backend)
+    books, stats = extract(pages, settings, max(1, args.repeat))
+
+    print(f"Corpus: {len(pages)} pages, backend: {backend}, repeat: {args.repeat}")
+    print(f"{'stage':32} {'pages/sec':>10} {'seconds':>9} {'peak KiB':>10}")
+    for s in stats:
+        print(f"{s['stage']:32} {s['pages_per_sec']:>10} {s['seconds']:>9} {s['peak_kib']:>10}")
+
+    if args.update or not BASELINE_PATH.exists():
+        baseline = {
+            "backend": backend,
+            "perf": {s["stage"]: s["pages_per_sec"] for s in stats},
+            "books": books,
+        }
+        BASELINE_PATH.write_text(json.dumps(baseline, ensure_ascii=False, indent=1, sort_keys=True) + "\n",
+                                 encoding="utf-8")
+        print(f"Baseline written to {BASELINE_PATH}")
+        return 0
+
+    baseline = json.loads(BASELINE_PATH.read_text(encoding="utf-8"))
+    failed = False
+    changed = diff_books(baseline["books"], json.loads(json.dumps(books, ensure_ascii=False)))
+    if changed:
+        failed = True
+        print(f"FAIL: extracted books changed for: {', '.join(changed)}")
+    if baseline.get("backend") == backend:
+        for s in stats:
+            base = baseline["perf"].get(s["stage"])
+            if s["seconds"] < MIN_TIMED_SECONDS:
+                continue
+            if base and s["pages_per_sec"] < base * (1 - args.tolerance):
+                failed = True
+                print(f"FAIL: {s['stage']} slowed down to {s['pages_per_sec']} pages/sec (baseline {base})")
+    else:
+        print(f"Skipping speed check: baseline was recorded with {baseline.get('backend')}")
+    if not failed:
+        print("OK: output matches baseline and speed is within tolerance")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -13,7 +13,7 @@ def debug():
     weeks = [40, 44, 48, 50] 
     year = 2025
     
-    with Scraper() as scraper:
+    with Scraper(keep_raw_text=True) as scraper:
         all_raw_books = []
         for w in weeks:
             url = f"https://www.kobo.com/zh/blog/weekly-dd99-{year}-w{w}"
@@ -28,7 +28,7 @@ def debug():
             print(f"Raw found: {len(books)}")
             
         print("\n=== Processing & Deduplicating ===")
-        processed = CalendarManager.process_dates(all_raw_books)
+        processed = list(CalendarManager.process_dates(all_raw_books))
         
         print(f"Final count: {len(processed)}")
         for b in processed:
@@ -0,0 +1,126 @@
+"""週次文章原始 HTML 的壓縮封存（以內容雜湊定址），供離線重播/重新解析"""
+import gzip
+import hashlib
+import json
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .http_cache import WEEKLY_URL_RE
+
+logger = logging.getLogger(__name__)
+
+
+def week_key(url: str) -> Optional[str]:
+    """由文章 URL 取得索引鍵，例如 2025-w49"""
+    m = WEEKLY_URL_RE.search(url)
+    if not m:
+        return None
+    return f"{int(m.group(1))}-w{int(m.group(2))}"
+
+
+class HTMLArchive:
+    """objects/<sha 前兩碼>/<sha>.html.gz 存放內容，index.json 依年/週記錄抓取歷史
+
+    每個 URL 只保留最近 max_versions 個版本（0 表示不限），較舊且不再被引用的物件一併刪除。
+    """
+
+    def __init__(self, root: str, max_versions: int = 0):
+        self.root = Path(root)
+        self.max_versions = max(0, int(max_versions))
+        self.objects = self.root / "objects"
+        self.index_path = self.root / "index.json"
+        self.objects.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.index: Dict[str, List[dict]] = self._load_index()
+
+    def _load_index(self) -> Dict[str, List[dict]]:
+        if not self.index_path.exists():
+            return {}
+        try:
+            with self.index_path.open("r", encoding="utf-8") as f:
+                return json.load(f).get("weeks", {})
+        except Exception as exc:
+            logger.warning("Failed to load archive index %s: %s", self.index_path, exc)
+            return {}
+
+    def _save_index(self) -> None:
+        tmp = self.index_path.with_suffix(".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump({"weeks": self.index}, f, ensure_ascii=False, indent=2, sort_keys=True)
+        tmp.replace(self.index_path)
+
+    def _object_path(self, sha: str) -> Path:
+        return self.objects / sha[:2] / f"{sha}.html.gz"
+
+    def put(self, url: str, html: str) -> Optional[str]:
+        """封存一份 HTML；內容與該 URL 最近一次相同時不重複記錄"""
+        key = week_key(url)
+        if key is None:
+            return None
+        data = html.encode("utf-8")
+        sha = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            path = self._object_path(sha)
+            if not path.exists():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = path.with_suffix(".tmp")
+                # mtime=0 讓相同內容產生相同的壓縮檔
+                with gzip.GzipFile(tmp, "wb", mtime=0) as f:
+                    f.write(data)
+                tmp.replace(path)
+            records = self.index.setdefault(key, [])
+            latest = next((r for r in reversed(records) if r["url"] == url), None)
+            if latest and latest["sha256"] == sha:
+                return sha
+            records.append({
+                "url": url,
+                "sha256": sha,
+                "fetched_at": datetime.now().isoformat(timespec="seconds"),
+                "size": len(data),
+            })
+            self._prune(url, records)
+            self._save_index()
+        logger.debug(f"Archived {url} as {sha[:12]}")
+        return sha
+
+    def _prune(self, url: str, records: List[dict]) -> None:
+        """只保留該 URL 最近 max_versions 筆紀錄，刪除不再被任何紀錄引用的物件"""
+        if not self.max_versions:
+            return
+        mine = [r for r in records if r["url"] == url]
+        dropped = mine[:-self.max_versions]
+        if not dropped:
+            return
+        drop_ids = {id(r) for r in dropped}
+        records[:] = [r for r in records if id(r) not in drop_ids]
+        referenced = {r["sha256"] for rs in self.index.values() for r in rs}
+        for record in dropped:
+            if record["sha256"] not in referenced:
+                self._object_path(record["sha256"]).unlink(missing_ok=True)
+        logger.debug(f"Pruned {len(dropped)} archived versions of {url}")
+
+    def get(self, sha: str) -> Optional[str]:
+        path = self._object_path(sha)
+        if not path.exists():
+            return None
+        with gzip.open(path, "rb") as f:
+            return f.read().decode("utf-8")
+
+    def latest(self, url: str) -> Optional[str]:
+        """取得該 URL 最近一次封存的 HTML"""
+        key = week_key(url)
+        for record in reversed(self.index.get(key or "", [])):
+            if record["url"] == url:
+                return self.get(record["sha256"])
+        return None
+
+    def weeks(self) -> List[Tuple[int, int]]:
+        """已封存的 (年, 週)，依時間排序"""
+        result = []
+        for key in self.index:
+            y, w = key.split("-w")
+            result.append((int(y), int(w)))
+        return sorted(result)
@@ -0,0 +1,119 @@
+"""缺漏週次回補規劃"""
+import logging
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import TYPE_CHECKING, Iterable, List, Optional, Tuple
+
+from .config import Settings
+from .crawler import KoboCrawler
+from .models import BookItem
+from .weeks import WEEKS
+
+if TYPE_CHECKING:
+    from .coverage import CoverageIndex
+    from .event_store import EventStore
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class WeekRange:
+    """同一年內連續的週次範圍（含頭尾）"""
+    year: int
+    start_week: int
+    end_week: int
+
+    @property
+    def weeks(self) -> int:
+        return self.end_week - self.start_week + 1
+
+
+@dataclass
+class BackfillReport:
+    """回補結果與節省的請求數"""
+    missing_weeks: List[Tuple[int, int]] = field(default_factory=list)
+    ranges: List[WeekRange] = field(default_factory=list)
+    books: List[BookItem] = field(default_factory=list)
+    requests_issued: int = 0
+    requests_saved: int = 0
+    skipped_negative: int = 0
+    sessions_saved: int = 0
+
+
+class BackfillPlanner:
+    """找出保留期間內缺資料的週次，合併成連續範圍後在同一個 crawler 上回補"""
+
+    def __init__(self, settings: Optional[Settings] = None):
+        self.settings = settings or Settings()
+
+    def missing_weeks(self, books: Iterable[BookItem], today: Optional[date] = None,
+                      store: Optional["EventStore"] = None,
+                      coverage: Optional["CoverageIndex"] = None) -> List[Tuple[int, int]]:
+        """保留期間內任一天沒有書籍的週次
+
+        傳入 coverage 時只檢查覆蓋索引中的缺口，books 只需包含尚未寫入的書籍；
+        傳入 store 時已入庫的日期以日期索引查詢。
+        """
+        today = today or date.today()
+        past_cutoff = today - timedelta(days=self.settings.retention_past_days)
+        present_dates = {b.date for b in books if b.date}
+        if coverage is not None:
+            return coverage.sparse_weeks(past_cutoff, today, extra=present_dates)
+        if store is not None:
+            present_dates |= store.dates(past_cutoff, today)
+        missing = set()
+        d = past_cutoff
+        while d <= today:
+            if d not in present_dates:
+                missing.add(WEEKS.week_of(d))
+            d += timedelta(days=1)
+        return sorted(missing)
+
+    @staticmethod
+    def coalesce(weeks: Iterable[Tuple[int, int]]) -> List[WeekRange]:
+        """將週次合併為同年內的連續範圍（跨年不合併，範圍內只會有該年實際存在的週次）"""
+        ranges: List[WeekRange] = []
+        for y, w in sorted(set(weeks)):
+            last = ranges[-1] if ranges else None
+            if last and last.year == y and last.end_week + 1 == w:
+                last.end_week = w
+            else:
+                ranges.append(WeekRange(y, w, w))
+        return ranges
+
+    def run(self, crawler: KoboCrawler, books: Iterable[BookItem],
+            use_random_delay: bool = False, today: Optional[date] = None,
+            store: Optional["EventStore"] = None,
+            coverage: Optional["CoverageIndex"] = None) -> BackfillReport:
+        """在既有的 crawler 上回補；本次執行已抓過的 URL 由 crawler 的記憶直接回傳"""
+        report = BackfillReport()
+        report.missing_weeks = self.missing_weeks(books, today, store, coverage)
+        report.ranges = self.coalesce(report.missing_weeks)
+        if not report.ranges:
+            logger.info("Backfill: no missing weeks")
+            return report
+
+        urls: List[str] = []
+        for r in report.ranges:
+            for url in crawler.generate_weekly_urls(r.year, r.start_week, r.year, r.end_week):
+                # 先查負向快取：已知不存在或持續失敗的週次不發請求
+                if crawler.negative_cache and crawler.negative_cache.is_blocked(url):
+                    report.skipped_negative += 1
+                    continue
+                urls.append(url)
+
+        hits_before = crawler.memo_hits
+        report.books = crawler.crawl_urls(urls, use_random_delay)
+        memo_saved = crawler.memo_hits - hits_before
+        report.requests_issued = len(urls) - memo_saved
+        report.requests_saved = memo_saved + report.skipped_negative
+        # 舊做法每個缺漏週次各開一個 crawler（新的 client 與 TLS 連線）
+        report.sessions_saved = len(report.missing_weeks)
+
+        logger.info(
+            f"Backfill: {len(report.missing_weeks)} missing weeks in {len(report.ranges)} ranges, "
+            f"{report.requests_issued} requests issued, {report.requests_saved} saved "
+            f"({report.skipped_negative} by negative cache), "
+            f"{report.sessions_saved} crawler sessions avoided, {len(report.books)} books found"
+        )
+        return report
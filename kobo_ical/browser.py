@@ -0,0 +1,194 @@
+"""403 後備路徑用的長駐 Playwright 瀏覽器池"""
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import List, Optional
+
+from utils.headers import get_random_headers
+
+from .cookies import CookieStore
+
+logger = logging.getLogger(__name__)
+
+# 只需要 DOM，不下載這些資源
+BLOCKED_RESOURCE_TYPES = {"image", "font", "media", "stylesheet"}
+
+
+class BrowserPool:
+    """延遲啟動的 Chromium：整個爬取期間共用一個瀏覽器與少量 context，並限制同時開啟的頁面數
+
+    Playwright 的物件綁定在建立它的 event loop，因此瀏覽器跑在專用的背景執行緒，
+    各爬取 worker 透過 fetch() 提交工作。
+    """
+
+    def __init__(self, max_contexts: int = 2, max_pages: int = 2,
+                 nav_timeout_seconds: float = 60.0, nav_attempts: int = 2,
+                 cookie_store: Optional[CookieStore] = None):
+        self.max_contexts = max(1, max_contexts)
+        self.max_pages = max(1, max_pages)
+        self.nav_timeout_ms = int(nav_timeout_seconds * 1000)
+        self.nav_attempts = max(1, nav_attempts)
+        self.cookie_store = cookie_store
+        self.render_times: List[float] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        # 啟動失敗的原因：本次執行不再重試啟動，之後的 fetch 直接失敗
+        self._start_error: Optional[BaseException] = None
+        self._playwright = None
+        self._browser = None
+        self._contexts = []
+        self._context_agents = {}
+        self._next_context = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @property
+    def started(self) -> bool:
+        return self._browser is not None
+
+    def _ensure_started(self) -> None:
+        with self._start_lock:
+            if self._loop is not None:
+                return
+            if self._start_error is not None:
+                raise RuntimeError(f"Playwright browser failed to start earlier: {self._start_error}")
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="kobo-browser", daemon=True)
+            thread.start()
+            try:
+                asyncio.run_coroutine_threadsafe(self._start(), loop).result()
+            except BaseException as exc:
+                if isinstance(exc, Exception):
+                    self._start_error = exc
+                    logger.error(f"Playwright browser failed to start, disabling the fallback for this run: {exc}")
+                try:
+                    asyncio.run_coroutine_threadsafe(self._stop(), loop).result()
+                except Exception:
+                    pass
+                loop.call_soon_threadsafe(loop.stop)
+                thread.join()
+                loop.close()
+                raise
+            self._loop, self._thread = loop, thread
+
+    async def _start(self) -> None:
+        from playwright.async_api import async_playwright
+
+        started = time.monotonic()
+        self._playwright = await async_playwright().start()
+        self._browser = await self._playwright.chromium.launch(headless=True)
+        self._semaphore = asyncio.Semaphore(self.max_pages)
+        for _ in range(self.max_contexts):
+            self._contexts.append(await self._new_context())
+        logger.info(f"Started Playwright browser with {self.max_contexts} contexts "
+                    f"in {time.monotonic() - started:.1f}s")
+
+    async def _new_context(self):
+        headers = get_random_headers(referer="https://www.kobo.com/zh/blog")
+        user_agent = headers.get("User-Agent", "")
+        if self.cookie_store and self.cookie_store.user_agent:
+            user_agent = self.cookie_store.user_agent
+        context = await self._browser.new_context(
+            user_agent=user_agent,
+            viewport={"width": random.randint(1280, 1920), "height": random.randint(720, 1080)},
+            device_scale_factor=random.choice([1, 2]),
+            locale="zh-TW",
+            timezone_id="Asia/Taipei",
+            color_scheme="light",
+            extra_http_headers={
+                "Accept": headers.get("Accept", ""),
+                "Accept-Language": headers.get("Accept-Language", "zh-TW,zh;q=0.9"),
+                "Referer": headers.get("Referer", "https://www.kobo.com/zh/blog"),
+            },
+        )
+        await context.add_init_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined});")
+        await context.add_init_script("Object.defineProperty(navigator, 'languages', {get: () => ['zh-TW','zh']});")
+        await context.route("**/*", self._route)
+        if self.cookie_store:
+            cookies = self.cookie_store.to_playwright()
+            if cookies:
+                await context.add_cookies(cookies)
+        self._context_agents[id(context)] = user_agent
+        return context
+
+    @staticmethod
+    async def _route(route) -> None:
+        if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def _render(self, url: str) -> Optional[str]:
+        async with self._semaphore:
+            context = self._contexts[self._next_context % len(self._contexts)]
+            self._next_context += 1
+            page = await context.new_page()
+            started = time.monotonic()
+            html = None
+            try:
+                for attempt in range(self.nav_attempts):
+                    try:
+                        await page.goto(url, wait_until="domcontentloaded", timeout=self.nav_timeout_ms)
+                        await page.wait_for_selector('a[href*="/ebook/"]', timeout=self.nav_timeout_ms)
+                        html = await page.content()
+                        if html:
+                            if self.cookie_store:
+                                self.cookie_store.update_from_playwright(
+                                    await context.cookies(), self._context_agents.get(id(context)))
+                            break
+                    except Exception as e:
+                        logger.warning(f"Playwright attempt {attempt + 1} failed for {url}: {e}")
+            finally:
+                elapsed = time.monotonic() - started
+                self.render_times.append(elapsed)
+                logger.info(f"Playwright rendered {url} in {elapsed:.1f}s ({'ok' if html else 'failed'})")
+                await page.close()
+            return html
+
+    def fetch(self, url: str) -> Optional[str]:
+        """以瀏覽器取得頁面 HTML（執行緒安全，首次呼叫時啟動瀏覽器）"""
+        self._ensure_started()
+        return asyncio.run_coroutine_threadsafe(self._render(url), self._loop).result()
+
+    async def _stop(self) -> None:
+        for context in self._contexts:
+            try:
+                await context.close()
+            except Exception:
+                pass
+        self._contexts = []
+        self._context_agents = {}
+        if self._browser is not None:
+            await self._browser.close()
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    def stats(self) -> dict:
+        count = len(self.render_times)
+        total = sum(self.render_times)
+        return {
+            "pages": count,
+            "total_seconds": round(total, 3),
+            "avg_seconds": round(total / count, 3) if count else 0.0,
+            "max_seconds": round(max(self.render_times), 3) if count else 0.0,
+        }
+
+    def close(self) -> None:
+        if self._loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._stop(), self._loop).result()
+        except Exception as e:
+            logger.warning(f"Error shutting down Playwright browser: {e}")
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+            self._loop = None
+            self._thread = None
+        if self.render_times:
+            logger.info(f"Playwright fallback stats: {self.stats()}")
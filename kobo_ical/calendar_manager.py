@@ -1,91 +1,73 @@
 """
 Calendar Manager for Kobo99
 """
+import io
 import logging
-from datetime import date
-from typing import List
+from typing import TYPE_CHECKING, BinaryIO, Iterable, Iterator, Optional
 
-from icalendar import Calendar, Event, vText, vCalAddress
-from cloudscraper import create_scraper
+from .fragment_cache import FragmentCache, fragment_key
+from .ics import event_dtstamp, event_sort_key, event_uid
+from .ics_writer import ICSWriter
+from .pipeline import dedup_stage, map_stage
+from .weeks import WEEKS
+
+if TYPE_CHECKING:
+    from .metrics import RunMetrics
 
 logger = logging.getLogger(__name__)
 
+PRODID = '-//Kobo99 Crawler//zh-TW//'
+CALNAME = 'Kobo 99 選書'
+
 class CalendarManager:
     """Manages date logic and ICS generation"""
     
     @staticmethod
-    def process_dates(books_data: List[dict]) -> List[dict]:
+    def process_dates(books_data: Iterable[dict], metrics: Optional["RunMetrics"] = None) -> Iterator[dict]:
         """
         Process raw book data to resolve year context.
-        Logic: Try to detect year transition (e.g. Dec -> Jan) within a batch.
-        But since we process week by week, strict global logic is hard.
-        
-        Local logic:
-        Each book is associated with a 'year_context' (the year in URL).
-        If book month is 1 and year_context month is 12 (approx), assume next year.
-        If book month is 12 and year_context month is 1 (approx), assume prev year.
-        
-        Actually, simpler rule provided by user:
-        "如果 URL 年份為 $Y$，內文月份為 12 月，且下一本書月份為 1 月，則該書年份自動記為 $Y+1$。"
-        This implies sequential processing.
+        Each book carries the year/week of its article URL ('year_context', 'week');
+        resolve_date maps its month/day onto that ISO week, so a Dec -> Jan
+        transition inside one weekly list needs no batch-level heuristics.
+        With metrics, time spent resolving dates is recorded as the "dates" stage.
+        Lazy: books_data is consumed as the result is iterated, and only the
+        current winner per date is held, however many weeks are crawled.
         """
-        processed = []
-        
-        # Sort by week first to ensure order? 
-        # The list usually comes in order from crawler.
-        
-        for i, book in enumerate(books_data):
-            base_year = book['year_context']
-            month = book['month']
-            day = book['day']
-            
-            final_year = base_year
-            
-            # Cross-year logic:
-            # If current book is Jan, and previous book (in same batch/week) was Dec -> Year++
-            # Since we process flat list, look at neighbors.
-            
-            # Problem: If the list is mixed weeks, we need to be careful.
-            # Assuming 'books_data' is a chronological list.
-            
-            # Simple heuristic per user requirement:
-            # If book is Jan/Feb and we seem to be in a "late year" context (e.g. week > 48), it's next year.
-            # Or if book is Dec and we are in "early year" context (week < 5), it's previous year.
-            
-            if book['week'] >= 48 and month <= 2:
-                final_year += 1
-            elif book['week'] <= 5 and month >= 11:
-                final_year -= 1
-                
-            book['date_obj'] = date(final_year, month, day)
-            processed.append(book)
-            
-        return CalendarManager.filter_duplicates(processed)
+        resolve = CalendarManager.resolve_date
+        if metrics is not None:
+            resolve = metrics.timed("dates", resolve)
+        resolved = map_stage(books_data, resolve)
+        return CalendarManager.filter_duplicates(resolved)
 
     @staticmethod
-    def filter_duplicates(books: List[dict]) -> List[dict]:
+    def resolve_date(book: dict) -> Optional[dict]:
+        """
+        Resolve the calendar date of a single book (streaming stage).
+
+        The year is the one that puts month/day closest to the article's ISO week
+        (looked up in the shared week calendar), so Dec/Jan books of a week that
+        spans New Year land in the right year. Impossible dates are dropped.
+        """
+        resolved = WEEKS.resolve_date(book['year_context'], book['week'], book['month'], book['day'])
+        if resolved is None:
+            return None
+        book['date_obj'] = resolved
+        return book
+
+    @staticmethod
+    def filter_duplicates(books: Iterable[dict]) -> Iterator[dict]:
         """
         Deduplicate books by date.
         If multiple books exist for the same date, prefer Traditional Chinese titles.
+        Only the current winner per date is kept; output is sorted by date.
         """
-        grouped = {}
-        for book in books:
-            d = book['date_obj']
-            if d not in grouped:
-                grouped[d] = []
-            grouped[d].append(book)
-            
-        final_list = []
-        for d in sorted(grouped.keys()):
-            candidates = grouped[d]
-            if len(candidates) == 1:
-                final_list.append(candidates[0])
-            else:
-                # Collision: Pick best
-                best = max(candidates, key=lambda x: CalendarManager.score_traditional(x['title']))
-                final_list.append(best)
-                
-        return final_list
+        score = CalendarManager.score_traditional
+        return dedup_stage(
+            books,
+            key=lambda b: b['date_obj'],
+            replace=lambda new, prev: score(new['title']) > score(prev['title']),
+            order=lambda b: b['date_obj'],
+        )
 
     @staticmethod
     def score_traditional(text: str) -> int:
@@ -106,16 +88,22 @@ class CalendarManager:
         return score
 
     @staticmethod
-    def create_ical(books: List[dict]) -> bytes:
-        """Generate ICS binary content using icalendar"""
-        cal = Calendar()
-        cal.add('prodid', '-//Kobo99 Crawler//zh-TW//')
-        cal.add('version', '2.0')
-        cal.add('X-WR-CALNAME', 'Kobo 99 選書')
-        
-        # Deduplicate by (Date, Title)
-        seen = set()
-        
+    def create_ical(books: Iterable[dict], fragments: Optional[FragmentCache] = None) -> bytes:
+        """Generate ICS binary content with the streaming writer"""
+        buffer = io.BytesIO()
+        CalendarManager.write_ical(books, buffer, fragments)
+        return buffer.getvalue()
+
+    @staticmethod
+    def write_ical(books: Iterable[dict], out: BinaryIO, fragments: Optional[FragmentCache] = None) -> int:
+        """
+        Stream VEVENTs into a binary file or buffer; returns the event count.
+        With a fragment cache, unchanged books reuse their serialized VEVENT
+        and only new or changed books are rendered.
+        """
+        # Deduplicate by (Date, Title), then emit in canonical order
+        # so that identical input gives a byte-identical file
+        unique = {}
         for book in books:
             b_date = book.get('date_obj')
             title = book.get('title')
@@ -123,33 +111,30 @@ class CalendarManager:
             if not b_date or not title:
                 continue
                 
-            unique_key = (b_date, title)
-            if unique_key in seen:
-                continue
-            seen.add(unique_key)
-            
-            event = Event()
-            
-            # SUMMARY: {書名}
-            event.add('summary', title)
-            
-            # DTSTART;VALUE=DATE
-            event.add('dtstart', b_date)
-            
-            # DESCRIPTION
-            # Plaintext書名：{書名}
-            # 查看電子書：{URL}
-            # 來源文章：{Blog_URL}
-            desc = f"書名：{title}\n查看電子書：{book['book_url']}\n來源文章：{book['article_url']}"
-            event.add('description', desc)
-            
-            # URL
-            event.add('url', book['book_url'])
-            
-            # UID: Stable hash
-            uid = f"kobo99-{hash(desc)}"
-            event.add('uid', uid)
-            
-            cal.add_component(event)
-            
-        return cal.to_ical()
+            unique.setdefault((b_date, title), book)
+
+        ordered = sorted(unique.values(), key=lambda b: event_sort_key(b['date_obj'], b['book_url'], b['title']))
+        if fragments is not None:
+            fragments.begin()
+        with ICSWriter(out, prodid=PRODID, calname=CALNAME, fragments=fragments) as writer:
+            for book in ordered:
+                b_date = book['date_obj']
+                title = book['title']
+                key = fragment_key(book['book_url'], b_date, title, book['article_url'])
+                if writer.cached_event(key):
+                    continue
+                # DESCRIPTION
+                # Plaintext書名：{書名}
+                # 查看電子書：{URL}
+                # 來源文章：{Blog_URL}
+                desc = f"書名：{title}\n查看電子書：{book['book_url']}\n來源文章：{book['article_url']}"
+                writer.all_day_event(
+                    uid=event_uid(book['book_url'], b_date),  # content-derived, identical across runs
+                    start=b_date,
+                    summary=title,
+                    dtstamp=event_dtstamp(b_date),
+                    description=desc,
+                    url=book['book_url'],
+                    cache_key=key,
+                )
+        return writer.count
@@ -0,0 +1,108 @@
+"""冷資料層：保留期間外的事件依年度壓縮封存，只在需要時載入"""
+import gzip
+import hashlib
+import json
+import logging
+import re
+from datetime import date
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .content_store import ContentStore
+from .extraction import product_id
+from .models import BookItem
+from .storage import Storage, write_if_changed
+
+if TYPE_CHECKING:
+    from .coverage import CoverageIndex
+
+logger = logging.getLogger(__name__)
+
+COLD_FILE = "events-{year}.json.gz"
+COLD_FILE_RE = re.compile(r'events-(\d{4})\.json\.gz$')
+
+
+def split_tiers(books: Iterable[BookItem], cutoff: date) -> Tuple[List[BookItem], List[BookItem]]:
+    """依日期分成 (熱資料, 冷資料)：cutoff 當天及之後為熱資料"""
+    hot: List[BookItem] = []
+    cold: List[BookItem] = []
+    for book in books:
+        (hot if book.date >= cutoff else cold).append(book)
+    return hot, cold
+
+
+class ColdArchive:
+    """每年一個 gzip 壓縮的 JSON 檔（與 Storage 相同格式），以商品 ID 合併更新"""
+
+    def __init__(self, directory: str, contents: Optional[ContentStore] = None):
+        self.directory = Path(directory)
+        # 有 ContentStore 時封存檔不含 content
+        self.contents = contents
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def path(self, year: int) -> Path:
+        return self.directory / COLD_FILE.format(year=year)
+
+    def years(self) -> List[int]:
+        years = []
+        for path in self.directory.iterdir():
+            m = COLD_FILE_RE.match(path.name)
+            if m:
+                years.append(int(m.group(1)))
+        return sorted(years)
+
+    def digest(self, year: int) -> Optional[str]:
+        """年度封存檔的 SHA-256（不需解壓縮），用來判斷衍生輸出是否需要重建"""
+        path = self.path(year)
+        if not path.exists():
+            return None
+        return hashlib.sha256(path.read_bytes()).hexdigest()
+
+    def load(self, year: int) -> List[BookItem]:
+        path = self.path(year)
+        if not path.exists():
+            return []
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                return [BookItem.from_dict(item, self.contents) for item in json.load(f)]
+        except Exception as exc:
+            logger.warning("Failed to load cold archive %s: %s", path, exc)
+            return []
+
+    def iter_all(self) -> Iterator[BookItem]:
+        """逐年載入全部冷資料（重新處理歷史資料時使用）"""
+        for year in self.years():
+            yield from self.load(year)
+
+    def add(self, books: Iterable[BookItem], coverage: Optional["CoverageIndex"] = None) -> int:
+        """將事件併入所屬年度：同商品 ID 以新資料取代（保留位置），回傳改寫的檔案數
+
+        傳入 coverage 時，每本移入的書籍都套用「取代的冷資料 → 移入的書籍」日期差異，
+        與封存檔是否改寫無關：熱資料端的 −1 由呼叫端對每本移出的書籍套用，兩邊必須對稱。
+        """
+        by_year: Dict[int, List[BookItem]] = {}
+        for book in books:
+            by_year.setdefault(book.date.year, []).append(book)
+        written = 0
+        with_content = self.contents is None
+        for year, new_books in sorted(by_year.items()):
+            merged: Dict[str, BookItem] = {}
+            for book in self.load(year):
+                merged[product_id(book.book_url)] = book
+            changed = False
+            for book in new_books:
+                key = product_id(book.book_url)
+                prev = merged.get(key)
+                if coverage is not None:
+                    coverage.update(before=[prev.date] if prev else [], after=[book.date])
+                if prev is None or prev.record(with_content) != book.record(with_content):
+                    merged[key] = book
+                    changed = True
+            if not changed:
+                continue
+            # mtime=0：內容相同時壓縮結果逐位元組相同
+            data = gzip.compress(Storage.dumps(merged.values(), with_content).encode("utf-8"), mtime=0)
+            if write_if_changed(self.path(year), data):
+                written += 1
+            logger.info(f"Cold archive {year}: {len(merged)} events ({len(new_books)} migrated)")
+        return written
@@ -20,23 +20,148 @@ class Settings(BaseSettings):
         description="HTTP User-Agent",
     )
     timeout_seconds: float = Field(15.0, description="單次請求逾時秒數")
-    retries: int = Field(3, description="短暫錯誤的重試次數")
+    retries: int = Field(3, description="短暫錯誤的重試次數（不含第一次請求）")
+    retry_base_seconds: float = Field(
+        2.0,
+        description="重試退避的基準秒數：第 n 次重試前在 0 到 base * 2^n 秒間隨機等待（full jitter）",
+    )
+    retry_max_seconds: float = Field(30.0, description="單次重試退避的上限秒數")
+    retry_after_max_seconds: float = Field(
+        120.0,
+        description="429/503 回應的 Retry-After 不超過此秒數時照其等待，超過則放棄該 URL",
+    )
+    circuit_breaker_failures: int = Field(
+        5,
+        description="同一主機連續失敗幾次後斷路，暫停對該主機發出請求",
+    )
+    circuit_breaker_cooldown_seconds: float = Field(
+        300.0,
+        description="斷路後暫停的秒數，之後放行試探請求",
+    )
+    run_deadline_seconds: float = Field(
+        900.0,
+        description="整次執行的網路請求期限秒數，到期後不再發出請求，已抓到的結果照常輸出；0 表示不限",
+    )
     rate_limit_seconds: float = Field(
         1.0,
-        description="連續請求間隔秒數，避免過度頻繁",
+        description="同一主機連續請求間隔秒數（token bucket 補充間隔），避免過度頻繁",
+    )
+    rate_limit_burst: int = Field(
+        2,
+        description="同一主機允許的突發請求數（token bucket 容量）",
+    )
+    crawl_concurrency: int = Field(
+        4,
+        description="同時抓取的週次頁面數，1 為循序抓取",
     )
     request_delay_seconds: float = Field(
         0.2,
-        description="頁面內多連結的解析延遲，避免太快",
+        description="（已由 rate_limit_seconds / rate_limit_burst 取代，保留以相容舊設定）",
+    )
+    html_parser: str = Field(
+        "auto",
+        description="HTML 解析後端：auto（有 lxml 就用）、lxml 或 html.parser",
     )
     data_store: str = Field(
         "data/events.json",
         description="事件持久化檔案，用於去重與狀態維護",
     )
+    event_db_path: str = Field(
+        "data/events.db",
+        description="SQLite 事件資料庫（商品 ID、日期、週次索引），data_store 改由此匯出；空字串時直接讀寫 data_store JSON",
+    )
+    event_log: bool = Field(
+        False,
+        description="不使用 SQLite 時，data_store 改為快照 + 追加式 JSONL 日誌，每次只寫入變動的書籍",
+    )
+    event_log_compact_records: int = Field(
+        500,
+        description="日誌累積超過此筆數時壓實成新的 data_store 快照",
+    )
+    content_store_path: str = Field(
+        "data/content.db",
+        description="書籍 content 的壓縮儲存（以商品 ID 為鍵，讀取時才載入），空字串時 content 直接寫在事件資料中",
+    )
+    coverage_path: str = Field(
+        "data/coverage.json",
+        description="每日覆蓋索引（有書日期的區間集合），回補缺漏週次與 --coverage 使用，空字串時每次由書籍日期重新計算",
+    )
+    cold_dir: str = Field(
+        "data/cold",
+        description="冷資料目錄：早於保留期間的事件自動移入年度壓縮檔（events-YYYY.json.gz），空字串時全部留在熱資料",
+    )
+    browser_max_contexts: int = Field(
+        2,
+        description="Playwright 後備瀏覽器保留的 context 數",
+    )
+    browser_max_pages: int = Field(
+        2,
+        description="Playwright 後備瀏覽器同時開啟的頁面上限",
+    )
+    browser_nav_timeout_seconds: float = Field(
+        60.0,
+        description="Playwright 單次頁面導覽逾時秒數",
+    )
+    browser_nav_attempts: int = Field(
+        2,
+        description="Playwright 每個 URL 的導覽嘗試次數",
+    )
+    cookie_store_path: str = Field(
+        "data/cookies.json",
+        description="共用的持久化 cookie 檔（保存 Cloudflare cf_clearance 與對應 User-Agent），空字串停用",
+    )
+    http_cache_dir: str = Field(
+        "data/http_cache",
+        description="週次文章 HTTP 快取目錄（保存 ETag / Last-Modified 與解析結果），空字串停用",
+    )
+    http_cache_immutable_weeks: int = Field(
+        4,
+        description="超過此週數的文章視為不再變動，直接使用快取不連網；0 表示一律重新驗證",
+    )
+    negative_cache_path: str = Field(
+        "data/negative_cache.json",
+        description="不存在、解析為空或反覆失敗的週次 URL 紀錄，空字串停用",
+    )
+    negative_cache_base_hours: float = Field(
+        6.0,
+        description="負向結果首次暫停探測的時數，之後每次失敗加倍",
+    )
+    negative_cache_max_days: float = Field(
+        30.0,
+        description="負向結果暫停探測的上限天數",
+    )
+    archive_dir: str = Field(
+        "data/archive",
+        description="原始 HTML 壓縮封存目錄（以內容雜湊定址），只封存解析出書籍的頁面；空字串停用",
+    )
+    archive_max_versions: int = Field(
+        3,
+        description="每個 URL 保留的封存版本數（頁面帶有每次請求不同的 token，內容常有細微差異），0 表示不限",
+    )
+    replay: bool = Field(
+        False,
+        description="離線重播模式：只從 HTML 封存重新解析，不發出任何網路請求",
+    )
     ics_path: str = Field(
         "data/kobo-99.ics",
         description="ICS 匯出檔案路徑（可作為靜態快取）",
     )
+    ics_fragment_dir: str = Field(
+        "data/ics_fragments",
+        description="各 feed 已序列化 VEVENT 區塊的快取目錄（與 events.json 放在一起），空字串停用",
+    )
+    feed_dir: str = Field(
+        "data/feeds",
+        description="分片 feed 輸出目錄（近期 feed、各年度封存 feed 與 index.json），空字串停用",
+    )
+    upcoming_past_days: int = Field(
+        14,
+        description="近期 feed 包含過去幾天的事件",
+    )
+    upcoming_future_days: int = Field(
+        30,
+        description="近期 feed 包含未來幾天的事件",
+    )
     retention_past_days: int = Field(
         180,
         description="保留過去事件天數",
@@ -56,6 +181,24 @@ class Settings(BaseSettings):
         description="清理後資料輸出 JSON 路徑",
     )
 
+    # 執行指標
+    run_report_path: str = Field(
+        "data/run_report.json",
+        description="每次執行的指標報告（各階段耗時、請求狀態碼、下載量、重試與退避、每篇文章書籍數），空字串停用",
+    )
+    metrics_textfile_path: str = Field(
+        "",
+        description="同一份指標的 Prometheus textfile（供 node_exporter textfile collector 讀取），空字串停用",
+    )
+    profile: bool = Field(
+        False,
+        description="剖析模式：每個管線階段收集 cProfile、tracemalloc 配置快照與 RSS（main.py --profile 亦可開啟）",
+    )
+    profile_dir: str = Field(
+        "data/profiles",
+        description="剖析結果目錄，每次執行建立一個帶時間戳的子目錄",
+    )
+
     model_config = {
         "env_prefix": "KOBO99_",
         "env_file": ".env",
@@ -0,0 +1,65 @@
+"""書籍 content 的壓縮 blob 儲存：以商品 ID 為鍵，讀取時才載入"""
+import logging
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+from typing import Iterable
+
+from .extraction import product_id
+from .models import BookItem
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS contents (
+    product_id TEXT PRIMARY KEY,
+    data BLOB NOT NULL
+);
+"""
+
+
+class ContentStore:
+    """SQLite 中以 zlib 壓縮的 content；BookItem 只在讀取 content 時查詢"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # 延後載入可能發生在建立者以外的執行緒，以鎖保護單一連線
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
+
+    def get(self, book_url: str) -> str:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT data FROM contents WHERE product_id = ?", (product_id(book_url),)).fetchone()
+        return zlib.decompress(row[0]).decode("utf-8") if row else ""
+
+    def put_many(self, books: Iterable[BookItem]) -> int:
+        """寫入已在記憶體中的 content（尚未載入的項目本來就在庫內）；回傳實際寫入的筆數"""
+        written = 0
+        with self._lock, self.conn:
+            for book in books:
+                if not book.content_loaded:
+                    continue
+                if not book.content:
+                    written += self.conn.execute(
+                        "DELETE FROM contents WHERE product_id = ?", (product_id(book.book_url),)).rowcount
+                    continue
+                data = zlib.compress(book.content.encode("utf-8"), 9)
+                written += self.conn.execute(
+                    "INSERT INTO contents (product_id, data) VALUES (?, ?) "
+                    "ON CONFLICT(product_id) DO UPDATE SET data = excluded.data "
+                    "WHERE contents.data IS NOT excluded.data",
+                    (product_id(book.book_url), data),
+                ).rowcount
+        if written:
+            logger.info(f"Stored {written} book contents in {self.path}")
+        return written
@@ -0,0 +1,174 @@
+"""跨請求、跨執行共用的持久化 cookie 儲存（保存 Cloudflare cf_clearance）"""
+import json
+import logging
+import threading
+import time
+from http.cookiejar import Cookie, CookieJar
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CLEARANCE_COOKIE = "cf_clearance"
+
+
+def _make_cookie(c: dict) -> Cookie:
+    domain = c.get("domain", "")
+    expires = c.get("expires")
+    return Cookie(
+        version=0,
+        name=c["name"],
+        value=c["value"],
+        port=None,
+        port_specified=False,
+        domain=domain,
+        domain_specified=bool(domain),
+        domain_initial_dot=domain.startswith("."),
+        path=c.get("path") or "/",
+        path_specified=True,
+        secure=bool(c.get("secure", False)),
+        expires=int(expires) if expires else None,
+        discard=not expires,
+        comment=None,
+        comment_url=None,
+        rest={"HttpOnly": None} if c.get("http_only") else {},
+    )
+
+
+class CookieStore:
+    """檔案型 cookie 儲存；只保存有到期時間的 cookie，並記錄取得 cf_clearance 時的 User-Agent
+
+    cf_clearance 與 User-Agent 綁定，重用時必須送出相同的 User-Agent。
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.user_agent: str = ""
+        self._cookies: dict = {}
+        self._load()
+
+    @staticmethod
+    def _key(c: dict) -> str:
+        return f"{c.get('domain', '')}|{c.get('path') or '/'}|{c['name']}"
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        try:
+            with self.path.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as exc:
+            logger.warning("Failed to load cookie store %s: %s", self.path, exc)
+            return
+        self.user_agent = data.get("user_agent", "")
+        for c in data.get("cookies", []):
+            self._cookies[self._key(c)] = c
+        self._purge_expired()
+
+    def _save(self) -> None:
+        tmp = self.path.with_suffix(".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(
+                {"user_agent": self.user_agent, "cookies": sorted(self._cookies.values(), key=self._key)},
+                f, ensure_ascii=False, indent=2,
+            )
+        tmp.replace(self.path)
+
+    def _purge_expired(self, now: Optional[float] = None) -> bool:
+        now = now or time.time()
+        expired = [k for k, c in self._cookies.items() if c.get("expires") and c["expires"] <= now]
+        for k in expired:
+            del self._cookies[k]
+        if expired and not self.has_clearance():
+            self.user_agent = ""
+        return bool(expired)
+
+    def cookies(self) -> List[dict]:
+        """目前未過期的 cookie"""
+        with self._lock:
+            if self._purge_expired():
+                self._save()
+            return list(self._cookies.values())
+
+    def has_clearance(self) -> bool:
+        return any(c["name"] == CLEARANCE_COOKIE for c in self._cookies.values())
+
+    def update(self, cookies: Iterable[dict], user_agent: Optional[str] = None) -> None:
+        """合併新 cookie；取得新的 cf_clearance 時一併記錄當時的 User-Agent"""
+        now = time.time()
+        with self._lock:
+            changed = False
+            for c in cookies:
+                if not c.get("expires") or c["expires"] <= now:
+                    continue
+                key = self._key(c)
+                prev = self._cookies.get(key)
+                if prev and prev["value"] == c["value"] and prev.get("expires") == c.get("expires"):
+                    continue
+                self._cookies[key] = c
+                changed = True
+                if c["name"] == CLEARANCE_COOKIE and user_agent:
+                    self.user_agent = user_agent
+                    logger.info(f"Stored new {CLEARANCE_COOKIE} for {c.get('domain', '')}")
+            if changed:
+                self._save()
+
+    # ------------------------
+    # 各抓取後端的轉換
+    # ------------------------
+    def apply_to_jar(self, jar: CookieJar) -> None:
+        """寫入 http.cookiejar（httpx 的 client.cookies.jar、requests/cloudscraper 的 session.cookies）"""
+        for c in self.cookies():
+            jar.set_cookie(_make_cookie(c))
+
+    def update_from_jar(self, jar: CookieJar, user_agent: Optional[str] = None) -> None:
+        self.update(
+            [
+                {
+                    "name": c.name,
+                    "value": c.value,
+                    "domain": c.domain,
+                    "path": c.path,
+                    "expires": c.expires,
+                    "secure": c.secure,
+                    "http_only": c.has_nonstandard_attr("HttpOnly"),
+                }
+                for c in list(jar)
+            ],
+            user_agent,
+        )
+
+    def to_playwright(self) -> List[dict]:
+        return [
+            {
+                "name": c["name"],
+                "value": c["value"],
+                "domain": c["domain"],
+                "path": c.get("path") or "/",
+                "expires": c["expires"],
+                "secure": bool(c.get("secure", False)),
+                "httpOnly": bool(c.get("http_only", False)),
+            }
+            for c in self.cookies()
+            if c.get("domain")
+        ]
+
+    def update_from_playwright(self, cookies: Iterable[dict], user_agent: Optional[str] = None) -> None:
+        self.update(
+            [
+                {
+                    "name": c["name"],
+                    "value": c["value"],
+                    "domain": c.get("domain", ""),
+                    "path": c.get("path", "/"),
+                    # Playwright 以 -1 表示 session cookie
+                    "expires": c["expires"] if c.get("expires", -1) > 0 else None,
+                    "secure": c.get("secure", False),
+                    "http_only": c.get("httpOnly", False),
+                }
+                for c in cookies
+            ],
+            user_agent,
+        )
@@ -0,0 +1,181 @@
+"""每日覆蓋索引：哪些日期已有書籍，以區間集合保存並隨資料寫入遞增更新"""
+import bisect
+import json
+import logging
+from collections import Counter
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .storage import write_if_changed
+from .weeks import WEEKS, YearWeek
+
+logger = logging.getLogger(__name__)
+
+COVERAGE_FORMAT = "coverage:v1"
+
+DayRange = Tuple[date, date]
+
+
+class CoverageIndex:
+    """每日書籍數與「至少有一本」的日期區間
+
+    區間以 ordinal 排序保存，查詢缺口只需二分搜尋加上逐一列出缺口，與資料量無關。
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.counts: Dict[int, int] = {}
+        # 互不相鄰的已覆蓋區間 [start, end]（ordinal，含頭尾），依起點排序
+        self._starts: List[int] = []
+        self._ends: List[int] = []
+        self.exists = self._load()
+
+    # ------------------------
+    # 持久化
+    # ------------------------
+    def _load(self) -> bool:
+        if not self.path.exists():
+            return False
+        try:
+            with self.path.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("format") != COVERAGE_FORMAT:
+                return False
+            self.counts = {date.fromisoformat(d).toordinal(): n for d, n in data["counts"].items()}
+            for start, end in data["intervals"]:
+                self._starts.append(date.fromisoformat(start).toordinal())
+                self._ends.append(date.fromisoformat(end).toordinal())
+            return True
+        except Exception as exc:
+            logger.warning("Failed to load coverage index %s: %s", self.path, exc)
+            self.counts, self._starts, self._ends = {}, [], []
+            return False
+
+    def save(self) -> bool:
+        data = {
+            "format": COVERAGE_FORMAT,
+            "counts": {date.fromordinal(o).isoformat(): n for o, n in sorted(self.counts.items())},
+            "intervals": [[date.fromordinal(s).isoformat(), date.fromordinal(e).isoformat()]
+                          for s, e in zip(self._starts, self._ends)],
+        }
+        self.exists = True
+        return write_if_changed(self.path, json.dumps(data, indent=1) + "\n")
+
+    # ------------------------
+    # 更新
+    # ------------------------
+    def rebuild(self, dates: Iterable[date]) -> None:
+        """由全部書籍日期重建（索引檔不存在時使用一次）"""
+        self.counts, self._starts, self._ends = {}, [], []
+        self.update(after=dates)
+
+    def update(self, before: Iterable[date] = (), after: Iterable[date] = ()) -> int:
+        """套用一次寫入前後的書籍日期差異（多重集合），回傳覆蓋狀態改變的天數"""
+        delta = Counter(d.toordinal() for d in after if d)
+        delta.subtract(d.toordinal() for d in before if d)
+        changed = 0
+        for o, n in delta.items():
+            if n == 0:
+                continue
+            old = self.counts.get(o, 0)
+            new = max(0, old + n)
+            if new:
+                self.counts[o] = new
+            else:
+                self.counts.pop(o, None)
+            if (old > 0) != (new > 0):
+                (self._cover if new else self._uncover)(o)
+                changed += 1
+        return changed
+
+    def _cover(self, o: int) -> None:
+        i = bisect.bisect_right(self._starts, o)
+        joins_left = i > 0 and self._ends[i - 1] == o - 1
+        joins_right = i < len(self._starts) and self._starts[i] == o + 1
+        if joins_left and joins_right:
+            self._ends[i - 1] = self._ends[i]
+            del self._starts[i], self._ends[i]
+        elif joins_left:
+            self._ends[i - 1] = o
+        elif joins_right:
+            self._starts[i] = o
+        else:
+            self._starts.insert(i, o)
+            self._ends.insert(i, o)
+
+    def _uncover(self, o: int) -> None:
+        i = bisect.bisect_right(self._starts, o) - 1
+        start, end = self._starts[i], self._ends[i]
+        if start == end:
+            del self._starts[i], self._ends[i]
+        elif o == start:
+            self._starts[i] = o + 1
+        elif o == end:
+            self._ends[i] = o - 1
+        else:
+            self._ends[i] = o - 1
+            self._starts.insert(i + 1, o + 1)
+            self._ends.insert(i + 1, end)
+
+    # ------------------------
+    # 查詢
+    # ------------------------
+    def is_covered(self, d: date) -> bool:
+        return d.toordinal() in self.counts
+
+    def gaps(self, start: date, end: date) -> List[DayRange]:
+        """start..end（含）之間沒有任何書籍的日期區間"""
+        lo, hi = start.toordinal(), end.toordinal()
+        result: List[DayRange] = []
+        cursor = lo
+        i = max(0, bisect.bisect_right(self._starts, lo) - 1)
+        while cursor <= hi and i < len(self._starts):
+            s, e = self._starts[i], self._ends[i]
+            if e < cursor:
+                i += 1
+                continue
+            if s > hi:
+                break
+            if s > cursor:
+                result.append((date.fromordinal(cursor), date.fromordinal(s - 1)))
+            cursor = e + 1
+            i += 1
+        if cursor <= hi:
+            result.append((date.fromordinal(cursor), date.fromordinal(hi)))
+        return result
+
+    def sparse_weeks(self, start: date, end: date, min_days: int = 7,
+                     extra: Optional[Set[date]] = None) -> List[YearWeek]:
+        """start..end 內有書日期少於 min_days 的 ISO 週（週在範圍邊緣時以範圍內的天數為上限）
+
+        只檢查與缺口重疊的週；extra 為尚未寫入索引、但視為已覆蓋的日期。
+        """
+        uncovered: Counter = Counter()
+        for gap_start, gap_end in self.gaps(start, end):
+            d = gap_start
+            while d <= gap_end:
+                if not extra or d not in extra:
+                    uncovered[WEEKS.week_of(d)] += 1
+                d += timedelta(days=1)
+        sparse = []
+        for week in sorted(uncovered):
+            week_start, week_end = WEEKS.week_range(*week)
+            days_in_range = (min(week_end, end) - max(week_start, start)).days + 1
+            if days_in_range - uncovered[week] < min(min_days, days_in_range):
+                sparse.append(week)
+        return sparse
+
+    def summary(self, start: date, end: date, min_days: int = 7) -> dict:
+        """覆蓋狀況摘要（--coverage 與執行紀錄使用）"""
+        gaps = self.gaps(start, end)
+        total = (end - start).days + 1
+        missing = sum((e - s).days + 1 for s, e in gaps)
+        return {
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "days": total,
+            "covered_days": total - missing,
+            "gaps": [[s.isoformat(), e.isoformat()] for s, e in gaps],
+            "sparse_weeks": [f"{y}-W{w:02d}" for y, w in self.sparse_weeks(start, end, min_days)],
+        }
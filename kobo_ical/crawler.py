@@ -2,27 +2,122 @@
 import logging
 import random
 import re
+import threading
 import time
+from concurrent.futures import Future, InvalidStateError
 from datetime import date, datetime, timedelta
-from typing import List, Optional
-from urllib.parse import urljoin
+from typing import Dict, Iterable, Iterator, List, Optional
 
 import httpx
 from bs4 import BeautifulSoup
 
+from .archive import HTMLArchive
+from .browser import BrowserPool
 from .config import Settings
+from .cookies import CookieStore
+from .http_cache import HTTPCache
+from .metrics import RunMetrics
 from .models import BookItem
+from .negative_cache import EMPTY, FAILED, NOT_FOUND, NegativeCache
+from .extraction import (
+    BRACKET_TITLE_RE,
+    ELEMENT_DATE_RE,
+    PLACEHOLDER_TITLE_RE,
+    PRICE_RE,
+    TITLE_SELECTORS,
+    URL_RE,
+    DocumentIndex,
+    LinkInfo,
+    align_titles,
+    book_elements,
+    canonical_book_url,
+    norm_title,
+)
+from .extraction import title_date_map as extract_title_dates
+from .parsing import article_scope, make_soup
+from .pipeline import WeekJob, fetch_stage, parse_stage, week_jobs
+from .ratelimit import HostRateLimiter
+from .retry import RETRY_AFTER_STATUSES, RetryPolicy, is_retryable, parse_retry_after
+from .weeks import WEEKS, weekly_url
 from utils.headers import get_random_headers, shuffle_headers_order
 
 logger = logging.getLogger(__name__)
 
+WEEKLY_URL_RE = re.compile(r'weekly-dd99-(\d{4})-w(\d+)')
+W49_URL_RE = re.compile(r'weekly-dd99-2025-w49')
+ARTICLE_DATE_PATTERNS = (
+    re.compile(r'(\d{4})[年\-/](\d{1,2})[月\-/](\d{1,2})[日]?'),
+    re.compile(r'(\d{4})-(\d{2})-(\d{2})'),
+)
+ARTICLE_DATE_SELECTORS = ['time[datetime]', '.date', '.published-date', '[class*="date"]', '[class*="Date"]']
+
+# 解析結果快取的版本標記；解析邏輯改變輸出時需遞增
+PARSE_CACHE_KEY = "crawler:v2"
+
+
+class ClaimReleased(Exception):
+    """URL 的登記者提前停止而釋放了登記；等待同一結果的呼叫端應自行重新抓取"""
+
+
+def _settle(future: Future, books: Optional[List[BookItem]] = None,
+            exc: Optional[BaseException] = None) -> None:
+    """設定登記的結果；已被釋放（先一步設為 ClaimReleased）時略過"""
+    try:
+        if exc is not None:
+            future.set_exception(exc)
+        else:
+            future.set_result(books)
+    except InvalidStateError:
+        pass
+
+
 class KoboCrawler:
     """Kobo 99 元書單爬蟲（支援 Cloudflare 繞過）"""
 
-    def __init__(self, settings: Optional[Settings] = None):
+    def __init__(self, settings: Optional[Settings] = None, metrics: Optional[RunMetrics] = None):
         self.settings = settings or Settings()
-        self.max_retries = 5
+        # 本次執行的指標（請求數、下載量、重試、各階段耗時），由呼叫端彙整輸出
+        self.metrics = metrics or RunMetrics("crawler")
+        # 退避、Retry-After、每主機斷路器與整次執行的期限
+        self.retry = RetryPolicy.from_settings(self.settings)
         self.use_playwright_fallback = True
+        # 跨執行保存的 cookie（含 cf_clearance），由 httpx 與瀏覽器共用
+        self.cookie_store = None
+        if self.settings.cookie_store_path and not self.settings.replay:
+            self.cookie_store = CookieStore(self.settings.cookie_store_path)
+        # 403 後備用的瀏覽器池，第一次需要時才啟動
+        self.browser_pool = BrowserPool(
+            max_contexts=self.settings.browser_max_contexts,
+            max_pages=self.settings.browser_max_pages,
+            nav_timeout_seconds=self.settings.browser_nav_timeout_seconds,
+            nav_attempts=self.settings.browser_nav_attempts,
+            cookie_store=self.cookie_store,
+        )
+        self.rate_limiter = HostRateLimiter(
+            self.settings.rate_limit_seconds,
+            self.settings.rate_limit_burst,
+        )
+        self.replay = self.settings.replay
+        self.archive = HTMLArchive(self.settings.archive_dir, self.settings.archive_max_versions) if self.settings.archive_dir else None
+        if self.replay and not self.archive:
+            raise ValueError("Replay mode requires archive_dir")
+        # 單次執行內的 single-flight 記憶：同一 URL 只請求一次
+        self._memo: Dict[str, Future] = {}
+        self._memo_lock = threading.Lock()
+        self.memo_hits = 0
+        self.http_cache = None
+        if self.settings.http_cache_dir and not self.replay:
+            self.http_cache = HTTPCache(
+                self.settings.http_cache_dir,
+                self.settings.http_cache_immutable_weeks,
+            )
+        self.negative_cache = None
+        if self.settings.negative_cache_path and not self.replay:
+            self.negative_cache = NegativeCache(
+                self.settings.negative_cache_path,
+                self.settings.negative_cache_base_hours,
+                self.settings.negative_cache_max_days,
+            )
 
         # 初始化 httpx client（使用 HTTP2）
         try:
@@ -38,11 +133,14 @@ class KoboCrawler:
                 timeout=30.0,
                 follow_redirects=True,
             )
+        if self.cookie_store:
+            self.cookie_store.apply_to_jar(self.client.cookies.jar)
 
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
+        self.browser_pool.close()
         self.client.close()
 
     # ------------------------
@@ -67,7 +165,9 @@ class KoboCrawler:
     # 解析單篇文章書籍
     # ------------------------
     def parse_weekly_article(self, html: str, article_url: str, year: int, week: int) -> List[BookItem]:
-        soup = BeautifulSoup(html, "html.parser")
+        soup = make_soup(html, self.settings.html_parser)
+        # 書單連結與日期只在文章內文容器中尋找
+        scope = article_scope(soup)
         books = []
 
         article_date = self.parse_article_date(soup, article_url)
@@ -85,146 +185,86 @@ class KoboCrawler:
             if title_tag:
                 article_title = title_tag.get_text(strip=True)
 
-        ebook_links = soup.find_all('a', href=re.compile(r'/ebook/'))
-        if not ebook_links:
+        # 單次走訪：建立文字序列、各元素的文字範圍與 ebook 連結
+        index = DocumentIndex(scope)
+        if not index.links:
             logger.warning(f"No ebook links found in article: {article_url}")
             return books
 
-        def norm_title(t: str) -> str:
-            t = (t or "").strip()
-            t = re.sub(r'[《》「」『』【】\[\]]', '', t)
-            t = re.sub(r'\s+', ' ', t)
-            return t
-
-        def build_title_date_map() -> tuple[dict, list[tuple[str, date]]]:
-            txt = soup.get_text("\n", strip=True)
-            y = year
-            m = re.search(r"weekly-dd99-(\d{4})-w", article_url)
-            if m:
-                y = int(m.group(1))
-            patterns = [
-                re.compile(r"(\d{1,2})\/(\d{1,2})\s*週[一二三四五六日]\s*(?:Kobo\s*99\s*選書|Kobo99選書)：[『「《]?(.*?)[』」》]?", re.MULTILINE),
-                re.compile(r"(\d{1,2})\/(\d{1,2})\s*(?:週[一二三四五六日])\s*[^\n]*?[『「《]?(.*?)[』」》]?", re.MULTILINE),
-            ]
-            mapping = {}
-            ordered: list[tuple[str, date]] = []
-            for pat in patterns:
-                for mm, dd, tt in pat.findall(txt):
-                    try:
-                        d = date(y, int(mm), int(dd))
-                        tnorm = norm_title(tt)
-                        if tnorm not in mapping:
-                            mapping[tnorm] = d
-                            ordered.append((tnorm, d))
-                    except Exception:
-                        continue
-            return mapping, ordered
-
-        title_date_map, title_date_list = build_title_date_map()
-
-        elements = []
-        seen_products = set()
-        for link_elem in ebook_links:
-            href = link_elem.get('href', '')
-            if not href:
-                continue
-            m_id = re.search(r"/ebook/([^?#/]+)", href)
-            product_id = m_id.group(1) if m_id else href
-            if product_id in seen_products:
-                continue
-            seen_products.add(product_id)
-            parent = link_elem.find_parent(['div', 'article', 'section', 'li', 'p'])
-            if parent and parent not in elements:
-                elements.append(parent)
+        with self.metrics.stage("dates"):
+            title_date_map, title_date_list = extract_title_dates(index.text(scope, "\n"), year, week, article_url)
 
-        link_infos = []
-        for idx, elem in enumerate(elements):
+        link_infos: List[LinkInfo] = []
+        for idx, elem in enumerate(book_elements(index)):
             try:
-                link_elem = elem.find('a', href=re.compile(r'/ebook/'))
+                link_elem = index.first_link(elem)
                 if not link_elem:
                     continue
-                title = link_elem.get_text(strip=True)
+                title = index.text(link_elem)
                 if not title or len(title) < 2:
-                    title_selectors = ['h2', 'h3', 'h4', 'h5', '[class*="title"]', '[class*="Title"]']
-                    for sel in title_selectors:
+                    for sel in TITLE_SELECTORS:
                         t_elem = elem.select_one(sel)
                         if t_elem:
-                            t_text = t_elem.get_text(strip=True)
+                            t_text = index.text(t_elem)
                             if t_text and len(t_text) > 2:
                                 title = t_text
                                 break
                 if not title or len(title) < 2:
                     title = link_elem.get('title', '') or link_elem.get('aria-label', '')
                 title = self.clean_summary(title)
-                if not title or re.fullmatch(r'(查看電子書（HK）|查看電子書|閱讀電子書|電子書)', title):
+                if not title or PLACEHOLDER_TITLE_RE.fullmatch(title):
                     continue
                 href = link_elem.get('href', '')
                 if not href:
                     continue
-                book_url = urljoin('https://www.kobo.com', href)
-                book_url = re.sub(r'https://www\\.kobo\\.com/hk/zh/ebook/', 'https://www.kobo.com/tw/zh/ebook/', book_url)
-                book_url = re.sub(r'https://www\\.kobo\\.com/zh/ebook/', 'https://www.kobo.com/tw/zh/ebook/', book_url)
-                try:
-                    from urllib.parse import urlsplit
-                    path = urlsplit(book_url).path
-                    mprod = re.search(r'/ebook/([^/]+)', path)
-                    if mprod:
-                        book_url = f"https://www.kobo.com/tw/zh/ebook/{mprod.group(1)}"
-                except Exception:
-                    pass
-                raw_text = elem.get_text(" ", strip=True)
-                raw_text = re.sub(r'https?://\S+', '', raw_text)
-                raw_text = re.sub(r'99元|NT\$?\s*99|HK\$?\s*99|購買|查看電子書（HK）|查看電子書', '', raw_text)
+                book_url = canonical_book_url(href)
+                raw_text = URL_RE.sub('', index.text(elem, " "))
+                raw_text = PRICE_RE.sub('', raw_text)
                 content = raw_text.strip()
                 if len(content) > 400:
                     content = content[:380] + '…'
                 if (not title) or len(title.strip()) < 2:
-                    mtt = re.search(r'[《「『【](.*?)[》」』】]', raw_text)
+                    mtt = BRACKET_TITLE_RE.search(raw_text)
                     if mtt:
                         title = mtt.group(1).strip()
                 # 從元素文字解析日期（優先使用）
-                md = re.search(r'(\d{1,2})/(\d{1,2})\s*週[一二三四五六日]', raw_text)
+                md = ELEMENT_DATE_RE.search(raw_text)
                 elem_date = None
                 if md:
-                    try:
-                        mm, dd = int(md.group(1)), int(md.group(2))
-                        elem_date = date(year, mm, dd)
-                    except Exception:
-                        elem_date = None
+                    elem_date = WEEKS.resolve_date(year, week, int(md.group(1)), int(md.group(2)))
                 link_infos.append((norm_title(title), title.strip(), book_url, content, elem_date))
             except Exception as e:
                 logger.warning(f"Error parsing book element {idx}: {e}")
                 continue
 
-        def canon(s: str) -> str:
-            s = (s or '').lower()
-            s = re.sub(r'[《》「」『』【】\[\]（）()：:，,。!！？、\-–—\s]+', '', s)
-            return s
-
-        tnorm_to_link = {}
+        tnorm_to_link = align_titles(link_infos, title_date_map)
         used = set()
-        for nt, t, u, c, ed in link_infos:
-            for key in title_date_map.keys():
-                if canon(nt) == canon(key):
-                    tnorm_to_link[key] = (t, u, c, ed)
-                    break
+        next_pos = 0
+
+        def next_unused() -> Optional[tuple]:
+            # used 只增不減，已略過的連結之後也不會再被選中
+            nonlocal next_pos
+            while next_pos < len(link_infos) and link_infos[next_pos][2] in used:
+                next_pos += 1
+            if next_pos >= len(link_infos):
+                return None
+            _, t, u, c, ed = link_infos[next_pos]
+            return t, u, c, ed
 
+        is_w49 = W49_URL_RE.search(article_url) is not None
         per_date_cnt = {}
         # 先按文章列出的日期順序建立
         for i, (tnorm, dval) in enumerate(title_date_list):
             info = tnorm_to_link.get(tnorm)
             if not info:
                 # 找不到對應標題時，從剩餘 link 取一個
-                for nt, t, u, c, ed in link_infos:
-                    if u not in used:
-                        info = (t, u, c, ed)
-                        break
+                info = next_unused()
             if not info:
                 continue
             t, u, c, ed = info
             used.add(u)
             final_date = dval or ed
-            if re.search(r'weekly-dd99-2025-w49', article_url) and not ed:
+            if is_w49 and not ed:
                 final_date = date(2025,12,4) + timedelta(days=i)
             cnt = per_date_cnt.get(final_date, 0)
             if cnt >= 2:
@@ -250,11 +290,7 @@ class KoboCrawler:
                 if per_date_cnt.get(dval, 0) < 2:
                     fallback_dates.append(dval)
             for dval in fallback_dates:
-                info = None
-                for nt, t, u, c, ed in link_infos:
-                    if u not in used:
-                        info = (t, u, c, ed)
-                        break
+                info = next_unused()
                 if not info:
                     break
                 t, u, c, ed = info
@@ -279,22 +315,13 @@ class KoboCrawler:
         return books
 
     def get_current_week_info(self) -> tuple[int, int]:
-        today = date.today()
-        y, w, _ = today.isocalendar()
-        return int(y), int(w)
+        return WEEKS.week_of(date.today())
 
     # ------------------------
     # 從文章或 URL 解析日期
     # ------------------------
     def parse_article_date(self, soup: BeautifulSoup, article_url: str) -> Optional[date]:
-        date_patterns = [
-            r'(\d{4})[年\-/](\d{1,2})[月\-/](\d{1,2})[日]?',
-            r'(\d{4})-(\d{2})-(\d{2})',
-        ]
-        date_selectors = [
-            'time[datetime]', '.date', '.published-date', '[class*="date"]', '[class*="Date"]'
-        ]
-        for sel in date_selectors:
+        for sel in ARTICLE_DATE_SELECTORS:
             elems = soup.select(sel)
             for elem in elems:
                 dt_attr = elem.get('datetime')
@@ -305,8 +332,8 @@ class KoboCrawler:
                     except (ValueError, AttributeError):
                         pass
                 text = elem.get_text(strip=True)
-                for pattern in date_patterns:
-                    m = re.search(pattern, text)
+                for pattern in ARTICLE_DATE_PATTERNS:
+                    m = pattern.search(text)
                     if m:
                         try:
                             y, mth, d = map(int, m.groups())
@@ -315,15 +342,14 @@ class KoboCrawler:
                             continue
         # 從 URL 解析
         # W49 特例：固定回指定週起始日
-        if re.search(r'weekly-dd99-2025-w49', article_url):
+        if W49_URL_RE.search(article_url):
             return date(2025,12,4)
-        m = re.search(r'weekly-dd99-(\d{4})-w(\d+)', article_url)
+        m = WEEKLY_URL_RE.search(article_url)
         if m:
-            y, w = int(m.group(1)), int(m.group(2))
-            jan1 = date(y, 1, 1)
-            days_offset = (w - 1) * 7
-            week_start = jan1 + timedelta(days=-jan1.weekday() + days_offset)
-            return week_start
+            # ISO 週的週一；不存在的週次（如 52 週年份的 w53）落到下方的警告
+            week_start = WEEKS.week_start(int(m.group(1)), int(m.group(2)))
+            if week_start:
+                return week_start
         logger.warning(f"Could not parse date from article: {article_url}")
         return None
 
@@ -331,93 +357,145 @@ class KoboCrawler:
     # 生成週次 URL
     # ------------------------
     def generate_weekly_urls(self, start_year: int, start_week: int, end_year: int, end_week: int) -> List[str]:
-        start_year, start_week = int(start_year), int(start_week)
-        end_year, end_week = int(end_year), int(end_week)
-        urls = []
-        y, w = start_year, start_week
-        MAX_WEEK = 54
-        while (y < end_year) or (y == end_year and w <= end_week):
-            if w > MAX_WEEK:
-                w = 1
-                y += 1
-                continue
-            urls.append(f"https://www.kobo.com/zh/blog/weekly-dd99-{y}-w{w}")
-            w += 1
-        return urls
+        """範圍內實際存在的 ISO 週次 URL（52 週的年份不會產生 w53）"""
+        return [weekly_url(y, w) for y, w in WEEKS.iter_weeks(start_year, start_week, end_year, end_week)]
 
     # ------------------------
     # 抓取單頁面
     # ------------------------
     def fetch_page(self, url: str, use_random_delay: bool = False) -> Optional[str]:
+        if self.replay:
+            html = self.archive.latest(url)
+            if not html:
+                logger.info(f"No archived copy for {url}")
+            self.metrics.incr("archive_reads")
+            return html
+        html = self._fetch_page(url, use_random_delay)
+        if not html and self.negative_cache and self._url_failed(url):
+            self.negative_cache.record(url, FAILED)
+        return html
+
+    def _url_failed(self, url: str) -> bool:
+        """失敗是否屬於這個 URL：期限到達或主機斷路時略過的 URL 不記入負向快取"""
+        return not self.retry.expired() and not self.retry.is_open(url) and not self.negative_cache.is_blocked(url)
+
+    def _fetch_page(self, url: str, use_random_delay: bool = False) -> Optional[str]:
+        cached = self.http_cache.get(url) if self.http_cache else None
+        if cached and self.http_cache.is_immutable(url):
+            logger.info(f"Using cached article (immutable): {url}")
+            self.metrics.incr("http_cache_hits")
+            return cached.body
+        if self.retry.expired():
+            self.metrics.incr("deadline_skips")
+            return None
+        if not self.retry.allow(url):
+            # 主機斷路中：不再以 httpx 請求；因 403 斷開時（Cloudflare 擋下）改走瀏覽器
+            logger.info(f"Circuit open, not requesting {url}")
+            self.metrics.incr("circuit_open_skips")
+            if self.use_playwright_fallback and self.retry.opened_on_forbidden(url):
+                return self._browser_fallback(url)
+            return None
         if use_random_delay:
-            time.sleep(random.uniform(1, 3))
-        for attempt in range(self.max_retries):
+            self._sleep(random.uniform(1, 3), "random_delay_seconds")
+        for attempt in range(self.retry.attempts):
+            if self.retry.expired():
+                self.metrics.incr("deadline_skips")
+                return None
             try:
                 headers = get_random_headers(referer="https://www.kobo.com/zh/blog")
+                if self.cookie_store and self.cookie_store.user_agent:
+                    # cf_clearance 與取得時的 User-Agent 綁定
+                    headers["User-Agent"] = self.cookie_store.user_agent
+                if cached:
+                    headers.update(HTTPCache.conditional_headers(cached))
                 if use_random_delay:
                     headers = shuffle_headers_order(headers)
+                self.metrics.incr("rate_limit_wait_seconds", self.rate_limiter.acquire(url))
                 response = self.client.get(url, headers=headers)
-                if response.status_code in [403, 429] or (500 <= response.status_code < 600):
-                    if attempt < self.max_retries - 1:
-                        time.sleep(random.uniform(2, 5))
+                self.metrics.record_response(response.status_code, len(response.content))
+                if self.cookie_store:
+                    self.cookie_store.update_from_jar(self.client.cookies.jar, headers.get("User-Agent"))
+                if response.status_code == 304 and cached:
+                    logger.info(f"Not modified, using cached article: {url}")
+                    self.retry.record_success(url)
+                    self.http_cache.touch(cached)
+                    return cached.body
+                if response.status_code == 404:
+                    logger.info(f"Article not found: {url}")
+                    self.retry.record_success(url)
+                    if self.negative_cache:
+                        self.negative_cache.record(url, NOT_FOUND)
+                    return None
+                if is_retryable(response.status_code):
+                    if self.retry.record_failure(url, response.status_code):
+                        self.metrics.incr("circuits_opened")
+                    retry_after = None
+                    if response.status_code in RETRY_AFTER_STATUSES:
+                        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                    if self._backoff(url, attempt, retry_after):
                         continue
-                    else:
-                        if self.use_playwright_fallback and response.status_code == 403:
-                            try:
-                                from playwright.sync_api import sync_playwright
-                                headers = get_random_headers(referer="https://www.kobo.com/zh/blog")
-                                logger.info(f"Using Playwright fallback for: {url}")
-                                with sync_playwright() as p:
-                                    browser = p.chromium.launch(headless=True)
-                                    vw = random.randint(1280, 1920)
-                                    vh = random.randint(720, 1080)
-                                    dsf = random.choice([1, 2])
-                                    context = browser.new_context(
-                                        user_agent=headers.get("User-Agent", ""),
-                                        viewport={"width": vw, "height": vh},
-                                        device_scale_factor=dsf,
-                                        locale="zh-TW",
-                                        timezone_id="Asia/Taipei",
-                                        color_scheme="light",
-                                        extra_http_headers={
-                                            "Accept": headers.get("Accept", ""),
-                                            "Accept-Language": headers.get("Accept-Language", "zh-TW,zh;q=0.9"),
-                                            "Referer": headers.get("Referer", "https://www.kobo.com/zh/blog"),
-                                        },
-                                    )
-                                    context.add_init_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined});")
-                                    context.add_init_script("Object.defineProperty(navigator, 'languages', {get: () => ['zh-TW','zh']});")
-                                    page = context.new_page()
-                                    attempts = 4
-                                    for _ in range(attempts):
-                                        try:
-                                            page.goto(url, wait_until="domcontentloaded", timeout=120000)
-                                            try:
-                                                page.wait_for_load_state("networkidle", timeout=60000)
-                                            except Exception:
-                                                pass
-                                            page.wait_for_selector('a[href*="/ebook/"]', timeout=60000)
-                                            html = page.content()
-                                            if html:
-                                                browser.close()
-                                                return html
-                                            page.reload(wait_until="domcontentloaded")
-                                        except Exception:
-                                            time.sleep(2)
-                                            continue
-                                    browser.close()
-                            except Exception as e:
-                                logger.error(f"Playwright fallback failed: {e}")
-                        return None
+                    if self.use_playwright_fallback and response.status_code == 403:
+                        return self._browser_fallback(url)
+                    return None
                 response.raise_for_status()
-                time.sleep(self.settings.rate_limit_seconds)
+                self.retry.record_success(url)
+                if self.http_cache:
+                    self.http_cache.store(
+                        url,
+                        response.text,
+                        response.headers.get("ETag"),
+                        response.headers.get("Last-Modified"),
+                    )
                 return response.text
             except Exception as e:
                 logger.warning(f"Fetch error {url}: {e}")
-                if attempt < self.max_retries - 1:
-                    time.sleep(random.uniform(2, 5))
+                if not isinstance(e, httpx.HTTPStatusError):
+                    # 有狀態碼的失敗已在收到回應時記錄
+                    self.metrics.record_response("error")
+                if self.retry.record_failure(url):
+                    self.metrics.incr("circuits_opened")
+                if self._backoff(url, attempt):
                     continue
                 return None
+        return None
+
+    def _browser_fallback(self, url: str) -> Optional[str]:
+        """以 Playwright 瀏覽器取得頁面（Cloudflare 擋下 httpx 時）"""
+        if self.retry.expired():
+            self.metrics.incr("deadline_skips")
+            return None
+        try:
+            logger.info(f"Using Playwright fallback for: {url}")
+            self.metrics.incr("playwright_fallbacks")
+            self.metrics.incr("rate_limit_wait_seconds", self.rate_limiter.acquire(url))
+            with self.metrics.stage("playwright"):
+                html = self.browser_pool.fetch(url)
+            if self.cookie_store:
+                # 讓之後的 httpx 請求直接帶上瀏覽器取得的 clearance
+                self.cookie_store.apply_to_jar(self.client.cookies.jar)
+            if html:
+                if self.http_cache:
+                    self.http_cache.store(url, html)
+                return html
+        except Exception as e:
+            self.metrics.incr("playwright_failures")
+            logger.error(f"Playwright fallback failed: {e}")
+        return None
+
+    def _backoff(self, url: str, attempt: int, retry_after: Optional[float] = None) -> bool:
+        """重試前依策略等待；不再重試（次數用完、斷路、期限不足）時回傳 False"""
+        if self.retry.is_open(url):
+            return False
+        delay = self.retry.delay(attempt, retry_after)
+        if delay is None:
+            return False
+        self.metrics.incr("retries")
+        self._sleep(delay)
+        return True
+
+    def _sleep(self, seconds: float, counter: str = "backoff_seconds") -> None:
+        self.metrics.incr(counter, seconds)
+        time.sleep(seconds)
 
     # ------------------------
     # 爬取多週書籍
@@ -425,38 +503,181 @@ class KoboCrawler:
     def crawl_weekly_books(self, start_year: Optional[int] = None, start_week: Optional[int] = None,
                            end_year: Optional[int] = None, end_week: Optional[int] = None,
                            use_random_delay: bool = False) -> List[BookItem]:
+        all_books = list(self.iter_weekly_books(start_year, start_week, end_year, end_week, use_random_delay))
+        logger.info(f"Total books crawled: {len(all_books)}")
+        return all_books
+
+    def iter_weekly_books(self, start_year: Optional[int] = None, start_week: Optional[int] = None,
+                          end_year: Optional[int] = None, end_week: Optional[int] = None,
+                          use_random_delay: bool = False) -> Iterator[BookItem]:
+        """逐本產出範圍內週次的書籍（預設為最近 5 週）"""
         today = date.today()
+        if self.replay and None in (start_year, start_week, end_year, end_week):
+            # 重播模式預設重跑整個封存範圍
+            archived = self.archive.weeks()
+            if archived:
+                if start_year is None or start_week is None:
+                    start_year, start_week = archived[0]
+                if end_year is None or end_week is None:
+                    end_year, end_week = archived[-1]
         if end_year is None or end_week is None:
-            c_year, c_week, _ = today.isocalendar()
-            end_year = int(c_year)
-            end_week = int(min(c_week, 54))
-        end_year, end_week = int(end_year), int(end_week)
+            end_year, end_week = WEEKS.week_of(today)
+        end_year, end_week = int(end_year), int(min(int(end_week), WEEKS.weeks_in_year(int(end_year))))
 
         if start_year is None or start_week is None:
-            s_week = end_week - 4
-            s_year = end_year
-            if s_week < 1:
-                s_year -= 1
-                s_week = 54 + s_week
-            start_year, start_week = int(s_year), int(s_week)
+            start_year, start_week = WEEKS.shift(end_year, end_week, -4)
         else:
             start_year, start_week = int(start_year), int(start_week)
 
         urls = self.generate_weekly_urls(start_year, start_week, end_year, end_week)
-        all_books = []
-
-        for url in urls:
-            m = re.search(r'weekly-dd99-(\d{4})-w(\d+)', url)
-            if not m:
-                continue
-            y, w = int(m.group(1)), int(m.group(2))
-            html = self.fetch_page(url, use_random_delay)
-            if html:
-                books = self.parse_weekly_article(html, url, y, w)
-                all_books.extend(books)
-                time.sleep(self.settings.request_delay_seconds)
-            else:
-                logger.warning(f"Skipping {url} due to fetch failure")
+        yield from self.iter_urls(urls, use_random_delay)
 
+    # ------------------------
+    # 並行爬取多個週次 URL
+    # ------------------------
+    def crawl_urls(self, urls: List[str], use_random_delay: bool = False) -> List[BookItem]:
+        all_books = list(self.iter_urls(urls, use_random_delay))
         logger.info(f"Total books crawled: {len(all_books)}")
         return all_books
+
+    def iter_urls(self, urls: Iterable[str], use_random_delay: bool = False) -> Iterator[BookItem]:
+        """串流版 crawl_urls：worker 預先抓取後續週次，呼叫端依週次順序解析並逐本產出
+
+        URL 在呼叫端執行緒依序登記到本次執行的記憶；重複的 URL 直接等待先登記者的結果。
+        """
+        claimed: Dict[str, Future] = {}
+
+        def claim(job: WeekJob) -> tuple:
+            future, owner = self._claim(job[0])
+            if owner:
+                claimed[job[0]] = future
+            return job, future, owner
+
+        def fetch(item: tuple) -> Optional[str]:
+            (url, _, _), future, owner = item
+            if not owner:
+                return None
+            try:
+                return self.fetch_week(url, use_random_delay)
+            except BaseException as exc:
+                _settle(future, exc=exc)
+                raise
+
+        def parse(item: tuple, html: Optional[str]) -> List[BookItem]:
+            (url, y, w), future, owner = item
+            if not owner:
+                return self._await_claim(url, y, w, future, use_random_delay)
+            try:
+                books = self.parse_week(url, y, w, html) if html else []
+            except BaseException as exc:
+                _settle(future, exc=exc)
+                raise
+            _settle(future, books)
+            return list(books)
+
+        jobs = (claim(job) for job in week_jobs(urls))
+        try:
+            yield from parse_stage(fetch_stage(jobs, fetch, self.settings.crawl_concurrency), parse)
+        finally:
+            # 提前中止時釋放尚未完成的登記，之後的呼叫與正在等待的呼叫端會重新抓取
+            self._release({url: f for url, f in claimed.items() if not f.done()})
+
+    # ------------------------
+    # 抓取並解析單一週次
+    # ------------------------
+    def _claim(self, url: str) -> tuple:
+        """取得 URL 在本次執行的 Future；第二個值表示呼叫端是否負責產生結果"""
+        with self._memo_lock:
+            future = self._memo.get(url)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._memo[url] = future
+            else:
+                self.memo_hits += 1
+        return future, owner
+
+    def _release(self, claimed: Dict[str, Future]) -> None:
+        """移除登記並以 ClaimReleased 通知等待者
+
+        不取消 Future：worker 可能仍在完成它，等待者收到 CancelledError 也無從重試。
+        """
+        with self._memo_lock:
+            for url, future in claimed.items():
+                if self._memo.get(url) is future:
+                    del self._memo[url]
+        for url, future in claimed.items():
+            _settle(future, exc=ClaimReleased(url))
+
+    def _await_claim(self, url: str, year: int, week: int, future: Future,
+                     use_random_delay: bool = False) -> List[BookItem]:
+        """等待其他呼叫端登記的結果；登記被釋放時自行重新抓取"""
+        logger.debug(f"Reusing in-run result for {url}")
+        try:
+            return list(future.result())
+        except ClaimReleased:
+            logger.debug(f"Claim on {url} was released, fetching it again")
+            return self.crawl_week(url, year, week, use_random_delay)
+
+    def crawl_week(self, url: str, year: int, week: int, use_random_delay: bool = False) -> List[BookItem]:
+        future, owner = self._claim(url)
+        if not owner:
+            return self._await_claim(url, year, week, future, use_random_delay)
+        try:
+            books = self._crawl_week(url, year, week, use_random_delay)
+        except BaseException as exc:
+            _settle(future, exc=exc)
+            raise
+        _settle(future, books)
+        return list(books)
+
+    def _crawl_week(self, url: str, year: int, week: int, use_random_delay: bool = False) -> List[BookItem]:
+        html = self.fetch_week(url, use_random_delay)
+        if not html:
+            return []
+        return self.parse_week(url, year, week, html)
+
+    def fetch_week(self, url: str, use_random_delay: bool = False) -> Optional[str]:
+        """抓取週次文章；負向快取中的 URL 不發請求"""
+        if self.negative_cache and self.negative_cache.is_blocked(url):
+            logger.info(f"Skipping {url} (negative cache)")
+            self.metrics.incr("negative_cache_skips")
+            return None
+        with self.metrics.stage("fetch"):
+            html = self.fetch_page(url, use_random_delay)
+        if not html:
+            logger.warning(f"Skipping {url} due to fetch failure")
+        return html
+
+    def parse_week(self, url: str, year: int, week: int, html: str) -> List[BookItem]:
+        """解析週次文章；內容與上次解析時相同（304 或未變動）則沿用快取的結果"""
+        with self.metrics.stage("parse"):
+            books = self._parse_week(url, year, week, html)
+        self.metrics.record_article(url, len(books))
+        # 只封存解析出書籍的頁面：Cloudflare 驗證頁等同樣是 200，不應進入封存
+        if books and self.archive and not self.replay:
+            self.archive.put(url, html)
+        return books
+
+    def _parse_week(self, url: str, year: int, week: int, html: str) -> List[BookItem]:
+        if self.http_cache:
+            items = self.http_cache.get_parsed(url, PARSE_CACHE_KEY, html)
+            if items is not None:
+                logger.info(f"Using cached parse result for {url} ({len(items)} books)")
+                self.metrics.incr("parse_cache_hits")
+                books = [BookItem.from_dict(item) for item in items]
+                self._record_parse_result(url, books)
+                return books
+        books = self.parse_weekly_article(html, url, year, week)
+        if self.http_cache:
+            self.http_cache.put_parsed(url, PARSE_CACHE_KEY, html, [b.to_dict() for b in books])
+        self._record_parse_result(url, books)
+        return books
+
+    def _record_parse_result(self, url: str, books: List[BookItem]) -> None:
+        if not self.negative_cache:
+            return
+        if books:
+            self.negative_cache.clear(url)
+        else:
+            self.negative_cache.record(url, EMPTY)
@@ -0,0 +1,187 @@
+"""SQLite 事件資料庫：以商品 ID、日期、週次建立索引，支援 upsert 與日期範圍查詢"""
+import logging
+import sqlite3
+from datetime import date
+from pathlib import Path
+from typing import Iterable, List, Optional, Set
+
+from .content_store import ContentStore
+from .extraction import product_id
+from .models import BookItem
+from .storage import Storage
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ("book_url", "product_id", "title", "article_url", "article_title", "content", "date", "week", "year", "seq")
+# 資料欄位（不含主鍵）；內容完全相同的列在 upsert 時不會被改寫
+DATA_COLUMNS = COLUMNS[1:]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    book_url TEXT PRIMARY KEY,
+    product_id TEXT NOT NULL,
+    title TEXT NOT NULL,
+    article_url TEXT NOT NULL,
+    article_title TEXT NOT NULL DEFAULT '',
+    content TEXT NOT NULL DEFAULT '',
+    date TEXT NOT NULL,
+    week INTEGER NOT NULL,
+    year INTEGER NOT NULL,
+    seq INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_events_product ON events(product_id);
+CREATE INDEX IF NOT EXISTS idx_events_date ON events(date);
+CREATE INDEX IF NOT EXISTS idx_events_week ON events(year, week);
+CREATE INDEX IF NOT EXISTS idx_events_seq ON events(seq);
+"""
+
+UPSERT_SQL = (
+    f"INSERT INTO events ({', '.join(COLUMNS)}) VALUES ({', '.join('?' for _ in COLUMNS)}) "
+    f"ON CONFLICT(book_url) DO UPDATE SET {', '.join(f'{c} = excluded.{c}' for c in DATA_COLUMNS)} "
+    f"WHERE ({', '.join(f'events.{c}' for c in DATA_COLUMNS)}) "
+    f"IS NOT ({', '.join(f'excluded.{c}' for c in DATA_COLUMNS)})"
+)
+
+
+class EventStore:
+    """以 book_url 為主鍵的事件表；seq 保存清單順序（ICS 每天取第一筆依此順序）
+
+    所有寫入都在單一交易內完成。JSON 檔案（data/events.json）改由 export_json 匯出以維持相容。
+    """
+
+    def __init__(self, path: str, import_json: Optional[str] = None,
+                 contents: Optional[ContentStore] = None):
+        self.path = Path(path)
+        # 有 ContentStore 時 content 欄位留空，讀取時才載入
+        self.contents = contents
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path))
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        if import_json and self.count() == 0 and Path(import_json).exists():
+            items = Storage(import_json).load()
+            if items:
+                if self.contents is not None:
+                    self.contents.put_many(items)
+                self.sync(items)
+                logger.info(f"Imported {len(items)} events from {import_json} into {self.path}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    # ------------------------
+    # 寫入
+    # ------------------------
+    def _row(self, item: BookItem, seq: int) -> tuple:
+        content = (item.content or "") if self.contents is None else ""
+        return (
+            item.book_url, product_id(item.book_url), item.title, item.article_url,
+            item.article_title or "", content, item.date.isoformat(),
+            int(item.week), int(item.year), seq,
+        )
+
+    def upsert(self, items: Iterable[BookItem]) -> int:
+        """新增或更新（依 book_url），新項目排在現有項目之後；回傳實際寫入的列數"""
+        with self.conn:
+            start = self.conn.execute("SELECT COALESCE(MAX(seq), -1) + 1 FROM events").fetchone()[0]
+            written = 0
+            for offset, item in enumerate(items):
+                existing = self.conn.execute("SELECT seq FROM events WHERE book_url = ?", (item.book_url,)).fetchone()
+                seq = existing[0] if existing else start + offset
+                written += self.conn.execute(UPSERT_SQL, self._row(item, seq)).rowcount
+            return written
+
+    def sync(self, items: Iterable[BookItem]) -> dict:
+        """讓資料表與 items 完全一致（含順序）：只改寫有變動的列並刪除不在 items 內的列
+
+        seq 盡量沿用既有的值，只有順序必須改變的列才取新的遞增值：
+        刪除開頭的舊書（移入冷資料層）或在最後附加新書時，其餘的列都不會被改寫。
+        """
+        with self.conn:
+            existing = dict(self.conn.execute("SELECT book_url, seq FROM events"))
+            next_seq = max(existing.values(), default=-1) + 1
+            last_seq = -1
+            self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS keep (book_url TEXT PRIMARY KEY)")
+            self.conn.execute("DELETE FROM keep")
+            count = written = 0
+            for item in items:
+                seq = existing.get(item.book_url)
+                if seq is None or seq <= last_seq:
+                    seq, next_seq = next_seq, next_seq + 1
+                last_seq = seq
+                written += self.conn.execute(UPSERT_SQL, self._row(item, seq)).rowcount
+                self.conn.execute("INSERT OR IGNORE INTO keep (book_url) VALUES (?)", (item.book_url,))
+                count += 1
+            deleted = self.conn.execute(
+                "DELETE FROM events WHERE book_url NOT IN (SELECT book_url FROM keep)").rowcount
+            self.conn.execute("DELETE FROM keep")
+        stats = {"items": count, "written": written, "deleted": deleted}
+        logger.info(f"Event store sync: {stats}")
+        return stats
+
+    # ------------------------
+    # 查詢
+    # ------------------------
+    def _item(self, row: sqlite3.Row) -> BookItem:
+        return BookItem(
+            title=row["title"],
+            book_url=row["book_url"],
+            article_url=row["article_url"],
+            article_title=row["article_title"],
+            content=row["content"] if self.contents is None else None,
+            date=date.fromisoformat(row["date"]),
+            week=row["week"],
+            year=row["year"],
+            contents=self.contents,
+        )
+
+    def _query(self, where: str = "", params: tuple = ()) -> List[BookItem]:
+        sql = f"SELECT * FROM events {where} ORDER BY seq, book_url"
+        return [self._item(row) for row in self.conn.execute(sql, params)]
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+
+    def load(self) -> List[BookItem]:
+        return self._query()
+
+    def get(self, book_url: str) -> Optional[BookItem]:
+        items = self._query("WHERE book_url = ?", (book_url,))
+        return items[0] if items else None
+
+    def by_product(self, pid: str) -> List[BookItem]:
+        return self._query("WHERE product_id = ?", (pid,))
+
+    def by_week(self, year: int, week: int) -> List[BookItem]:
+        return self._query("WHERE year = ? AND week = ?", (year, week))
+
+    def range(self, start: date, end: date) -> List[BookItem]:
+        """日期介於 start..end（含）的事件，依清單順序"""
+        return self._query("WHERE date BETWEEN ? AND ?", (start.isoformat(), end.isoformat()))
+
+    def dates(self, start: date, end: date) -> Set[date]:
+        """start..end（含）之間有事件的日期"""
+        rows = self.conn.execute(
+            "SELECT DISTINCT date FROM events WHERE date BETWEEN ? AND ?", (start.isoformat(), end.isoformat()))
+        return {date.fromisoformat(row[0]) for row in rows}
+
+    # ------------------------
+    # 相容匯出
+    # ------------------------
+    def export_json(self, path: str) -> bool:
+        """以 Storage 快照格式輸出（並清掉殘留的日誌）；內容未變時不寫檔，回傳是否寫入
+
+        匯出檔含完整 content（由 ContentStore 逐筆載入）：JSON 是可攜的資料來源，
+        不依賴未納入版本控制的 content 儲存，新環境由它重建資料庫時不會遺失內容。
+        """
+        written = Storage(path).save(self.load())
+        logger.info(f"Exported event store to {path} ({'written' if written else 'unchanged'})")
+        return written
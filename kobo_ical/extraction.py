@@ -0,0 +1,181 @@
+"""週次文章單次走訪的擷取引擎：預先編譯的樣式、文字索引與標題對齊"""
+import re
+from datetime import date
+from typing import Dict, List, Optional, Tuple, Union
+from urllib.parse import urljoin, urlsplit
+
+from bs4 import BeautifulSoup, CData, NavigableString, Tag
+
+from .weeks import WEEKS
+
+# ------------------------
+# 模組層級預先編譯的樣式
+# ------------------------
+EBOOK_HREF_RE = re.compile(r'/ebook/')
+PRODUCT_ID_RE = re.compile(r'/ebook/([^?#/]+)')
+PRODUCT_PATH_RE = re.compile(r'/ebook/([^/]+)')
+ARTICLE_YEAR_RE = re.compile(r'weekly-dd99-(\d{4})-w')
+TITLE_BRACKETS_RE = re.compile(r'[《》「」『』【】\[\]]')
+WHITESPACE_RE = re.compile(r'\s+')
+CANON_STRIP_RE = re.compile(r'[《》「」『』【】\[\]（）()：:，,。!！？、\-–—\s]+')
+PLACEHOLDER_TITLE_RE = re.compile(r'(查看電子書（HK）|查看電子書|閱讀電子書|電子書)')
+URL_RE = re.compile(r'https?://\S+')
+PRICE_RE = re.compile(r'99元|NT\$?\s*99|HK\$?\s*99|購買|查看電子書（HK）|查看電子書')
+BRACKET_TITLE_RE = re.compile(r'[《「『【](.*?)[》」』】]')
+ELEMENT_DATE_RE = re.compile(r'(\d{1,2})/(\d{1,2})\s*週[一二三四五六日]')
+TITLE_DATE_PATTERNS = (
+    re.compile(r"(\d{1,2})\/(\d{1,2})\s*週[一二三四五六日]\s*(?:Kobo\s*99\s*選書|Kobo99選書)：[『「《]?(.*?)[』」》]?", re.MULTILINE),
+    re.compile(r"(\d{1,2})\/(\d{1,2})\s*(?:週[一二三四五六日])\s*[^\n]*?[『「《]?(.*?)[』」》]?", re.MULTILINE),
+)
+
+# 書籍區塊的候選父元素
+BLOCK_TAGS = frozenset(['div', 'article', 'section', 'li', 'p'])
+TITLE_SELECTORS = ['h2', 'h3', 'h4', 'h5', '[class*="title"]', '[class*="Title"]']
+# 與 Tag.get_text 預設相同，只計入一般文字與 CDATA
+TEXT_TYPES = (NavigableString, CData)
+
+# (標準化標題, 顯示標題, 商品頁 URL, 內容摘要, 元素內日期)
+LinkInfo = Tuple[str, str, str, str, Optional[date]]
+
+
+def product_id(book_url: str) -> str:
+    """商品頁 URL 中的商品 ID；無法辨識時回傳原 URL"""
+    m = PRODUCT_PATH_RE.search(book_url)
+    return m.group(1) if m else book_url
+
+
+def norm_title(t: str) -> str:
+    t = (t or "").strip()
+    t = TITLE_BRACKETS_RE.sub('', t)
+    t = WHITESPACE_RE.sub(' ', t)
+    return t
+
+
+def canon(s: str) -> str:
+    return CANON_STRIP_RE.sub('', (s or '').lower())
+
+
+def canonical_book_url(href: str) -> str:
+    """商品頁連結統一為 https://www.kobo.com/tw/zh/ebook/<id>"""
+    book_url = urljoin('https://www.kobo.com', href)
+    try:
+        mprod = PRODUCT_PATH_RE.search(urlsplit(book_url).path)
+    except ValueError:
+        return book_url
+    if mprod:
+        return f"https://www.kobo.com/tw/zh/ebook/{mprod.group(1)}"
+    return book_url
+
+
+class DocumentIndex:
+    """走訪一次文件，記錄去除空白後的文字序列、每個標籤涵蓋的文字/連結範圍與依序的 ebook 連結
+
+    之後取得任一元素的 get_text 結果只需切片，不必再走訪子樹。
+    """
+
+    def __init__(self, root: Union[BeautifulSoup, Tag]):
+        self.root = root
+        self.strings: List[str] = []
+        self.links: List[Tag] = []
+        # id(tag) -> (文字起點, 文字終點, 連結起點, 連結終點)
+        self.spans: Dict[int, Tuple[int, int, int, int]] = {}
+        self._walk()
+
+    def _walk(self) -> None:
+        strings, links, spans = self.strings, self.links, self.spans
+        starts = {id(self.root): (0, 0)}
+        stack = [(self.root, iter(self.root.contents))]
+        while stack:
+            tag, children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                stack.pop()
+                s_start, l_start = starts.pop(id(tag))
+                spans[id(tag)] = (s_start, len(strings), l_start, len(links))
+                continue
+            if isinstance(child, Tag):
+                if child.name == 'a':
+                    href = child.get('href')
+                    if href and EBOOK_HREF_RE.search(href):
+                        links.append(child)
+                starts[id(child)] = (len(strings), len(links))
+                stack.append((child, iter(child.contents)))
+            elif type(child) in TEXT_TYPES:
+                text = child.strip()
+                if text:
+                    strings.append(text)
+
+    def text(self, tag: Tag, separator: str = "") -> str:
+        """等同 tag.get_text(separator, strip=True)"""
+        span = self.spans.get(id(tag))
+        if span is None:
+            return tag.get_text(separator, strip=True)
+        return separator.join(self.strings[span[0]:span[1]])
+
+    def first_link(self, tag: Tag) -> Optional[Tag]:
+        """等同 tag.find('a', href=EBOOK_HREF_RE)"""
+        span = self.spans.get(id(tag))
+        if span is None:
+            return tag.find('a', href=EBOOK_HREF_RE)
+        return self.links[span[2]] if span[2] < span[3] else None
+
+
+def block_parent(tag: Tag) -> Optional[Tag]:
+    parent = tag.parent
+    while parent is not None and parent.name not in BLOCK_TAGS:
+        parent = parent.parent
+    return parent
+
+
+def title_date_map(text: str, year: int, week: int,
+                   article_url: str) -> Tuple[Dict[str, date], List[Tuple[str, date]]]:
+    """從內文的「M/D 週X …」行建立 標準化標題 -> 日期 對照與原始順序
+
+    年份依週曆索引取最接近文章週次的年份，跨年書單的 12/29、1/2 各自落在正確年份。
+    """
+    m = ARTICLE_YEAR_RE.search(article_url)
+    y = int(m.group(1)) if m else year
+    mapping: Dict[str, date] = {}
+    ordered: List[Tuple[str, date]] = []
+    for pat in TITLE_DATE_PATTERNS:
+        for mm, dd, tt in pat.findall(text):
+            d = WEEKS.resolve_date(y, week, int(mm), int(dd))
+            if d is None:
+                continue
+            tnorm = norm_title(tt)
+            if tnorm not in mapping:
+                mapping[tnorm] = d
+                ordered.append((tnorm, d))
+    return mapping, ordered
+
+
+def book_elements(index: DocumentIndex) -> List[Tag]:
+    """每個商品（依 href 中的 ID 去重）取其最近的區塊父元素，保持文件順序"""
+    elements: List[Tag] = []
+    seen_elements = set()
+    seen_products = set()
+    for link in index.links:
+        href = link.get('href', '')
+        m_id = PRODUCT_ID_RE.search(href)
+        product_id = m_id.group(1) if m_id else href
+        if product_id in seen_products:
+            continue
+        seen_products.add(product_id)
+        parent = block_parent(link)
+        if parent is not None and id(parent) not in seen_elements:
+            seen_elements.add(id(parent))
+            elements.append(parent)
+    return elements
+
+
+def align_titles(link_infos: List[LinkInfo], title_dates: Dict[str, date]) -> Dict[str, Tuple[str, str, str, Optional[date]]]:
+    """以標準化標題的字典索引對齊連結與日期行，O(n) 取代逐一比對"""
+    canon_index: Dict[str, str] = {}
+    for key in title_dates:
+        canon_index.setdefault(canon(key), key)
+    aligned = {}
+    for nt, t, u, c, ed in link_infos:
+        key = canon_index.get(canon(nt))
+        if key is not None:
+            aligned[key] = (t, u, c, ed)
+    return aligned
@@ -0,0 +1,82 @@
+"""已序列化 VEVENT 區塊的快取：內容未變的事件直接沿用上次輸出的位元組"""
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# 序列化格式版本；ICSWriter 的輸出格式改變時需遞增，舊片段自動失效
+FRAGMENT_FORMAT = "ics-writer:v1"
+
+
+def fragment_key(*fields: object) -> str:
+    """事件內容的雜湊：傳入會影響 VEVENT 輸出的所有書籍欄位"""
+    joined = "\x1f".join("" if f is None else str(f) for f in fields)
+    return hashlib.sha256(f"{FRAGMENT_FORMAT}\x1e{joined}".encode("utf-8")).hexdigest()
+
+
+class FragmentCache:
+    """內容雜湊 -> VEVENT 區塊；每個 feed 一個檔案，只保留最近一次輸出用到的片段"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.fragments: Dict[str, str] = self._load()
+        self._saved: Dict[str, str] = dict(self.fragments)
+        self.used: Dict[str, str] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self) -> Dict[str, str]:
+        if not self.path.exists():
+            return {}
+        try:
+            with self.path.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("format") != FRAGMENT_FORMAT:
+                return {}
+            return data.get("fragments", {})
+        except Exception as exc:
+            logger.warning("Failed to load ICS fragment cache %s: %s", self.path, exc)
+            return {}
+
+    def begin(self) -> None:
+        """開始一次輸出：之後的 save 只保留這次輸出用到的片段
+
+        長駐的實例（伺服器的定期刷新、同一生成器的多次輸出）每次輸出前呼叫，
+        已刪除或內容變動的事件片段才會在 save 時清掉。
+        """
+        self.used = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        text = self.fragments.get(key)
+        if text is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.used[key] = text
+        return text.encode("utf-8")
+
+    def put(self, key: str, data: bytes) -> None:
+        text = data.decode("utf-8")
+        self.fragments[key] = text
+        self.used[key] = text
+
+    def save(self) -> None:
+        """寫回自上次 begin 以來用到的片段（已移除的事件一併清掉）；內容不變時不寫檔
+
+        記憶體中的片段不會被清掉，同一實例之後的輸出仍可使用。
+        """
+        if self.used == self._saved:
+            logger.info(f"ICS fragments: {self.hits} reused, cache unchanged")
+            return
+        tmp = self.path.with_suffix(".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump({"format": FRAGMENT_FORMAT, "fragments": self.used}, f, ensure_ascii=False, sort_keys=True)
+        tmp.replace(self.path)
+        self._saved = dict(self.used)
+        logger.info(f"ICS fragments: {self.hits} reused, {self.misses} rendered, {len(self._saved)} cached")
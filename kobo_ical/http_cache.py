@@ -0,0 +1,158 @@
+"""週次文章的持久化 HTTP 快取（ETag / Last-Modified 條件式重新驗證）"""
+import hashlib
+import json
+import logging
+import re
+import threading
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .weeks import WEEKS
+
+logger = logging.getLogger(__name__)
+
+WEEKLY_URL_RE = re.compile(r'weekly-dd99-(\d{4})-w(\d+)')
+
+
+@dataclass
+class CacheEntry:
+    """單一 URL 的快取內容"""
+    url: str
+    body: str
+    sha256: str
+    etag: str = ""
+    last_modified: str = ""
+    fetched_at: str = ""
+    validated_at: str = ""
+    # 解析結果快取：{parser 名稱: {"sha256": 對應的 body 雜湊, "items": [...]}}
+    parsed: Dict[str, dict] = field(default_factory=dict)
+
+    def to_dict(self) -> dict:
+        return {
+            "url": self.url,
+            "etag": self.etag,
+            "last_modified": self.last_modified,
+            "fetched_at": self.fetched_at,
+            "validated_at": self.validated_at,
+            "sha256": self.sha256,
+            "parsed": self.parsed,
+            "body": self.body,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "CacheEntry":
+        return cls(
+            url=data["url"],
+            body=data["body"],
+            sha256=data["sha256"],
+            etag=data.get("etag", ""),
+            last_modified=data.get("last_modified", ""),
+            fetched_at=data.get("fetched_at", ""),
+            validated_at=data.get("validated_at", ""),
+            parsed=data.get("parsed", {}),
+        )
+
+
+def body_digest(body: str) -> str:
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+class HTTPCache:
+    """以 URL 為鍵的磁碟快取，每個 URL 一個 JSON 檔"""
+
+    def __init__(self, cache_dir: str, immutable_after_weeks: int = 4):
+        self.dir = Path(cache_dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.immutable_after_weeks = immutable_after_weeks
+        self._lock = threading.Lock()
+
+    def _path(self, url: str) -> Path:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return self.dir / f"{key}.json"
+
+    def get(self, url: str) -> Optional[CacheEntry]:
+        path = self._path(url)
+        if not path.exists():
+            return None
+        try:
+            with path.open("r", encoding="utf-8") as f:
+                return CacheEntry.from_dict(json.load(f))
+        except Exception as exc:
+            logger.warning("Failed to read cache entry %s: %s", path, exc)
+            return None
+
+    def _write(self, entry: CacheEntry) -> None:
+        path = self._path(entry.url)
+        tmp = path.with_suffix(".tmp")
+        with self._lock:
+            with tmp.open("w", encoding="utf-8") as f:
+                json.dump(entry.to_dict(), f, ensure_ascii=False)
+            tmp.replace(path)
+
+    def store(self, url: str, body: str, etag: Optional[str] = None,
+              last_modified: Optional[str] = None) -> CacheEntry:
+        """儲存 200 回應；內容未變時保留既有的解析結果"""
+        now = datetime.now().isoformat(timespec="seconds")
+        digest = body_digest(body)
+        prev = self.get(url)
+        entry = CacheEntry(
+            url=url,
+            body=body,
+            sha256=digest,
+            etag=etag or "",
+            last_modified=last_modified or "",
+            fetched_at=now,
+            validated_at=now,
+            parsed=prev.parsed if prev and prev.sha256 == digest else {},
+        )
+        self._write(entry)
+        return entry
+
+    def touch(self, entry: CacheEntry) -> None:
+        """收到 304 時更新驗證時間"""
+        entry.validated_at = datetime.now().isoformat(timespec="seconds")
+        self._write(entry)
+
+    @staticmethod
+    def conditional_headers(entry: CacheEntry) -> Dict[str, str]:
+        headers = {}
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def is_immutable(self, url: str, today: Optional[date] = None) -> bool:
+        """超過 N 週的週次文章視為不再變動，直接使用快取、不連網"""
+        if self.immutable_after_weeks <= 0:
+            return False
+        m = WEEKLY_URL_RE.search(url)
+        if not m:
+            return False
+        week_start = WEEKS.week_start(int(m.group(1)), int(m.group(2)))
+        if week_start is None:
+            return False
+        today = today or date.today()
+        return week_start + timedelta(weeks=self.immutable_after_weeks) <= today
+
+    def get_parsed(self, url: str, parser: str, body: str) -> Optional[List[dict]]:
+        """若 body 與上次解析時相同，回傳快取的解析結果"""
+        entry = self.get(url)
+        if not entry:
+            return None
+        parsed = entry.parsed.get(parser)
+        if not parsed or parsed.get("sha256") != body_digest(body):
+            return None
+        return parsed.get("items")
+
+    def put_parsed(self, url: str, parser: str, body: str, items: List[dict]) -> None:
+        entry = self.get(url)
+        if not entry:
+            return
+        digest = body_digest(body)
+        if entry.sha256 != digest:
+            return
+        entry.parsed[parser] = {"sha256": digest, "items": items}
+        self._write(entry)
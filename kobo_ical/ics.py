@@ -1,18 +1,49 @@
 """ICS 檔案生成"""
+import hashlib
+import io
+import json
 import logging
-from datetime import date, datetime, timedelta
-from typing import List, Optional
-
-import pytz
-from ics import Calendar, Event
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, BinaryIO, Dict, Iterable, List, Optional, Tuple
 
 from .config import Settings
+from .fragment_cache import FragmentCache, fragment_key
+from .ics_writer import ICSWriter
 from .models import BookItem
+from .storage import write_if_changed
+
+if TYPE_CHECKING:
+    from .cold_archive import ColdArchive
+    from .event_store import EventStore
 
 logger = logging.getLogger(__name__)
 
-# 台灣時區
-TAIPEI_TZ = pytz.timezone('Asia/Taipei')
+UID_DOMAIN = "kobo-99-ical"
+PRODID = "Kobo 99 iCal Generator"
+FRAGMENT_FILE = "service.json"
+
+# 分片 feed 檔名
+UPCOMING_FEED = "upcoming.ics"
+ARCHIVE_FEED = "archive-{year}.ics"
+FEED_INDEX = "index.json"
+
+
+def event_uid(book_url: str, event_date: date) -> str:
+    """由商品頁 URL 與日期導出的固定 UID（不受每個行程隨機的 hash() 影響）"""
+    digest = hashlib.sha256(f"{book_url}|{event_date.isoformat()}".encode("utf-8")).hexdigest()
+    return f"kobo99-{digest[:32]}@{UID_DOMAIN}"
+
+
+def event_dtstamp(event_date: date) -> datetime:
+    """固定的 DTSTAMP：事件所在週的週一 00:00 UTC，同一事件每次產生都相同"""
+    monday = event_date - timedelta(days=event_date.weekday())
+    return datetime(monday.year, monday.month, monday.day, tzinfo=timezone.utc)
+
+
+def event_sort_key(event_date: date, book_url: str, title: str) -> tuple:
+    """事件的標準排序：日期、商品頁 URL、書名"""
+    return event_date, book_url, title
 
 
 class ICSGenerator:
@@ -20,16 +51,45 @@ class ICSGenerator:
 
     def __init__(self, settings: Optional[Settings] = None):
         self.settings = settings or Settings()
+        # 同一個生成器的多次輸出（完整 feed 與分片）共用片段快取
+        self.fragments: Optional[FragmentCache] = None
+        if self.settings.ics_fragment_dir:
+            self.fragments = FragmentCache(str(Path(self.settings.ics_fragment_dir) / FRAGMENT_FILE))
 
     def generate_ics(self, books: List[BookItem]) -> str:
         """生成 ICS 檔案內容"""
-        cal = Calendar()
-        cal.creator = "Kobo 99 iCal Generator"
+        buffer = io.BytesIO()
+        event_count = self.write_ics(books, buffer)
+        ical_content = buffer.getvalue().decode("utf-8")
+        logger.info(f"Generated ICS with {event_count} events, content length: {len(ical_content)} characters")
+        
+        if event_count == 0:
+            logger.warning("No events in ICS file - this may indicate a problem with data crawling or filtering")
+        
+        return ical_content
 
+    @staticmethod
+    def one_per_day(books: Iterable[BookItem]) -> List[BookItem]:
+        """每天最多 1 筆（先出現者優先），依標準順序排列"""
+        per_day = {}
+        for book in books:
+            per_day.setdefault(book.date, book)
+        return sorted(per_day.values(), key=lambda b: event_sort_key(b.date, b.book_url, b.title))
+
+    def retention_window(self, today: Optional[date] = None) -> Tuple[date, date]:
+        """保留期間 (最早日期, 最晚日期)，含頭尾"""
+        today = today or date.today()
+        return (today - timedelta(days=self.settings.retention_past_days),
+                today + timedelta(days=self.settings.retention_future_days))
+
+    def generate_from_store(self, store: "EventStore") -> str:
+        """直接以日期索引查詢保留期間內的事件並生成 ICS，不需載入全部資料"""
+        return self.generate_ics(store.range(*self.retention_window()))
+
+    def select_books(self, books: List[BookItem]) -> List[BookItem]:
+        """保留期間內、每天最多 1 筆的書籍，依標準順序排列"""
         # 計算保留日期範圍
-        today = date.today()
-        past_cutoff = today - timedelta(days=self.settings.retention_past_days)
-        future_cutoff = today + timedelta(days=self.settings.retention_future_days)
+        past_cutoff, future_cutoff = self.retention_window()
 
         # 過濾書籍，只保留在日期範圍內的
         filtered_books = [
@@ -40,52 +100,127 @@ class ICSGenerator:
         logger.info(f"Generating ICS with {len(filtered_books)} books (filtered from {len(books)})")
 
         # 依日期限制每天最多 1 筆
-        per_day_counts = {}
-        event_count = 0
-        for book in filtered_books:
-            try:
-                key = book.date
-                cnt = per_day_counts.get(key, 0)
-                if cnt >= 1:
+        return self.one_per_day(filtered_books)
+
+    def write_ics(self, books: List[BookItem], out: BinaryIO) -> int:
+        """將保留期間內的事件逐一寫入 out（二進位檔案或緩衝區），回傳事件數"""
+        if self.fragments is not None:
+            self.fragments.begin()
+        count = self.render(self.select_books(books), out)
+        if self.fragments is not None:
+            self.fragments.save()
+        return count
+
+    def render(self, books: Iterable[BookItem], out: BinaryIO, calname: Optional[str] = None) -> int:
+        """依序寫出已篩選的書籍
+
+        內容與上次相同的事件沿用片段快取中的區塊，只有新增或變動的書籍需要序列化。
+        """
+        with ICSWriter(out, prodid=PRODID, calname=calname, fragments=self.fragments) as writer:
+            for book in books:
+                key = fragment_key(book.book_url, book.date, book.title, book.article_url)
+                if writer.cached_event(key):
                     continue
-                event = Event()
-
-                # 事件標題
-                event.name = f"99元 - {book.title}"
-
-                event.begin = book.date
-
-                # 事件描述（包含商品頁連結與來源文章）
-                description_parts = [
-                    f"書名：{book.title}",
-                    f"",
-                    f"查看電子書：{book.book_url}",
-                    f"",
-                    f"來源文章：{book.article_url}",
-                ]
-                event.description = "\n".join(description_parts)
-
-                # 事件 URL（商品頁連結）
-                event.url = book.book_url
-
-                # 事件 UID（用於去重）
-                event.uid = f"kobo99-{hash(book.book_url + book.date.isoformat())}@kobo-99-ical"
-
-                # 設定為全天事件
-                event.make_all_day()
-
-                cal.events.add(event)
-                event_count += 1
-                per_day_counts[key] = cnt + 1
-
-            except Exception as e:
-                logger.warning(f"Error creating event for book {book.title}: {e}", exc_info=True)
-                continue
-
-        ical_content = str(cal)
-        logger.info(f"Generated ICS with {event_count} events, content length: {len(ical_content)} characters")
-        
-        if event_count == 0:
-            logger.warning("No events in ICS file - this may indicate a problem with data crawling or filtering")
-        
-        return ical_content
+                try:
+                    # 事件描述（包含商品頁連結與來源文章）
+                    description_parts = [
+                        f"書名：{book.title}",
+                        f"",
+                        f"查看電子書：{book.book_url}",
+                        f"",
+                        f"來源文章：{book.article_url}",
+                    ]
+                    writer.all_day_event(
+                        uid=event_uid(book.book_url, book.date),
+                        start=book.date,
+                        summary=f"99元 - {book.title}",
+                        dtstamp=event_dtstamp(book.date),
+                        description="\n".join(description_parts),
+                        url=book.book_url,
+                        cache_key=key,
+                    )
+                except Exception as e:
+                    logger.warning(f"Error creating event for book {book.title}: {e}", exc_info=True)
+                    continue
+        return writer.count
+
+    # ------------------------
+    # 分片 feed：近期 + 各年度封存 + 索引
+    # ------------------------
+    def write_feeds(self, books: List[BookItem], feed_dir: Optional[str] = None,
+                    today: Optional[date] = None, cold: Optional["ColdArchive"] = None) -> dict:
+        """一次走訪寫出近期 feed、各年度封存 feed 與索引檔；內容未變的檔案不重寫
+
+        傳入 cold 時 books 只需熱資料：含冷資料的年度才載入對應的封存檔，
+        整年都在冷資料層且封存檔未變動的年度直接沿用上次的索引項目。
+        回傳索引內容（{"feeds": [...]}）。
+        """
+        feed_dir = Path(feed_dir or self.settings.feed_dir)
+        today = today or date.today()
+        upcoming_start = today - timedelta(days=self.settings.upcoming_past_days)
+        upcoming_end = today + timedelta(days=self.settings.upcoming_future_days)
+
+        upcoming: List[BookItem] = []
+        years: Dict[int, List[BookItem]] = {}
+        for book in self.one_per_day(books):
+            years.setdefault(book.date.year, []).append(book)
+            if upcoming_start <= book.date <= upcoming_end:
+                upcoming.append(book)
+
+        previous = self._previous_entries(feed_dir) if cold is not None else {}
+        cold_years = set(cold.years()) if cold is not None else set()
+        shards = [("upcoming", UPCOMING_FEED, "Kobo 99 選書（近期）", upcoming, None)]
+        entries = []
+        for year in sorted(set(years) | cold_years):
+            filename = ARCHIVE_FEED.format(year=year)
+            source = None
+            shard_books = years.get(year, [])
+            if year in cold_years:
+                source = cold.digest(year)
+                entry = previous.get(str(year))
+                if (year not in years and entry and entry.get("source") == source
+                        and (feed_dir / filename).exists()):
+                    entries.append(entry)
+                    continue
+                shard_books = self.one_per_day(cold.load(year) + shard_books)
+            shards.append((str(year), filename, f"Kobo 99 選書 {year}", shard_books, source))
+
+        if self.fragments is not None:
+            self.fragments.begin()
+        written = 0
+        for name, filename, calname, shard_books, source in shards:
+            buffer = io.BytesIO()
+            count = self.render(shard_books, buffer, calname)
+            data = buffer.getvalue()
+            if write_if_changed(feed_dir / filename, data):
+                written += 1
+            entries.append({
+                "name": name,
+                "path": filename,
+                "events": count,
+                "first": shard_books[0].date.isoformat() if shard_books else None,
+                "last": shard_books[-1].date.isoformat() if shard_books else None,
+                "bytes": len(data),
+                "sha256": hashlib.sha256(data).hexdigest(),
+            })
+            if source is not None:
+                entries[-1]["source"] = source
+
+        if self.fragments is not None:
+            self.fragments.save()
+
+        entries.sort(key=lambda e: (e["name"] != "upcoming", e["name"]))
+        index = {"feeds": entries}
+        if write_if_changed(feed_dir / FEED_INDEX, json.dumps(index, ensure_ascii=False, indent=2) + "\n"):
+            written += 1
+        logger.info(f"Feeds in {feed_dir}: {len(entries)} shards, {written} files rewritten")
+        return index
+
+    @staticmethod
+    def _previous_entries(feed_dir: Path) -> Dict[str, dict]:
+        """上次寫出的索引項目（名稱 -> 項目）"""
+        try:
+            with (feed_dir / FEED_INDEX).open("r", encoding="utf-8") as f:
+                return {entry["name"]: entry for entry in json.load(f).get("feeds", [])}
+        except (FileNotFoundError, ValueError, KeyError, AttributeError):
+            return {}
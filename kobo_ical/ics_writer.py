@@ -0,0 +1,135 @@
+"""串流式 RFC 5545 ICS 輸出：不建立 ics/icalendar 物件，直接把 VEVENT 寫入檔案或緩衝區"""
+from datetime import date, datetime, timezone
+from typing import BinaryIO, Optional
+
+from .fragment_cache import FragmentCache
+
+CRLF = b"\r\n"
+# RFC 5545 3.1：每行（不含 CRLF）不超過 75 octets，續行以一個空白開頭
+MAX_LINE_OCTETS = 75
+
+_TEXT_ESCAPES = str.maketrans({
+    "\\": "\\\\",
+    ";": "\\;",
+    ",": "\\,",
+    "\n": "\\n",
+    "\r": None,
+})
+
+
+def escape_text(value: str) -> str:
+    """TEXT 值跳脫（RFC 5545 3.3.11）"""
+    return value.translate(_TEXT_ESCAPES)
+
+
+def format_date(value: date) -> str:
+    return f"{value.year:04d}{value.month:02d}{value.day:02d}"
+
+
+def format_datetime_utc(value: datetime) -> str:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return (f"{value.year:04d}{value.month:02d}{value.day:02d}"
+            f"T{value.hour:02d}{value.minute:02d}{value.second:02d}Z")
+
+
+def fold_line(line: str) -> bytes:
+    """編碼為 UTF-8 並在 75 octets 處折行，不切斷多位元組字元"""
+    data = line.encode("utf-8")
+    if len(data) <= MAX_LINE_OCTETS:
+        return data + CRLF
+    if len(data) == len(line):
+        # 純 ASCII：直接依位元組切片
+        parts = [data[:MAX_LINE_OCTETS]]
+        step = MAX_LINE_OCTETS - 1
+        parts.extend(b" " + data[i:i + step] for i in range(MAX_LINE_OCTETS, len(data), step))
+        return CRLF.join(parts) + CRLF
+    parts = []
+    current = bytearray()
+    limit = MAX_LINE_OCTETS
+    for ch in line:
+        encoded = ch.encode("utf-8")
+        if len(current) + len(encoded) > limit:
+            parts.append(bytes(current))
+            # 續行開頭的空白也算在 75 octets 內
+            current = bytearray(b" ")
+        current += encoded
+    parts.append(bytes(current))
+    return CRLF.join(parts) + CRLF
+
+
+class ICSWriter:
+    """逐一寫出 VEVENT 的 VCALENDAR 輸出器
+
+    with ICSWriter(fp, prodid="-//Kobo99//zh-TW//", fragments=cache) as writer:
+        if not writer.cached_event(key):
+            writer.all_day_event(uid=..., start=..., summary=..., cache_key=key)
+    """
+
+    def __init__(self, out: BinaryIO, prodid: str, calname: Optional[str] = None,
+                 fragments: Optional[FragmentCache] = None):
+        self.out = out
+        self.prodid = prodid
+        self.calname = calname
+        # 有快取時，內容未變的事件直接寫出上次序列化的區塊
+        self.fragments = fragments
+        self.count = 0
+        self._open = False
+
+    def __enter__(self):
+        self.begin()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.end()
+
+    def _line(self, name: str, value: str) -> None:
+        self.out.write(fold_line(f"{name}:{value}"))
+
+    def begin(self) -> None:
+        self._line("BEGIN", "VCALENDAR")
+        self._line("VERSION", "2.0")
+        self._line("PRODID", escape_text(self.prodid))
+        if self.calname:
+            self._line("X-WR-CALNAME", escape_text(self.calname))
+        self._open = True
+
+    def cached_event(self, key: str) -> bool:
+        """快取中有此內容雜湊的區塊時直接寫出並回傳 True"""
+        if self.fragments is None:
+            return False
+        cached = self.fragments.get(key)
+        if cached is None:
+            return False
+        self.out.write(cached)
+        self.count += 1
+        return True
+
+    def all_day_event(self, uid: str, start: date, summary: str, dtstamp: datetime,
+                      description: Optional[str] = None, url: Optional[str] = None,
+                      cache_key: Optional[str] = None) -> None:
+        """寫出一個全天事件（DTSTART;VALUE=DATE）；給 cache_key 時一併存入片段快取"""
+        lines = [
+            b"BEGIN:VEVENT\r\n",
+            fold_line(f"UID:{escape_text(uid)}"),
+            fold_line(f"DTSTAMP:{format_datetime_utc(dtstamp)}"),
+            fold_line(f"DTSTART;VALUE=DATE:{format_date(start)}"),
+            fold_line(f"SUMMARY:{escape_text(summary)}"),
+        ]
+        if description:
+            lines.append(fold_line(f"DESCRIPTION:{escape_text(description)}"))
+        if url:
+            # URL 屬於 URI 型別，不做 TEXT 跳脫
+            lines.append(fold_line(f"URL:{url}"))
+        lines.append(b"END:VEVENT\r\n")
+        block = b"".join(lines)
+        if cache_key is not None and self.fragments is not None:
+            self.fragments.put(cache_key, block)
+        self.out.write(block)
+        self.count += 1
+
+    def end(self) -> None:
+        if self._open:
+            self._line("END", "VCALENDAR")
+            self._open = False
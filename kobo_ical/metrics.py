@@ -0,0 +1,173 @@
+"""單次執行的指標：各階段耗時、請求狀態碼、下載量、重試與退避，輸出為 JSON 報告與 Prometheus textfile"""
+import json
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+from functools import wraps
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, Optional, TypeVar, Union
+
+from .storage import write_if_changed
+
+if TYPE_CHECKING:
+    from .profiling import StageProfiler
+
+logger = logging.getLogger(__name__)
+
+REPORT_FORMAT = "run-report:v1"
+METRIC_PREFIX = "kobo99"
+
+F = TypeVar("F", bound=Callable)
+
+
+class RunMetrics:
+    """一次執行（main.py 或服務的一次刷新）累積的指標，可跨 worker 執行緒共用
+
+    階段耗時為該階段所有呼叫的累計秒數：抓取在背景 worker 進行，與解析重疊，
+    加總可能大於 run_seconds。
+    """
+
+    def __init__(self, command: str = "", profiler: Optional["StageProfiler"] = None):
+        self.command = command
+        # 剖析模式：每個階段另外收集 cProfile、tracemalloc 與 RSS
+        self.profiler = profiler
+        self.started_at = datetime.now(timezone.utc)
+        self._started = time.perf_counter()
+        self._finished: Optional[float] = None
+        self.status = "running"
+        self.stages: Dict[str, float] = {}
+        self.stage_calls: Counter = Counter()
+        self.counters: Counter = Counter()
+        # HTTP 狀態碼（連線錯誤記為 "error"）-> 次數
+        self.responses: Counter = Counter()
+        # 週次文章 URL -> 解析出的書籍數
+        self.articles: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    # ------------------------
+    # 記錄
+    # ------------------------
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        profiled = self.profiler.stage(name) if self.profiler is not None else nullcontext()
+        with profiled:
+            start = time.perf_counter()
+            try:
+                yield
+            finally:
+                self.add_time(name, time.perf_counter() - start)
+
+    def timed(self, name: str, func: F) -> F:
+        """包裝函式，每次呼叫的耗時計入 name 階段（串流管線中的單項處理用）"""
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with self.stage(name):
+                return func(*args, **kwargs)
+        return wrapper  # type: ignore[return-value]
+
+    def add_time(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+            self.stage_calls[name] += 1
+
+    def incr(self, name: str, amount: Union[int, float] = 1) -> None:
+        with self._lock:
+            self.counters[name] += amount
+
+    def record_response(self, status: Union[int, str], size: int = 0) -> None:
+        """一次 HTTP 回應（或連線錯誤）與下載的位元組數"""
+        with self._lock:
+            self.responses[str(status)] += 1
+            self.counters["requests"] += 1
+            self.counters["bytes_downloaded"] += size
+
+    def record_article(self, url: str, books: int) -> None:
+        with self._lock:
+            self.articles[url] = books
+            self.counters["articles_parsed"] += 1
+            self.counters["books_parsed"] += books
+
+    def finish(self, status: str = "ok") -> None:
+        """記錄結束時間與狀態；只有第一次呼叫生效"""
+        if self._finished is not None:
+            return
+        self._finished = time.perf_counter()
+        self.status = status
+
+    @property
+    def run_seconds(self) -> float:
+        end = self._finished if self._finished is not None else time.perf_counter()
+        return end - self._started
+
+    # ------------------------
+    # 輸出
+    # ------------------------
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "format": REPORT_FORMAT,
+                "command": self.command,
+                "status": self.status,
+                "started_at": self.started_at.isoformat(timespec="seconds"),
+                "run_seconds": round(self.run_seconds, 3),
+                "stages": {name: {"seconds": round(seconds, 3), "calls": self.stage_calls[name]}
+                           for name, seconds in sorted(self.stages.items())},
+                "requests_by_status": dict(sorted(self.responses.items())),
+                "counters": {name: round(value, 3) if isinstance(value, float) else value
+                             for name, value in sorted(self.counters.items())},
+                "books_per_article": dict(sorted(self.articles.items())),
+            }
+
+    def to_prometheus(self) -> str:
+        """Prometheus textfile collector 格式（皆為最近一次執行的 gauge）"""
+        command = _label(self.command)
+        lines = []
+
+        def metric(name: str, help_text: str, samples: Dict[str, Union[int, float]], label: str = "") -> None:
+            full = f"{METRIC_PREFIX}_{name}"
+            lines.append(f"# HELP {full} {help_text}")
+            lines.append(f"# TYPE {full} gauge")
+            for key, value in samples.items():
+                labels = f'command="{command}"' + (f',{label}="{_label(key)}"' if label else "")
+                lines.append(f"{full}{{{labels}}} {value}")
+
+        data = self.to_dict()
+        metric("last_run_timestamp_seconds", "Start time of the last run",
+               {"": round(self.started_at.timestamp(), 3)})
+        metric("last_run_success", "Whether the last run finished without error",
+               {"": int(self.status == "ok")})
+        metric("run_seconds", "Wall time of the last run", {"": data["run_seconds"]})
+        metric("stage_seconds", "Cumulative time per stage of the last run",
+               {k: v["seconds"] for k, v in data["stages"].items()}, "stage")
+        metric("responses", "HTTP responses of the last run by status code",
+               data["requests_by_status"], "status")
+        for name, value in data["counters"].items():
+            metric(name, f"{name.replace('_', ' ').capitalize()} in the last run", {"": value})
+        return "\n".join(lines) + "\n"
+
+    def write(self, report_path: str = "", textfile_path: str = "") -> None:
+        """寫出 JSON 報告與 Prometheus textfile（路徑為空字串時略過）；失敗只記錄警告"""
+        for path, render in ((report_path, self._report_json), (textfile_path, self.to_prometheus)):
+            if not path:
+                continue
+            try:
+                write_if_changed(Path(path), render())
+            except Exception as exc:
+                logger.warning(f"Failed to write run metrics to {path}: {exc}")
+
+    def _report_json(self) -> str:
+        return json.dumps(self.to_dict(), ensure_ascii=False, indent=2) + "\n"
+
+    def log_summary(self) -> None:
+        stages = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in sorted(self.stages.items()))
+        statuses = ", ".join(f"{code}×{n}" for code, n in sorted(self.responses.items())) or "none"
+        logger.info(f"Run {self.status} in {self.run_seconds:.2f}s; stages: {stages or 'none'}; "
+                    f"responses: {statuses}; {self.counters['bytes_downloaded']} bytes, "
+                    f"{self.counters['retries']} retries, {self.counters['backoff_seconds']:.1f}s backoff")
+
+
+def _label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
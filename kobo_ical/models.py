@@ -1,20 +1,64 @@
 """資料模型定義"""
-from dataclasses import dataclass
 from datetime import date
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from .content_store import ContentStore
+
+# 核心欄位，順序與持久化格式相同（content 另外處理）
+RECORD_FIELDS = ("title", "book_url", "article_url", "date", "week", "year", "article_title")
 
 
-@dataclass
 class BookItem:
-    """書籍項目"""
-    title: str
-    book_url: str
-    article_url: str
-    date: date
-    week: int
-    year: int
-    article_title: str = ""
-    content: str = ""
+    """書籍項目
+
+    核心欄位以 __slots__ 保存；content 可放在 ContentStore，第一次讀取時才依商品 ID 載入。
+    """
+    __slots__ = RECORD_FIELDS + ("_content", "_contents")
+
+    def __init__(self, title: str, book_url: str, article_url: str, date: date, week: int, year: int,
+                 article_title: str = "", content: Optional[str] = "",
+                 contents: Optional["ContentStore"] = None):
+        self.title = title
+        self.book_url = book_url
+        self.article_url = article_url
+        self.date = date
+        self.week = week
+        self.year = year
+        self.article_title = article_title
+        # None 表示尚未載入，讀取 content 時才向 contents 查詢
+        self._content = content
+        self._contents = contents
+
+    @property
+    def content(self) -> str:
+        if self._content is None:
+            self._content = self._contents.get(self.book_url) if self._contents is not None else ""
+        return self._content
+
+    @content.setter
+    def content(self, value: str) -> None:
+        self._content = value
+
+    @property
+    def content_loaded(self) -> bool:
+        """content 是否已在記憶體中（新爬取或已讀取過）"""
+        return self._content is not None
+
+    def replace(self, **changes) -> "BookItem":
+        """複製並修改欄位；未指定 content 時沿用原本的（含尚未載入的狀態）"""
+        fields = {name: getattr(self, name) for name in RECORD_FIELDS}
+        fields.update(changes)
+        fields.setdefault("content", self._content)
+        return BookItem(**fields, contents=self._contents)
+
+    def record(self, with_content: bool = True) -> dict:
+        """持久化用的字典（欄位順序固定）；with_content=False 時不含 content"""
+        data = {name: getattr(self, name) for name in RECORD_FIELDS}
+        data["date"] = self.date.isoformat()
+        if with_content:
+            data["content"] = self.content
+        return data
 
     def to_dict(self) -> dict:
         """轉換為字典"""
@@ -30,19 +74,28 @@ class BookItem:
         }
 
     @classmethod
-    def from_dict(cls, data: dict) -> "BookItem":
-        """從字典創建"""
+    def from_dict(cls, data: dict, contents: Optional["ContentStore"] = None) -> "BookItem":
+        """從字典創建；資料不含 content 且有 contents 時延後載入"""
+        if "content" in data:
+            content = data["content"]
+        else:
+            content = None if contents is not None else ""
         return cls(
             title=data["title"],
             book_url=data["book_url"],
             article_url=data["article_url"],
             article_title=data.get("article_title", ""),
-            content=data.get("content", ""),
+            content=content,
             date=date.fromisoformat(data["date"]),
             week=data["week"],
             year=data["year"],
+            contents=contents,
         )
 
+    def __repr__(self) -> str:
+        return (f"BookItem(title={self.title!r}, book_url={self.book_url!r}, "
+                f"date={self.date!r}, week={self.week!r}, year={self.year!r})")
+
     def __hash__(self) -> int:
         """用於去重"""
         return hash((self.book_url, self.date.isoformat()))
@@ -0,0 +1,101 @@
+"""不存在 / 空白 / 反覆失敗的週次文章負向快取（指數退避 TTL）"""
+import json
+import logging
+import threading
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Optional
+
+from .http_cache import WEEKLY_URL_RE
+from .weeks import WEEKS
+
+logger = logging.getLogger(__name__)
+
+NOT_FOUND = "not_found"
+EMPTY = "empty"
+FAILED = "failed"
+
+# 週一在今天往前這麼多天內（含未來）的週次可能尚未發布：404 / 空白不視為永久缺漏
+RECENT_WEEK_DAYS = 7
+
+
+def is_recent_week(url: str, today: Optional[date] = None, recent_days: int = RECENT_WEEK_DAYS) -> bool:
+    """週次文章是否可能還沒發布；非週次 URL 與不存在的週次回傳 False"""
+    m = WEEKLY_URL_RE.search(url)
+    if not m:
+        return False
+    week_start = WEEKS.week_start(int(m.group(1)), int(m.group(2)))
+    if week_start is None:
+        return False
+    return week_start >= (today or date.today()) - timedelta(days=recent_days)
+
+
+class NegativeCache:
+    """以 URL 為鍵記錄負向結果；同一 URL 每多失敗一次，暫停探測的時間加倍
+
+    近期與未來週次的 404 / 空白代表文章尚未發布，不記錄（每次執行都重新探測）；
+    指數退避只用在確實已不存在的過去週次。
+    """
+
+    def __init__(self, path: str, base_hours: float = 6.0, max_days: float = 30.0,
+                 recent_days: int = RECENT_WEEK_DAYS):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.base = timedelta(hours=base_hours)
+        self.max_ttl = timedelta(days=max_days)
+        self.recent_days = recent_days
+        self._lock = threading.Lock()
+        self.entries: Dict[str, dict] = self._load()
+
+    def _load(self) -> Dict[str, dict]:
+        if not self.path.exists():
+            return {}
+        try:
+            with self.path.open("r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as exc:
+            logger.warning("Failed to load negative cache %s: %s", self.path, exc)
+            return {}
+
+    def _save(self) -> None:
+        tmp = self.path.with_suffix(".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=2, sort_keys=True)
+        tmp.replace(self.path)
+
+    def is_blocked(self, url: str, now: Optional[datetime] = None) -> bool:
+        """TTL 未過期時回傳 True，呼叫端應跳過此 URL"""
+        entry = self.entries.get(url)
+        if not entry:
+            return False
+        now = now or datetime.now()
+        if self._unpublished(url, entry["reason"], now):
+            # 舊版本記錄的未發布週次不再阻擋
+            return False
+        return datetime.fromisoformat(entry["until"]) > now
+
+    def _unpublished(self, url: str, reason: str, now: datetime) -> bool:
+        return reason in (NOT_FOUND, EMPTY) and is_recent_week(url, now.date(), self.recent_days)
+
+    def record(self, url: str, reason: str, now: Optional[datetime] = None) -> None:
+        now = now or datetime.now()
+        if self._unpublished(url, reason, now):
+            logger.info(f"Not yet published, not caching: {url} ({reason})")
+            self.clear(url)
+            return
+        with self._lock:
+            entry = self.entries.get(url) or {"failures": 0, "first_seen": now.isoformat(timespec="seconds")}
+            entry["failures"] += 1
+            ttl = min(self.base * (2 ** (entry["failures"] - 1)), self.max_ttl)
+            entry["reason"] = reason
+            entry["last_seen"] = now.isoformat(timespec="seconds")
+            entry["until"] = (now + ttl).isoformat(timespec="seconds")
+            self.entries[url] = entry
+            self._save()
+        logger.info(f"Negative cache: {url} ({reason}, {entry['failures']}x) until {entry['until']}")
+
+    def clear(self, url: str) -> None:
+        """成功取得內容後移除紀錄"""
+        with self._lock:
+            if self.entries.pop(url, None) is not None:
+                self._save()
@@ -0,0 +1,52 @@
+"""HTML 解析後端：優先使用 lxml，無法使用時退回 html.parser"""
+import logging
+from functools import lru_cache
+from typing import Union
+
+from bs4 import BeautifulSoup, Tag
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BACKEND = "html.parser"
+FAST_BACKEND = "lxml"
+
+# 不含可見文字、只占記憶體的子樹（get_text 本來就不會輸出其內容）
+PRUNED_TAGS = ["script", "style", "template"]
+
+# 文章內文容器，依序嘗試
+ARTICLE_CONTAINERS = ["article", "main"]
+
+
+@lru_cache(maxsize=None)
+def resolve_backend(name: str = "auto") -> str:
+    """auto 代表有 lxml 就用 lxml；指定的後端不可用時退回 html.parser"""
+    name = (name or "auto").strip()
+    if name == DEFAULT_BACKEND:
+        return DEFAULT_BACKEND
+    if name not in ("auto", FAST_BACKEND):
+        logger.warning(f"Unknown HTML parser backend '{name}', using {DEFAULT_BACKEND}")
+        return DEFAULT_BACKEND
+    try:
+        import lxml  # noqa: F401
+    except ImportError:
+        if name == FAST_BACKEND:
+            logger.warning(f"lxml is not installed, falling back to {DEFAULT_BACKEND}")
+        return DEFAULT_BACKEND
+    return FAST_BACKEND
+
+
+def make_soup(html: str, backend: str = "auto") -> BeautifulSoup:
+    """解析 HTML 並移除 script/style 等不需要的子樹"""
+    soup = BeautifulSoup(html, resolve_backend(backend))
+    for tag in soup.find_all(PRUNED_TAGS):
+        tag.decompose()
+    return soup
+
+
+def article_scope(soup: BeautifulSoup) -> Union[BeautifulSoup, Tag]:
+    """回傳包含書單連結的文章容器，略過導覽列、頁尾等區塊；找不到時回傳整份文件"""
+    for name in ARTICLE_CONTAINERS:
+        container = soup.find(name)
+        if container and container.find("a", href=lambda h: h and "/ebook/" in h):
+            return container
+    return soup
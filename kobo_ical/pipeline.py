@@ -0,0 +1,85 @@
+"""串流處理管線：抓取 → 解析 → 日期解析 → 正規化 → 去重 → 輸出
+
+每個階段都是 generator，一次只處理一個項目。抓取階段在背景 worker 預先抓取後面的週次，
+呼叫端解析第 N 週的同時第 N+1 週已在下載；解析完的 HTML 與 soup 隨即釋放，
+只有去重階段保留每個鍵目前的勝出項目。
+"""
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Hashable, Iterable, Iterator, Optional, Tuple, TypeVar
+
+from .http_cache import WEEKLY_URL_RE
+
+logger = logging.getLogger(__name__)
+
+# (週次文章 URL, 年, 週)
+WeekJob = Tuple[str, int, int]
+
+J = TypeVar("J")
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def week_jobs(urls: Iterable[str]) -> Iterator[WeekJob]:
+    """由週次文章 URL 取出 (url, 年, 週)，略過不符合格式的 URL"""
+    for url in urls:
+        m = WEEKLY_URL_RE.search(url)
+        if m:
+            yield url, int(m.group(1)), int(m.group(2))
+
+
+def fetch_stage(jobs: Iterable[J], fetch: Callable[[J], R], prefetch: int = 1) -> Iterator[Tuple[J, R]]:
+    """在背景 worker 執行 fetch，依輸入順序產出 (job, 結果)
+
+    最多有 prefetch 個工作在呼叫端處理目前結果時同時進行；jobs 在呼叫端的執行緒中依序取用。
+    """
+    window = max(1, int(prefetch))
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=window, thread_name_prefix="kobo-fetch") as pool:
+        try:
+            for job in jobs:
+                pending.append((job, pool.submit(fetch, job)))
+                if len(pending) > window:
+                    head, future = pending.popleft()
+                    yield head, future.result()
+            while pending:
+                head, future = pending.popleft()
+                yield head, future.result()
+        finally:
+            # 呼叫端提前停止時，不再執行尚未開始的抓取
+            for _, future in pending:
+                future.cancel()
+
+
+def parse_stage(pages: Iterable[Tuple[J, R]], parse: Callable[[J, R], Iterable[T]]) -> Iterator[T]:
+    """逐頁解析並攤平成單一串流"""
+    for job, payload in pages:
+        yield from parse(job, payload)
+
+
+def map_stage(items: Iterable[T], func: Callable[[T], Optional[R]]) -> Iterator[R]:
+    """逐項轉換；func 回傳 None 的項目會被丟棄（日期解析、正規化用）"""
+    for item in items:
+        result = func(item)
+        if result is not None:
+            yield result
+
+
+def dedup_stage(items: Iterable[T], key: Callable[[T], Hashable],
+                replace: Callable[[T, T], bool],
+                order: Optional[Callable[[T], object]] = None) -> Iterator[T]:
+    """依 key 去重：replace(新, 舊) 為真時以新項目取代
+
+    只保留每個鍵的勝出項目；輸入結束後依首次出現順序（或 order 排序）產出。
+    """
+    winners: Dict[Hashable, T] = {}
+    for item in items:
+        k = key(item)
+        prev = winners.get(k)
+        if prev is None or replace(item, prev):
+            winners[k] = item
+    result = winners.values()
+    if order is not None:
+        result = sorted(result, key=order)
+    yield from result
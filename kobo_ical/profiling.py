@@ -0,0 +1,170 @@
+"""選用的效能剖析模式：每個管線階段的 cProfile、tracemalloc 配置快照與 RSS，寫入帶時間戳的目錄"""
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# 摘要中列出熱點函式的模組（依檔名比對）
+HOT_MODULES = ("crawler.py", "scraper.py", "calendar_manager.py", "ics.py")
+# tracemalloc 記錄的呼叫堆疊深度
+TRACE_FRAMES = 10
+
+
+def current_rss() -> Optional[int]:
+    """目前的常駐記憶體（位元組）；只支援有 /proc 的系統"""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def peak_rss() -> Optional[int]:
+    """行程至今的最高常駐記憶體（位元組）"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KiB 回報，macOS 以位元組回報
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class StageProfiler:
+    """以 RunMetrics.stage 為掛勾，剖析建立者執行緒上的最外層階段
+
+    cProfile 同一執行緒只能有一個作用中的剖析器，因此巢狀階段（parse、dates 等）
+    與 worker 執行緒中的階段（fetch）不另外剖析，其時間已包含在外層階段中。
+    同名階段重複執行時 cProfile 統計會累加，配置快照保留最後一次。
+    """
+
+    def __init__(self, directory: str, command: str = "", top: int = 25):
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        self.directory = Path(directory) / (f"{stamp}-{command}" if command else stamp)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.top = top
+        self.stages: Dict[str, dict] = {}
+        self._profiles: Dict[str, cProfile.Profile] = {}
+        self._owner = threading.get_ident()
+        self._active: Optional[str] = None
+        self._started_tracemalloc = not tracemalloc.is_tracing()
+        if self._started_tracemalloc:
+            tracemalloc.start(TRACE_FRAMES)
+        logger.info(f"Profiling enabled, writing to {self.directory}")
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        if self._active is not None or threading.get_ident() != self._owner:
+            yield
+            return
+        self._active = name
+        profile = self._profiles.setdefault(name, cProfile.Profile())
+        rss_before = current_rss()
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        start = time.perf_counter()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            elapsed = time.perf_counter() - start
+            after = tracemalloc.take_snapshot()
+            traced, traced_peak = tracemalloc.get_traced_memory()
+            self._active = None
+            self._write_allocations(name, before, after)
+            entry = self.stages.setdefault(name, {"calls": 0, "seconds": 0.0})
+            entry["calls"] += 1
+            entry["seconds"] = round(entry["seconds"] + elapsed, 3)
+            entry["traced_peak_bytes"] = max(entry.get("traced_peak_bytes", 0), traced_peak)
+            entry["traced_bytes_after"] = traced
+            entry["rss_before_bytes"] = rss_before
+            entry["rss_after_bytes"] = current_rss()
+            entry["peak_rss_bytes"] = peak_rss()
+
+    def _write_allocations(self, name: str, before: tracemalloc.Snapshot, after: tracemalloc.Snapshot) -> None:
+        """階段前後的配置差異（依行號排序），以及可用 tracemalloc 再分析的完整快照"""
+        filters = [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ]
+        after = after.filter_traces(filters)
+        diff = after.compare_to(before.filter_traces(filters), "lineno")
+        lines = [f"Top {self.top} allocation changes during stage '{name}'"]
+        lines += [str(stat) for stat in diff[:self.top]]
+        (self.directory / f"{name}.alloc.txt").write_text("\n".join(lines) + "\n", encoding="utf-8")
+        after.dump(str(self.directory / f"{name}.tracemalloc"))
+
+    # ------------------------
+    # 輸出
+    # ------------------------
+    def finish(self) -> str:
+        """寫出各階段 .pstats 與 summary.json / summary.txt，回傳熱點摘要"""
+        if self._started_tracemalloc and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        for name, profile in self._profiles.items():
+            profile.dump_stats(str(self.directory / f"{name}.pstats"))
+        summary = self.hot_functions()
+        data = {"stages": self.stages, "hot_functions": summary}
+        (self.directory / "summary.json").write_text(
+            json.dumps(data, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        text = self.format_summary(summary)
+        (self.directory / "summary.txt").write_text(text, encoding="utf-8")
+        logger.info(f"Profile written to {self.directory}\n{text}")
+        return text
+
+    def hot_functions(self, limit: int = 15) -> List[dict]:
+        """HOT_MODULES 中自身耗時（不含呼叫的函式）最高的函式，合併所有階段"""
+        if not self._profiles:
+            return []
+        stats = None
+        for profile in self._profiles.values():
+            if stats is None:
+                stats = pstats.Stats(profile, stream=io.StringIO())
+            else:
+                stats.add(profile)
+        rows = []
+        for (filename, lineno, func), (_, calls, tottime, cumtime, _) in stats.stats.items():
+            if os.path.basename(filename) not in HOT_MODULES:
+                continue
+            rows.append({
+                "function": f"{os.path.basename(filename)}:{lineno}({func})",
+                "calls": calls,
+                "tottime": round(tottime, 4),
+                "cumtime": round(cumtime, 4),
+            })
+        rows.sort(key=lambda r: r["tottime"], reverse=True)
+        return rows[:limit]
+
+    def format_summary(self, hot: List[dict]) -> str:
+        lines = [f"{'Stage':<12} {'seconds':>9} {'traced peak':>14} {'peak RSS':>14}"]
+        for name, entry in self.stages.items():
+            lines.append(f"{name:<12} {entry['seconds']:>9.3f} {_mib(entry.get('traced_peak_bytes'))} "
+                         f"{_mib(entry.get('peak_rss_bytes'))}")
+        lines.append("")
+        lines.append(f"Hottest functions in {', '.join(HOT_MODULES)} (by own time):")
+        for row in hot:
+            lines.append(f"  {row['tottime']:>8.4f}s own {row['cumtime']:>8.4f}s cum "
+                         f"{row['calls']:>7} calls  {row['function']}")
+        if not hot:
+            lines.append("  (no samples)")
+        return "\n".join(lines) + "\n"
+
+
+def _mib(value: Optional[int]) -> str:
+    return f"{value / 1048576:>10.1f} MiB" if value is not None else f"{'n/a':>14}"
@@ -0,0 +1,56 @@
+"""每主機共用的 token bucket 限速器"""
+import threading
+import time
+from typing import Dict
+from urllib.parse import urlsplit
+
+
+class TokenBucket:
+    """Token bucket：每 interval 秒補充一個 token，最多累積 capacity 個（突發上限）"""
+
+    def __init__(self, interval: float, capacity: int = 1):
+        self.interval = max(0.0, float(interval))
+        self.capacity = max(1, int(capacity))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """取得一個 token，不足時阻塞等待；回傳實際等待秒數"""
+        if self.interval <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) / self.interval)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                wait = (1 - self.tokens) * self.interval
+            time.sleep(wait)
+            waited += wait
+
+
+class HostRateLimiter:
+    """依 URL 主機分配 token bucket，供多個 worker 共用"""
+
+    def __init__(self, interval: float, capacity: int = 1):
+        self.interval = interval
+        self.capacity = capacity
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, url: str) -> TokenBucket:
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(self.interval, self.capacity)
+                self._buckets[host] = bucket
+            return bucket
+
+    def acquire(self, url: str) -> float:
+        """在對該主機發出請求前呼叫"""
+        return self.bucket(url).acquire()
@@ -0,0 +1,209 @@
+"""重試策略：指數退避（full jitter）、Retry-After、每主機斷路器與整體執行期限"""
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+from .config import Settings
+
+logger = logging.getLogger(__name__)
+
+# 會帶 Retry-After 的狀態碼
+RETRY_AFTER_STATUSES = (429, 503)
+
+
+def is_retryable(status: int) -> bool:
+    """短暫性錯誤：Cloudflare 擋下（403）、逾時、限流與伺服器錯誤"""
+    return status in (403, 408, 429) or 500 <= status < 600
+
+
+def parse_retry_after(value: Optional[str], now: Optional[datetime] = None) -> Optional[float]:
+    """Retry-After 標頭（秒數或 HTTP 日期）轉為等待秒數；無法解析時回傳 None"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - (now or datetime.now(timezone.utc))).total_seconds())
+
+
+class CircuitBreaker:
+    """單一主機的斷路器：連續失敗 threshold 次後斷開 cooldown 秒，之後進入半開狀態
+
+    半開時一次只放行一個試探請求，試探成功即恢復；失敗則重新斷開並計算冷卻時間。
+    試探請求超過 cooldown 仍未回報結果時，視為遺失並放行下一個試探。
+    """
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = max(1, int(threshold))
+        self.cooldown = max(0.0, float(cooldown))
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        # 斷開（或試探失敗重新斷開）時那次失敗的狀態碼；連線錯誤為 None
+        self.opened_status: Optional[int] = None
+        # 半開狀態中試探請求的放行時間
+        self.probe_started: Optional[float] = None
+
+    def is_open(self) -> bool:
+        """是否擋下請求（不佔用試探名額）"""
+        if self.opened_at is None:
+            return False
+        now = time.monotonic()
+        if now - self.opened_at < self.cooldown:
+            return True
+        return self.probe_started is not None and now - self.probe_started < self.cooldown
+
+    def allow(self) -> bool:
+        """是否放行一個請求；半開時放行者即為試探請求"""
+        if self.is_open():
+            return False
+        if self.opened_at is not None:
+            self.probe_started = time.monotonic()
+        return True
+
+    def success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.opened_status = None
+        self.probe_started = None
+
+    def failure(self, status: Optional[int] = None) -> bool:
+        """記錄一次失敗（status 為回應的狀態碼）；回傳此次是否使斷路器斷開"""
+        self.failures += 1
+        if self.failures < self.threshold:
+            return False
+        was_closed = self.opened_at is None
+        self.opened_at = time.monotonic()
+        self.opened_status = status
+        self.probe_started = None
+        return was_closed
+
+
+class RetryPolicy:
+    """KoboCrawler 與 Scraper 共用的重試策略；期限自建立時（執行開始）起算
+
+    期限到達後不再發出新請求，已抓到的結果照常解析與儲存。
+    """
+
+    def __init__(self, attempts: int = 4, base_delay: float = 2.0, max_delay: float = 30.0,
+                 max_retry_after: float = 120.0, breaker_threshold: int = 5,
+                 breaker_cooldown: float = 300.0, deadline_seconds: float = 0.0):
+        self.attempts = max(1, int(attempts))
+        self.base_delay = max(0.0, float(base_delay))
+        self.max_delay = max(self.base_delay, float(max_delay))
+        self.max_retry_after = float(max_retry_after)
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.deadline = time.monotonic() + deadline_seconds if deadline_seconds > 0 else None
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+        self._expired_logged = False
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "RetryPolicy":
+        return cls(
+            attempts=settings.retries + 1,
+            base_delay=settings.retry_base_seconds,
+            max_delay=settings.retry_max_seconds,
+            max_retry_after=settings.retry_after_max_seconds,
+            breaker_threshold=settings.circuit_breaker_failures,
+            breaker_cooldown=settings.circuit_breaker_cooldown_seconds,
+            deadline_seconds=settings.run_deadline_seconds,
+        )
+
+    # ------------------------
+    # 執行期限
+    # ------------------------
+    def remaining(self) -> Optional[float]:
+        """距離期限的秒數；沒有期限時回傳 None"""
+        if self.deadline is None:
+            return None
+        return self.deadline - time.monotonic()
+
+    def expired(self) -> bool:
+        remaining = self.remaining()
+        if remaining is None or remaining > 0:
+            return False
+        if not self._expired_logged:
+            self._expired_logged = True
+            logger.warning("Run deadline reached, skipping remaining requests")
+        return True
+
+    # ------------------------
+    # 退避
+    # ------------------------
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> Optional[float]:
+        """第 attempt 次（0 起算）失敗後的等待秒數；不該再重試時回傳 None
+
+        有 Retry-After 時照伺服器要求等待（超過 max_retry_after 則放棄），
+        否則在 [0, min(max_delay, base_delay * 2^attempt)] 間均勻取值。
+        等待會超過執行期限時同樣放棄。
+        """
+        if attempt + 1 >= self.attempts:
+            return None
+        if retry_after is not None:
+            if retry_after > self.max_retry_after:
+                logger.warning(f"Retry-After {retry_after:.0f}s exceeds {self.max_retry_after:.0f}s, giving up")
+                return None
+            delay = retry_after
+        else:
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        remaining = self.remaining()
+        if remaining is not None and delay >= remaining:
+            return None
+        return delay
+
+    # ------------------------
+    # 斷路器
+    # ------------------------
+    def breaker(self, url: str) -> CircuitBreaker:
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            breaker = self._breakers.get(host)
+            if breaker is None:
+                breaker = CircuitBreaker(self.breaker_threshold, self.breaker_cooldown)
+                self._breakers[host] = breaker
+            return breaker
+
+    def allow(self, url: str) -> bool:
+        """主機的斷路器是否放行請求；冷卻結束後一次只放行一個試探請求"""
+        breaker = self.breaker(url)
+        with self._lock:
+            return breaker.allow()
+
+    def is_open(self, url: str) -> bool:
+        """主機是否斷路中（只查詢狀態，不佔用試探名額）"""
+        breaker = self.breaker(url)
+        with self._lock:
+            return breaker.is_open()
+
+    def opened_on_forbidden(self, url: str) -> bool:
+        """主機的斷路器是否因 403（Cloudflare 擋下）斷開；此時改走瀏覽器才有意義"""
+        breaker = self.breaker(url)
+        with self._lock:
+            return breaker.opened_at is not None and breaker.opened_status == 403
+
+    def record_success(self, url: str) -> None:
+        breaker = self.breaker(url)
+        with self._lock:
+            breaker.success()
+
+    def record_failure(self, url: str, status: Optional[int] = None) -> bool:
+        """記錄失敗（status 為回應的狀態碼，連線錯誤為 None）；回傳此次是否使主機的斷路器斷開"""
+        breaker = self.breaker(url)
+        with self._lock:
+            opened = breaker.failure(status)
+        if opened:
+            logger.warning(f"Circuit opened for {urlsplit(url).netloc} after {breaker.failures} "
+                           f"consecutive failures, pausing requests for {breaker.cooldown:.0f}s")
+        return opened
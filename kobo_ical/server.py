@@ -0,0 +1,283 @@
+"""內建 HTTP feed 伺服器：記憶體中預先壓縮的 ICS、強 ETag / 304，過期時背景刷新
+
+請求只讀取記憶體中已產生的位元組，永遠不會等待爬取；超過 refresh_interval_hours 後，
+第一個請求觸發背景刷新，刷新完成前繼續提供舊內容。
+
+  python -m kobo_ical.server --port 8000
+"""
+import argparse
+import gzip
+import hashlib
+import logging
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .config import Settings
+from .ics import FEED_INDEX, write_if_changed
+from .service import Kobo99ICalService
+
+try:
+    import brotli
+except ImportError:  # brotli 為選用套件
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+FULL_FEED_PATH = "/kobo99.ics"
+FEEDS_PREFIX = "/feeds/"
+CONTENT_TYPES = {
+    ".ics": "text/calendar; charset=utf-8",
+    ".json": "application/json; charset=utf-8",
+}
+# 刷新失敗後多久再試（秒）
+FAILED_REFRESH_RETRY_SECONDS = 600
+# 尚未有任何內容時回應 503 的 Retry-After（秒）
+WARMING_RETRY_AFTER = 60
+
+
+class RenderedFeed:
+    """一份 feed 的原始與預先壓縮版本，各自帶有強 ETag"""
+
+    def __init__(self, body: bytes, content_type: str):
+        self.body = body
+        self.content_type = content_type
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        # 不同編碼是不同的表示，強 ETag 必須不同
+        self.variants: Dict[str, Tuple[bytes, str]] = {
+            "identity": (body, f'"{digest}"'),
+            "gzip": (gzip.compress(body, compresslevel=9, mtime=0), f'"{digest}-gz"'),
+        }
+        if brotli is not None:
+            self.variants["br"] = (brotli.compress(body), f'"{digest}-br"')
+
+    def select(self, accept_encoding: str) -> Tuple[str, bytes, str]:
+        """依 Accept-Encoding 選擇編碼，回傳 (編碼, 內容, ETag)"""
+        accepted = parse_accept_encoding(accept_encoding)
+        for encoding in ("br", "gzip"):
+            if encoding in self.variants and accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+                body, etag = self.variants[encoding]
+                return encoding, body, etag
+        body, etag = self.variants["identity"]
+        return "identity", body, etag
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """Accept-Encoding -> {編碼: q 值}"""
+    result: Dict[str, float] = {}
+    for part in (header or "").split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        result[token] = q
+    return result
+
+
+def etag_matches(if_none_match: str, etags: List[str]) -> bool:
+    """If-None-Match 採弱比較（RFC 9110 13.1.2）"""
+    if if_none_match.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return any(etag in candidates for etag in etags)
+
+
+class FeedServer:
+    """持有目前的 feed 並負責背景刷新；HTTP handler 只讀取 self.feeds"""
+
+    def __init__(self, settings: Optional[Settings] = None,
+                 render: Optional[Callable[[], bytes]] = None):
+        self.settings = settings or Settings()
+        self._render = render or self._render_with_service
+        self.interval = self.settings.refresh_interval_hours * 3600
+        # 整份替換，handler 讀取時不需鎖
+        self.feeds: Dict[str, RenderedFeed] = {}
+        self.rendered_at: Optional[float] = None
+        self._next_refresh = 0.0
+        self._refresh_lock = threading.Lock()
+        self._refreshing = False
+        self._load_static()
+
+    # ------------------------
+    # 內容來源
+    # ------------------------
+    def _render_with_service(self) -> bytes:
+        return Kobo99ICalService(self.settings).generate_ical().encode("utf-8")
+
+    def _load_static(self) -> None:
+        """啟動時先載入上次輸出的檔案，伺服器立即可用"""
+        path = Path(self.settings.ics_path)
+        if not path.exists():
+            logger.info(f"No static feed at {path}; the first request triggers a refresh")
+            return
+        feeds = {FULL_FEED_PATH: RenderedFeed(path.read_bytes(), CONTENT_TYPES[".ics"])}
+        feeds.update(self._load_shards({}))
+        self.feeds = feeds
+        age = max(0.0, time.time() - path.stat().st_mtime)
+        self.rendered_at = time.monotonic() - age
+        self._next_refresh = self.rendered_at + self.interval
+        logger.info(f"Loaded static feed {path} ({age / 3600:.1f}h old)")
+
+    def _load_shards(self, current: Dict[str, RenderedFeed]) -> Dict[str, RenderedFeed]:
+        """讀取 feed_dir 中的分片；內容未變的沿用既有的壓縮結果"""
+        feeds: Dict[str, RenderedFeed] = {}
+        if not self.settings.feed_dir:
+            return feeds
+        feed_dir = Path(self.settings.feed_dir)
+        if not (feed_dir / FEED_INDEX).exists():
+            return feeds
+        for path in sorted(feed_dir.iterdir()):
+            content_type = CONTENT_TYPES.get(path.suffix)
+            if content_type is None or not path.is_file():
+                continue
+            url_path = FEEDS_PREFIX + path.name
+            feeds[url_path] = self._reuse(current.get(url_path), path.read_bytes(), content_type)
+        return feeds
+
+    @staticmethod
+    def _reuse(previous: Optional[RenderedFeed], body: bytes, content_type: str) -> RenderedFeed:
+        if previous is not None and previous.body == body:
+            return previous
+        return RenderedFeed(body, content_type)
+
+    # ------------------------
+    # 刷新
+    # ------------------------
+    def is_stale(self) -> bool:
+        return time.monotonic() >= self._next_refresh
+
+    def maybe_refresh(self) -> bool:
+        """內容過期且沒有刷新在進行時，啟動背景刷新；回傳是否啟動"""
+        if not self.is_stale():
+            return False
+        with self._refresh_lock:
+            if self._refreshing or not self.is_stale():
+                return False
+            self._refreshing = True
+        threading.Thread(target=self._refresh_worker, name="kobo-feed-refresh", daemon=True).start()
+        return True
+
+    def _refresh_worker(self) -> None:
+        try:
+            self.refresh()
+        finally:
+            with self._refresh_lock:
+                self._refreshing = False
+
+    def refresh(self) -> None:
+        """重新產生所有 feed（阻塞）；失敗時保留舊內容並稍後重試"""
+        started = time.monotonic()
+        try:
+            body = self._render()
+        except Exception:
+            logger.warning("Feed refresh failed, keeping the previous feed", exc_info=True)
+            self._next_refresh = time.monotonic() + min(self.interval, FAILED_REFRESH_RETRY_SECONDS)
+            return
+        current = self.feeds
+        feeds = {FULL_FEED_PATH: self._reuse(current.get(FULL_FEED_PATH), body, CONTENT_TYPES[".ics"])}
+        feeds.update(self._load_shards(current))
+        self.feeds = feeds
+        self.rendered_at = time.monotonic()
+        self._next_refresh = self.rendered_at + self.interval
+        if self.settings.ics_path:
+            write_if_changed(self.settings.ics_path, body)
+        logger.info(f"Feeds refreshed in {self.rendered_at - started:.1f}s ({len(feeds)} paths)")
+
+    # ------------------------
+    # HTTP
+    # ------------------------
+    def make_handler(self):
+        server = self
+
+        class FeedRequestHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            server_version = "kobo99-ical"
+
+            def do_GET(self):
+                self._serve(send_body=True)
+
+            def do_HEAD(self):
+                self._serve(send_body=False)
+
+            def _serve(self, send_body: bool) -> None:
+                server.maybe_refresh()
+                path = self.path.split("?", 1)[0]
+                if path == "/":
+                    path = FULL_FEED_PATH
+                feeds = server.feeds
+                feed = feeds.get(path)
+                if feed is None:
+                    if not feeds and path == FULL_FEED_PATH:
+                        self._empty(HTTPStatus.SERVICE_UNAVAILABLE, {"Retry-After": str(WARMING_RETRY_AFTER)})
+                    else:
+                        self._empty(HTTPStatus.NOT_FOUND)
+                    return
+
+                encoding, body, etag = feed.select(self.headers.get("Accept-Encoding", ""))
+                headers = {
+                    "ETag": etag,
+                    "Vary": "Accept-Encoding",
+                    "Cache-Control": f"public, max-age=300, stale-while-revalidate={int(server.interval)}",
+                }
+                # 只比對這次選出的表示：304 帶的 ETag 必須是用戶端快取中與之相符的那一份
+                if_none_match = self.headers.get("If-None-Match")
+                if if_none_match and etag_matches(if_none_match, [etag]):
+                    self._empty(HTTPStatus.NOT_MODIFIED, headers)
+                    return
+
+                self.send_response(HTTPStatus.OK)
+                self.send_header("Content-Type", feed.content_type)
+                self.send_header("Content-Length", str(len(body)))
+                if encoding != "identity":
+                    self.send_header("Content-Encoding", encoding)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                if send_body:
+                    self.wfile.write(body)
+
+            def _empty(self, status: HTTPStatus, headers: Optional[Dict[str, str]] = None) -> None:
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                if status != HTTPStatus.NOT_MODIFIED:
+                    self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                logger.debug("%s - %s", self.address_string(), format % args)
+
+        return FeedRequestHandler
+
+    def serve_forever(self, host: str = "0.0.0.0", port: int = 8000) -> None:
+        httpd = ThreadingHTTPServer((host, port), self.make_handler())
+        httpd.daemon_threads = True
+        logger.info(f"Serving feeds on http://{host}:{port}{FULL_FEED_PATH}")
+        self.maybe_refresh()
+        try:
+            httpd.serve_forever()
+        finally:
+            httpd.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the Kobo 99 iCal feeds over HTTP")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    FeedServer().serve_forever(args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
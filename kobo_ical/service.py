@@ -1,13 +1,25 @@
 """Kobo 99 iCal 服務"""
+import hashlib
 import logging
+import os
 import re
 from datetime import date, timedelta
-from typing import List, Optional
+from itertools import chain
+from typing import Iterable, Iterator, List, Optional, Tuple
 
+from .backfill import BackfillPlanner
+from .cold_archive import ColdArchive, split_tiers
 from .config import Settings
+from .content_store import ContentStore
+from .coverage import CoverageIndex
 from .crawler import KoboCrawler
+from .event_store import EventStore
+from .extraction import PLACEHOLDER_TITLE_RE, PRICE_RE, URL_RE, canonical_book_url
 from .ics import ICSGenerator
+from .metrics import RunMetrics
 from .models import BookItem
+from .pipeline import dedup_stage, map_stage
+from .profiling import StageProfiler
 from .storage import Storage
 
 logger = logging.getLogger(__name__)
@@ -16,117 +28,216 @@ logger = logging.getLogger(__name__)
 class Kobo99ICalService:
     """Kobo 99 iCal 服務主類別"""
 
-    def __init__(self, settings: Optional[Settings] = None):
+    def __init__(self, settings: Optional[Settings] = None, replay: Optional[bool] = None):
         self.settings = settings or Settings()
-        self.storage = Storage(self.settings.data_store)
+        if replay is not None:
+            # replay=True 時整個流程只讀取 HTML 封存，不連網
+            self.settings = self.settings.model_copy(update={"replay": replay})
+        # content 另存於壓縮 blob 儲存，事件紀錄只保留核心欄位
+        self.contents = ContentStore(self.settings.content_store_path) if self.settings.content_store_path else None
+        # data_store JSON 一律保存完整 content，不依賴 content 儲存（未納入版本控制）
+        self.storage = Storage(self.settings.data_store, append_log=self.settings.event_log,
+                               compact_records=self.settings.event_log_compact_records)
+        self.cold = ColdArchive(self.settings.cold_dir, self.contents) if self.settings.cold_dir else None
         self.crawler = None
         self.ics_generator = ICSGenerator(self.settings)
+        # 最近一次執行的指標；generate_ical 每次重新建立
+        self.metrics = RunMetrics("service")
 
     def crawl_books(self, start_year: Optional[int] = None, start_week: Optional[int] = None,
                     end_year: Optional[int] = None, end_week: Optional[int] = None,
-                    use_random_delay: bool = False) -> List[BookItem]:
-        """爬取書籍資料"""
-        with KoboCrawler(self.settings) as crawler:
+                    use_random_delay: bool = False, crawler: Optional[KoboCrawler] = None) -> List[BookItem]:
+        """爬取書籍資料；傳入 crawler 時沿用其連線與本次執行的請求記憶"""
+        if crawler is not None:
+            return crawler.crawl_weekly_books(start_year, start_week, end_year, end_week, use_random_delay=use_random_delay)
+        with KoboCrawler(self.settings, self.metrics) as crawler:
             books = crawler.crawl_weekly_books(start_year, start_week, end_year, end_week, use_random_delay=use_random_delay)
         return books
 
-    def merge_books(self, new_books: List[BookItem], existing_books: List[BookItem]) -> List[BookItem]:
-        """合併新舊書籍資料，依 book_url 去重並偏好較新的日期"""
-        books_dict = {}
-        # 先加入現有書籍
-        for book in existing_books:
-            books_dict[book.book_url] = book
-        # 再加入新書籍（若同一 book_url 重複，保留較新的日期）
-        for book in new_books:
-            prev = books_dict.get(book.book_url)
-            if not prev or (book.date and prev.date and book.date >= prev.date):
-                books_dict[book.book_url] = book
-        return list(books_dict.values())
+    def open_store(self) -> Optional[EventStore]:
+        """開啟 SQLite 事件資料庫；首次開啟時匯入既有的 data_store JSON"""
+        if not self.settings.event_db_path:
+            return None
+        return EventStore(self.settings.event_db_path, import_json=self.settings.data_store, contents=self.contents)
+
+    def open_coverage(self, hot_books: List[BookItem]) -> Optional[CoverageIndex]:
+        """開啟覆蓋索引；索引檔不存在時由熱資料與冷資料層的日期建立一次"""
+        if not self.settings.coverage_path:
+            return None
+        coverage = CoverageIndex(self.settings.coverage_path)
+        if not coverage.exists:
+            cold_books = self.cold.iter_all() if self.cold is not None else ()
+            coverage.rebuild([b.date for b in hot_books] + [b.date for b in cold_books])
+            logger.info(f"Built coverage index {self.settings.coverage_path}")
+        return coverage
+
+    def load_coverage(self) -> Optional[CoverageIndex]:
+        """--coverage 使用：開啟覆蓋索引；索引檔不存在時由已儲存的事件（資料庫或 data_store）與冷資料層建立，不寫入"""
+        if not self.settings.coverage_path:
+            return None
+        coverage = CoverageIndex(self.settings.coverage_path)
+        if coverage.exists:
+            return coverage
+        # 只讀取既有的資料庫，不為了查詢而由 JSON 匯入建立新檔
+        store = self.open_store() if os.path.exists(self.settings.event_db_path or "") else None
+        try:
+            hot_books = store.load() if store is not None else self.storage.load()
+        finally:
+            if store is not None:
+                store.close()
+        cold_books = self.cold.iter_all() if self.cold is not None else ()
+        coverage.rebuild([b.date for b in hot_books] + [b.date for b in cold_books])
+        logger.info(f"No coverage index at {self.settings.coverage_path}, built from {len(hot_books)} stored books")
+        return coverage
+
+    def coverage_window(self) -> Tuple[date, date]:
+        """覆蓋檢查的範圍：保留期間的起點到今天（與回補相同）"""
+        today = date.today()
+        return today - timedelta(days=self.settings.retention_past_days), today
+
+    @staticmethod
+    def merge_books(new_books: Iterable[BookItem], existing_books: Iterable[BookItem]) -> Iterator[BookItem]:
+        """合併新舊書籍資料，依 book_url 去重並偏好較新的日期
+
+        new_books 可以是爬取中的 generator：逐項併入以 book_url 為鍵的字典，
+        重複抓到的書籍不會累積，輸入結束後依首次出現順序（現有書籍在前）產出。
+        """
+        return dedup_stage(
+            chain(existing_books, new_books),
+            key=lambda b: b.book_url,
+            replace=lambda new, prev: bool(new.date and prev.date and new.date >= prev.date),
+        )
 
     def generate_ical(self, start_year: Optional[int] = None, start_week: Optional[int] = None,
                       end_year: Optional[int] = None, end_week: Optional[int] = None,
                       use_random_delay: bool = False) -> str:
-        """生成 ICS 檔案內容"""
-        # 載入現有資料
-        existing_books = self.storage.load()
-        logger.info(f"Loaded {len(existing_books)} existing books from storage")
+        """生成 ICS 檔案內容；本次執行的指標寫入 run_report_path（剖析模式另寫入 profile_dir）"""
+        profiler = StageProfiler(self.settings.profile_dir, "service") if self.settings.profile else None
+        self.metrics = RunMetrics("service", profiler)
+        store = self.open_store()
+        try:
+            return self._generate_ical(store, start_year, start_week, end_year, end_week, use_random_delay)
+        except BaseException:
+            self.metrics.finish("error")
+            raise
+        finally:
+            if store is not None:
+                store.close()
+            self.write_metrics()
 
-        # 爬取新資料
-        logger.info("Starting to crawl books...")
-        new_books = self.crawl_books(start_year, start_week, end_year, end_week, use_random_delay=use_random_delay)
+    def write_metrics(self) -> None:
+        """結束本次執行的指標，寫出 JSON 報告與（設定時）Prometheus textfile"""
+        self.metrics.finish()
+        self.metrics.log_summary()
+        self.metrics.write(self.settings.run_report_path, self.settings.metrics_textfile_path)
+        if self.metrics.profiler is not None:
+            self.metrics.profiler.finish()
 
-        # 合併資料
-        all_books = self.merge_books(new_books, existing_books)
-        logger.info(f"Merged to {len(all_books)} total books")
+    def _generate_ical(self, store: Optional[EventStore], start_year, start_week, end_year, end_week,
+                       use_random_delay: bool) -> str:
+        metrics = self.metrics
+        # 載入現有資料（只有熱資料）
+        with metrics.stage("load"):
+            existing_books = store.load() if store is not None else self.storage.load()
+            logger.info(f"Loaded {len(existing_books)} existing books from storage")
+            coverage = self.open_coverage(existing_books)
 
-        # 回補缺漏週次
-        try:
-            today = date.today()
-            past_cutoff = today - timedelta(days=self.settings.retention_past_days)
-            future_cutoff = today
-            present_dates = {b.date for b in all_books if b.date}
-            missing_weeks = set()
-            d = past_cutoff
-            while d <= future_cutoff:
-                if d not in present_dates:
-                    y, w, _ = d.isocalendar()
-                    missing_weeks.add((int(y), int(min(w, 54))))
-                d += timedelta(days=1)
-            for (y, w) in sorted(missing_weeks):
-                extra = self.crawl_books(y, w, y, w, use_random_delay=use_random_delay)
-                if extra:
-                    all_books.extend(extra)
-            logger.info(f"After backfill, total books: {len(all_books)}")
-        except Exception:
-            logger.warning("Backfill step failed", exc_info=True)
-
-        # 內嵌清理：移除錯誤標題、正規化商品頁 URL
-        import re as _re
-        cleaned_inline: List[BookItem] = []
-        for b in all_books:
-            title = (b.title or '').strip()
-            if not title or _re.fullmatch(r'(查看電子書（HK）|查看電子書|閱讀電子書|電子書)', title):
-                continue
-            content = (getattr(b, 'content', '') or '').strip()
-            content = _re.sub(r'https?://\S+', '', content)
-            content = _re.sub(r'99元|NT\$?\s*99|HK\$?\s*99|購買|查看電子書（HK）|查看電子書', '', content)
-            book_url = _re.sub(r'https://www\.kobo\.com/hk/zh/ebook/', 'https://www.kobo.com/tw/zh/ebook/', b.book_url)
-            book_url = _re.sub(r'https://www\.kobo\.com/zh/ebook/', 'https://www.kobo.com/tw/zh/ebook/', book_url)
+        with KoboCrawler(self.settings, metrics) as crawler:
+            # 抓取 → 解析 → 合併：逐週串流直接併入以 book_url 為鍵的字典，不另外保留本次抓到的清單；
+            # 解析目前週次時後續週次已在背景下載
+            logger.info("Starting to crawl books...")
+            with metrics.stage("crawl"):
+                crawled = crawler.iter_weekly_books(start_year, start_week, end_year, end_week,
+                                                    use_random_delay=use_random_delay)
+                merged = list(self.merge_books(crawled, existing_books))
+            logger.info(f"Merged to {len(merged)} total books")
+
+            # 回補缺漏週次（同一個 crawler，已抓過的 URL 不重複請求）；
+            # 有覆蓋索引時，合併結果中已入庫的日期本來就已覆蓋
+            backfilled: List[BookItem] = []
             try:
-                from urllib.parse import urlsplit
-                path = urlsplit(book_url).path
-                mprod = _re.search(r'/ebook/([^/]+)', path)
-                if mprod:
-                    book_url = f"https://www.kobo.com/tw/zh/ebook/{mprod.group(1)}"
+                with metrics.stage("backfill"):
+                    report = BackfillPlanner(self.settings).run(
+                        crawler, merged, use_random_delay=use_random_delay, store=store, coverage=coverage)
+                backfilled = report.books
+                logger.info(f"After backfill, total books: {len(merged) + len(backfilled)}")
             except Exception:
-                pass
-            cleaned_inline.append(BookItem(
-                title=title,
-                book_url=book_url,
-                article_url=b.article_url,
-                article_title=getattr(b, 'article_title', ''),
-                content=content,
-                date=b.date,
-                week=b.week,
-                year=b.year,
+                logger.warning("Backfill step failed", exc_info=True)
+            metrics.incr("memo_hits", crawler.memo_hits)
+
+        # 正規化 → 去重：移除錯誤標題、正規化商品頁 URL，以 book_url 去重並偏好較早日期。
+        # 逐項串流，只有去重字典保留每個 book_url 的勝出項目；合併清單隨後釋放。
+        # 熱資料（保留期間內的書籍）需整份寫入與產生 ICS，因此最後仍是一份清單，
+        # 其大小取決於保留期間，與本次爬取的週數無關。
+        with metrics.stage("clean"):
+            cleaned = map_stage(chain(merged, backfilled), self.clean_book)
+            all_books = list(dedup_stage(
+                cleaned,
+                key=lambda b: b.book_url,
+                replace=lambda new, prev: bool(new.date and prev.date and new.date <= prev.date),
             ))
-        # 以 book_url 去重，偏好較新日期
-        unique_inline = {}
-        for b in cleaned_inline:
-            prev = unique_inline.get(b.book_url)
-            if not prev or (b.date and prev.date and b.date <= prev.date):
-                unique_inline[b.book_url] = b
-        all_books = list(unique_inline.values())
+            del merged, backfilled
         logger.info(f"Cleaned inline to {len(all_books)} books")
 
-        # 儲存合併後的資料
-        self.storage.save(all_books)
+        with metrics.stage("save"):
+            contents_written = self.contents.put_many(all_books) if self.contents is not None else 0
+
+            # 分層：保留期間之前的事件移入冷資料層，熱資料量不隨歷史累積而成長
+            if self.cold is not None:
+                cutoff, _ = self.ics_generator.retention_window()
+                all_books, cold_books = split_tiers(all_books, cutoff)
+                if cold_books:
+                    self.cold.add(cold_books, coverage)
+                    logger.info(f"Migrated {len(cold_books)} books older than {cutoff} to the cold tier")
+
+            # 儲存合併後的資料：資料庫只改寫有變動的列，JSON 僅為相容而匯出，
+            # 且只在資料（或 content）有變動、或 JSON 不存在時才整份重寫
+            if store is not None:
+                stats = store.sync(all_books)
+                if stats["written"] or stats["deleted"] or contents_written or not os.path.exists(self.settings.data_store):
+                    store.export_json(self.settings.data_store)
+                else:
+                    logger.info(f"Event store unchanged, not exporting {self.settings.data_store}")
+            else:
+                self.storage.save(all_books)
         logger.info(f"Saved {len(all_books)} books to storage")
+        metrics.incr("books_stored", len(all_books))
 
-        # 生成 ICS
-        ical_content = self.ics_generator.generate_ics(all_books)
+        # 生成 ICS：有資料庫時以日期索引只取出保留期間內的事件
+        with metrics.stage("render"):
+            if store is not None:
+                ical_content = self.ics_generator.generate_from_store(store)
+            else:
+                ical_content = self.ics_generator.generate_ics(all_books)
+
+        if coverage is not None:
+            with metrics.stage("coverage"):
+                coverage.update(before=(b.date for b in existing_books), after=(b.date for b in all_books))
+                coverage.save()
+                summary = coverage.summary(*self.coverage_window())
+            logger.info(f"Coverage: {summary['covered_days']}/{summary['days']} days, "
+                        f"{len(summary['gaps'])} gaps, sparse weeks: {summary['sparse_weeks'] or 'none'}")
+
+        # 分片 feed：訂閱者只需輪詢小的近期 feed，年度封存內容不變就不重寫
+        if self.settings.feed_dir:
+            with metrics.stage("feeds"):
+                self.ics_generator.write_feeds(all_books, cold=self.cold)
         return ical_content
 
+    @staticmethod
+    def clean_book(b: BookItem) -> Optional[BookItem]:
+        """正規化單本書籍；錯誤標題（如「查看電子書」）回傳 None"""
+        title = (b.title or '').strip()
+        if not title or PLACEHOLDER_TITLE_RE.fullmatch(title):
+            return None
+        if not b.content_loaded:
+            # 尚未載入的 content 已在入庫前清理過，不為此讀取
+            return b.replace(title=title, book_url=canonical_book_url(b.book_url))
+        content = (b.content or '').strip()
+        content = URL_RE.sub('', content)
+        content = PRICE_RE.sub('', content)
+        return b.replace(title=title, book_url=canonical_book_url(b.book_url), content=content)
+
     def clean_existing_data(self) -> List[BookItem]:
         """清理既有資料：移除多餘描述、價格與購買資訊，校正日期與週次"""
         items = self.storage.load()
@@ -143,7 +254,8 @@ class Kobo99ICalService:
             content = re.sub(r'99元|NT\$?\s*99|HK\$?\s*99|購買|查看電子書（HK）|查看電子書', '', content)
             # 校正日期：w49 統一到 12/4..12/10
             if b.article_url == base_w49:
-                offset = hash(b.book_url) % 7
+                # 以 sha256 取穩定的偏移：內建 hash() 每個行程不同，日期與 UID 會每次改變
+                offset = int(hashlib.sha256(b.book_url.encode("utf-8")).hexdigest(), 16) % 7
                 b.date = date(2025,12,4) + timedelta(days=offset)
                 b.week = 49
                 b.year = 2025
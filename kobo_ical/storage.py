@@ -1,12 +1,16 @@
 import json
 import logging
-from dataclasses import asdict
+import os
 from pathlib import Path
-from typing import Iterable, List
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Union
 from datetime import date, datetime
 
+from .extraction import product_id
 from .models import BookItem
 
+if TYPE_CHECKING:
+    from .content_store import ContentStore
+
 logger = logging.getLogger(__name__)
 
 
@@ -18,46 +22,160 @@ class DateEncoder(json.JSONEncoder):
         return super().default(o)
 
 
+def write_if_changed(path: Union[str, Path], content: Union[str, bytes]) -> bool:
+    """內容與現有檔案相同時不寫入；回傳是否有寫入"""
+    path = Path(path)
+    data = content.encode("utf-8") if isinstance(content, str) else content
+    try:
+        if path.read_bytes() == data:
+            return False
+    except FileNotFoundError:
+        pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+    return True
+
+
 class Storage:
-    def __init__(self, path: str) -> None:
+    """事件 JSON 檔案；啟用 append_log 時另以 JSONL 日誌累積變更
+
+    日誌（<檔名>.log.jsonl）每行一筆以商品 ID 為鍵的 put / del 紀錄，load 時以快照重播日誌。
+    每次儲存只追加有變動的書籍，日誌超過 compact_records 筆時壓實成新的快照。
+    """
+
+    def __init__(self, path: str, append_log: bool = False, compact_records: int = 500,
+                 contents: Optional["ContentStore"] = None) -> None:
         self.path = Path(path)
         self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.log_path = self.path.with_suffix(".log.jsonl")
+        self.append_log = append_log
+        self.compact_records = compact_records
+        # 有 ContentStore 時 content 不寫入 JSON，讀取時才載入
+        self.contents = contents
+        # 最近一次 load / save 後的狀態：商品 ID -> 序列化內容（依清單順序）
+        self._state: Optional[Dict[str, dict]] = None
+        self._log_records = 0
 
     def load(self) -> List[BookItem]:
+        items = self._load_snapshot()
+        if self.log_path.exists():
+            items = self._replay(items)
+        self._state = {product_id(item.book_url): self._record(item) for item in items}
+        return items
+
+    def _load_snapshot(self) -> List[BookItem]:
         if not self.path.exists():
             return []
         try:
             with self.path.open("r", encoding="utf-8") as f:
                 data = json.load(f)
-            return [BookItem.from_dict(item) for item in data]
+            return [BookItem.from_dict(item, self.contents) for item in data]
         except Exception as exc:
             logger.warning("Failed to load storage %s: %s", self.path, exc)
             return []
 
-    def save(self, items: Iterable[BookItem]) -> None:
+    def _replay(self, items: List[BookItem]) -> List[BookItem]:
+        """依序套用日誌：put 取代同 ID 的項目（保留位置）或附加在最後，del 移除"""
+        state: Dict[str, BookItem] = {}
+        for item in items:
+            state[product_id(item.book_url)] = item
+        records = 0
+        with self.log_path.open("r", encoding="utf-8") as f:
+            for lineno, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    if record["op"] == "put":
+                        state[record["id"]] = BookItem.from_dict(record["item"], self.contents)
+                    elif record["op"] == "del":
+                        state.pop(record["id"], None)
+                except Exception as exc:
+                    # 寫到一半中斷的最後一行：略過，之前的紀錄仍有效
+                    logger.warning("Skipping bad record %s:%d: %s", self.log_path, lineno, exc)
+                    continue
+                records += 1
+        self._log_records = records
+        logger.info("Replayed %d log records from %s", records, self.log_path)
+        return list(state.values())
+
+    def _record(self, item: BookItem) -> dict:
+        return item.record(with_content=self.contents is None)
+
+    @staticmethod
+    def dumps(items: Iterable[BookItem], with_content: bool = True) -> str:
+        """事件 JSON 的標準格式（EventStore / ColdArchive 共用）"""
+        serialized = [item.record(with_content) for item in items]
+        # 使用 DateEncoder 來處理 date/datetime
+        return json.dumps(serialized, ensure_ascii=False, indent=2, cls=DateEncoder)
+
+    def save(self, items: Iterable[BookItem]) -> bool:
+        """儲存完整的書籍清單，回傳是否有寫入"""
         try:
-            serialized = [asdict(item) for item in items]
-            logger.info("Saving %d items to %s", len(serialized), self.path)
-            
-            # 確保目錄存在
-            self.path.parent.mkdir(parents=True, exist_ok=True)
-            
-            with self.path.open("w", encoding="utf-8") as f:
-                # 使用 DateEncoder 來處理 date/datetime
-                json.dump(serialized, f, ensure_ascii=False, indent=2, cls=DateEncoder)
-            
-            # 驗證檔案是否成功寫入
-            if self.path.exists():
-                file_size = self.path.stat().st_size
-                logger.info("Successfully saved %d items to %s (file size: %d bytes)", 
-                           len(serialized), self.path, file_size)
-            else:
-                logger.error("Failed to save: file %s does not exist after write", self.path)
-                raise IOError(f"File {self.path} was not created")
+            items = list(items)
+            logger.info("Saving %d items to %s", len(items), self.path)
+            if self.append_log:
+                return self._append(items)
+            return self.compact(items)
         except Exception as e:
             logger.error("Failed to save items to %s: %s", self.path, e, exc_info=True)
             raise
 
+    def _append(self, items: List[BookItem]) -> bool:
+        """只把與目前狀態不同的書籍寫入日誌；順序無法以日誌表達時改寫快照"""
+        if self._state is None:
+            self.load()
+        current = self._state
+        target = {product_id(item.book_url): self._record(item) for item in items}
+        # 重播結果的順序：既有項目維持原位，新項目依序附加
+        replayed = [k for k in current if k in target] + [k for k in target if k not in current]
+        if len(target) != len(items) or replayed != list(target):
+            logger.info("Item order changed, compacting %s instead of appending", self.path)
+            return self.compact(items)
+
+        records = [{"op": "del", "id": k} for k in current if k not in target]
+        records += [{"op": "put", "id": k, "item": v} for k, v in target.items() if current.get(k) != v]
+        if not records:
+            logger.info("No changes for %s", self.path)
+            return False
+        with self.log_path.open("a", encoding="utf-8") as f:
+            if self._torn_tail():
+                # 上次寫到一半中斷：先換行，新紀錄不會接在殘缺的行後面
+                f.write("\n")
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False, cls=DateEncoder) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._state = target
+        self._log_records += len(records)
+        logger.info("Appended %d records to %s (%d since last snapshot)",
+                    len(records), self.log_path, self._log_records)
+        if self._log_records >= self.compact_records:
+            self.compact(items)
+        return True
+
+    def _torn_tail(self) -> bool:
+        if not self.log_path.exists() or self.log_path.stat().st_size == 0:
+            return False
+        with self.log_path.open("rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b"\n"
+
+    def compact(self, items: Optional[Iterable[BookItem]] = None) -> bool:
+        """寫出完整快照（暫存檔 + 原子替換）並清空日誌；未傳入 items 時以目前內容壓實"""
+        items = self.load() if items is None else list(items)
+        written = write_if_changed(self.path, self.dumps(items, self.contents is None))
+        # 快照已包含日誌的所有變更；刪除前中斷時重播同樣的日誌結果不變
+        if self.log_path.exists():
+            self.log_path.unlink()
+        self._state = {product_id(item.book_url): self._record(item) for item in items}
+        self._log_records = 0
+        logger.info("Successfully saved %d items to %s (file size: %d bytes, %s)",
+                    len(items), self.path, self.path.stat().st_size, "written" if written else "unchanged")
+        return written
+
 
 # 以下是原程式碼
     # def save(self, items: Iterable[BookItem]) -> None:
@@ -0,0 +1,137 @@
+"""ISO 週曆索引：預先計算 (年, 週) ↔ 日期範圍，URL 生成、日期解析與年份判定共用"""
+from datetime import date, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+WEEKLY_URL = "https://www.kobo.com/zh/blog/weekly-dd99-{year}-w{week}"
+
+# 預先建立的年份範圍；超出時依需要擴充
+FIRST_YEAR = 2015
+LAST_YEAR = date.today().year + 2
+# 月/日與文章週次相距超過半年時視為無效日期（例如非閏年的 2/29）
+MAX_RESOLVE_DISTANCE_DAYS = 183
+
+YearWeek = Tuple[int, int]
+
+
+class WeekCalendar:
+    """ISO 8601 週曆：每年的週數、每週的週一，以及任一天所屬的 (年, 週)，查詢皆為 O(1)"""
+
+    def __init__(self, first_year: int = FIRST_YEAR, last_year: int = LAST_YEAR):
+        self.first_year = first_year
+        self.last_year = first_year - 1
+        # 第 1 週週一的 ordinal，依年份索引（多存一年作為最後一年的結束）
+        self._week1: List[int] = []
+        # 自 first_year 第 1 週起，第 n 週 -> (年, 週)
+        self._weeks: List[YearWeek] = []
+        # 與 _weeks 對應的 (週一, 週日)
+        self._spans: List[Tuple[date, date]] = []
+        self._weeks_in_year: Dict[int, int] = {}
+        self._extend(last_year)
+
+    def _extend(self, last_year: int) -> None:
+        """建立到 last_year 為止的索引"""
+        if last_year <= self.last_year:
+            return
+        for year in range(self.first_year + len(self._week1), last_year + 2):
+            self._week1.append(date.fromisocalendar(year, 1, 1).toordinal())
+        for year in range(self.last_year + 1, last_year + 1):
+            i = year - self.first_year
+            count = (self._week1[i + 1] - self._week1[i]) // 7
+            self._weeks_in_year[year] = count
+            self._weeks.extend((year, w) for w in range(1, count + 1))
+            for w in range(count):
+                start = date.fromordinal(self._week1[i] + w * 7)
+                self._spans.append((start, start + timedelta(days=6)))
+        self.last_year = last_year
+
+    def _ensure(self, year: int) -> bool:
+        if year < self.first_year:
+            return False
+        if year > self.last_year:
+            self._extend(year)
+        return True
+
+    def weeks_in_year(self, year: int) -> int:
+        """該 ISO 年的週數（52 或 53）"""
+        if not self._ensure(year):
+            return date(year, 12, 28).isocalendar()[1]
+        return self._weeks_in_year[year]
+
+    def exists(self, year: int, week: int) -> bool:
+        return 1 <= week <= self.weeks_in_year(year)
+
+    def week_start(self, year: int, week: int) -> Optional[date]:
+        """該週週一；週次不存在時回傳 None"""
+        span = self.week_range(year, week)
+        return span[0] if span else None
+
+    def week_range(self, year: int, week: int) -> Optional[Tuple[date, date]]:
+        """該週的 (週一, 週日)；週次不存在時回傳 None"""
+        if not self.exists(year, week):
+            return None
+        if year < self.first_year:
+            start = date.fromisocalendar(year, week, 1)
+            return start, start + timedelta(days=6)
+        return self._spans[self._position(year, week)]
+
+    def week_of(self, d: date) -> YearWeek:
+        """日期所屬的 ISO (年, 週)"""
+        if not self._ensure(d.year + 1):
+            y, w, _ = d.isocalendar()
+            return int(y), int(w)
+        return self._weeks[(d.toordinal() - self._week1[0]) // 7]
+
+    def _position(self, year: int, week: int) -> int:
+        return (self._week1[year - self.first_year] - self._week1[0]) // 7 + week - 1
+
+    def shift(self, year: int, week: int, weeks: int) -> YearWeek:
+        """往前（負數）或往後移動若干週"""
+        start = self.week_start(year, week)
+        if start is None:
+            raise ValueError(f"Week {year}-W{week} does not exist")
+        return self.week_of(start + timedelta(weeks=weeks))
+
+    def iter_weeks(self, start_year: int, start_week: int, end_year: int, end_week: int) -> Iterator[YearWeek]:
+        """範圍內（含頭尾）實際存在的週次；超過當年週數的週次視為下一年的開始"""
+        start_year, start_week = int(start_year), int(start_week)
+        end_year, end_week = int(end_year), int(end_week)
+        if start_week < 1:
+            start_week = 1
+        if start_week > self.weeks_in_year(start_year):
+            start_year, start_week = start_year + 1, 1
+        end_week = min(end_week, self.weeks_in_year(end_year))
+        if (start_year, start_week) > (end_year, end_week) or not self._ensure(start_year):
+            return
+        self._ensure(end_year)
+        first = self._position(start_year, start_week)
+        last = self._position(end_year, end_week)
+        for i in range(first, last + 1):
+            yield self._weeks[i]
+
+    def resolve_date(self, year: int, week: int, month: int, day: int) -> Optional[date]:
+        """文章 (年, 週) 中的「月/日」：取最接近該週的年份（12 月底 / 1 月初的跨年書單）"""
+        span = self.week_range(year, week)
+        best: Optional[date] = None
+        best_distance = 0
+        # 依序嘗試 URL 年份、前一年、後一年；距離相同時保留先出現者
+        for y in (year, year - 1, year + 1):
+            try:
+                d = date(y, month, day)
+            except ValueError:
+                continue
+            if span is None:
+                return d
+            start, end = span
+            distance = (start - d).days if d < start else (d - end).days if d > end else 0
+            if distance == 0:
+                return d
+            if distance <= MAX_RESOLVE_DISTANCE_DAYS and (best is None or distance < best_distance):
+                best, best_distance = d, distance
+        return best
+
+
+WEEKS = WeekCalendar()
+
+
+def weekly_url(year: int, week: int) -> str:
+    return WEEKLY_URL.format(year=year, week=week)
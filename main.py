@@ -3,6 +3,8 @@ CLI version of Kobo-99 iCal generator (Advanced Refactor).
 Generates kobo99.ics into docs/ folder for GitHub Pages publishing.
 """
 
+import argparse
+import json
 import logging
 import os
 import sys
@@ -10,6 +12,13 @@ from datetime import date, timedelta
 
 from scraper import Scraper
 from kobo_ical.calendar_manager import CalendarManager
+from kobo_ical.config import Settings
+from kobo_ical.fragment_cache import FragmentCache
+from kobo_ical.ics import write_if_changed
+from kobo_ical.metrics import RunMetrics
+from kobo_ical.profiling import StageProfiler
+from kobo_ical.service import Kobo99ICalService
+from kobo_ical.weeks import WEEKS
 
 OUTPUT_DIR = "docs"
 OUTPUT_FILE = "kobo99.ics"
@@ -25,7 +34,66 @@ def ensure_output_dir():
     if not os.path.exists(OUTPUT_DIR):
         os.makedirs(OUTPUT_DIR)
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Kobo 99 iCal generator")
+    parser.add_argument(
+        "--replay",
+        action="store_true",
+        help="Rebuild the feed from the archived HTML under data/archive without any network I/O",
+    )
+    parser.add_argument(
+        "--coverage",
+        action="store_true",
+        help="Print which days/weeks of the retention window have no stored books, then exit",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Collect cProfile stats, tracemalloc snapshots and RSS per stage under data/profiles (same as KOBO99_PROFILE=1)",
+    )
+    return parser.parse_args(argv)
+
+
+def print_coverage(settings):
+    """Summarize the coverage index over the retention window.
+
+    Without a persisted index (main.py never writes one) it is built from the
+    stored events and the cold archive, the same way the service bootstraps it.
+    """
+    coverage = Kobo99ICalService(settings).load_coverage()
+    if coverage is None:
+        logger.error("Coverage index disabled (KOBO99_COVERAGE_PATH is empty)")
+        sys.exit(1)
+    today = date.today()
+    summary = coverage.summary(today - timedelta(days=settings.retention_past_days), today)
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+
+def main(argv=None):
+    args = parse_args(argv)
+    settings = Settings()
+    if args.coverage:
+        print_coverage(settings)
+        return
+    if args.replay:
+        settings = settings.model_copy(update={"replay": True})
+    if args.profile:
+        settings = settings.model_copy(update={"profile": True})
+    # Per-stage timings and request counts end up in data/run_report.json
+    profiler = StageProfiler(settings.profile_dir, "main") if settings.profile else None
+    metrics = RunMetrics("main", profiler)
+    try:
+        run(settings, metrics)
+    except BaseException:
+        metrics.finish("error")
+        raise
+    finally:
+        metrics.finish()
+        metrics.log_summary()
+        metrics.write(settings.run_report_path, settings.metrics_textfile_path)
+        if profiler is not None:
+            profiler.finish()
+
+def run(settings, metrics):
     logger.info("Starting Kobo 99 Crawler (Advanced)...")
     ensure_output_dir()
     
@@ -37,39 +105,50 @@ def main():
     start_date = today - timedelta(weeks=2)
     end_date = today + timedelta(weeks=2)
     
-    start_iso = start_date.isocalendar()
-    end_iso = end_date.isocalendar()
-    
-    # Extract year and week
-    start_year, start_week = start_iso[0], start_iso[1]
-    end_year, end_week = end_iso[0], end_iso[1]
+    # ISO year and week from the shared week calendar
+    start_year, start_week = WEEKS.week_of(start_date)
+    end_year, end_week = WEEKS.week_of(end_date)
 
     logger.info(f"Target date range: {start_date} to {end_date}")
     
-    # We only need one range call because Scraper.crawl_weekly_books handles year crossing
-    # But Scraper.crawl_weekly_books takes (sy, sw, ey, ew)
-    
-    raw_books = []
-    
-    with Scraper() as scraper:
+    # 1-3. Fetch -> Parse -> Dates -> Dedup -> ICS, streamed week by week:
+    # the next week is downloading while the current one is parsed
+    with Scraper(settings, metrics=metrics) as scraper:
+        if settings.replay:
+            # Replay the whole archived history instead of the live window
+            archived = scraper.archive.weeks()
+            if not archived:
+                logger.error("Replay requested but the HTML archive is empty")
+                sys.exit(1)
+            (start_year, start_week), (end_year, end_week) = archived[0], archived[-1]
         logger.info(f"Crawling range: {start_year}-W{start_week} to {end_year}-W{end_week}")
-        # Note: scraper.crawl_weekly_books logic handles the wrap around years automatically
-        raw_books = scraper.crawl_weekly_books(start_year, start_week, end_year, end_week)
-            
-    logger.info(f"Total raw books found (incl duplicates): {len(raw_books)}")
-    
-    # 2. Process Data (Dates & Logic)
-    processed_books = CalendarManager.process_dates(raw_books)
-    
-    # 3. Generate ICS
-    ical_data = CalendarManager.create_ical(processed_books)
+        # Note: scraper.iter_weekly_books only visits ISO weeks that exist, across year boundaries
+        raw_books = scraper.iter_weekly_books(start_year, start_week, end_year, end_week)
+        # Only the winning book per date is kept, so this list is bounded by the
+        # number of days in the range, not by how many books were crawled
+        with metrics.stage("crawl"):
+            processed_books = list(CalendarManager.process_dates(raw_books, metrics))
+        logger.info(f"Total books after dedup: {len(processed_books)}")
+
+    # Unchanged events reuse their VEVENT block from the previous run
+    fragments = None
+    if settings.ics_fragment_dir:
+        fragments = FragmentCache(os.path.join(settings.ics_fragment_dir, "kobo99.json"))
+    with metrics.stage("render"):
+        ical_data = CalendarManager.create_ical(processed_books, fragments)
+        if fragments is not None:
+            fragments.save()
     
     # 4. Write File
     output_path = os.path.join(OUTPUT_DIR, OUTPUT_FILE)
     try:
-        with open(output_path, "wb") as f: # ICS binary write
-            f.write(ical_data)
-        logger.info(f"✅ ICS file written: {output_path} ({len(ical_data)} bytes)")
+        # Identical input gives identical bytes; leave the file alone so nothing re-syncs
+        with metrics.stage("save"):
+            written = write_if_changed(output_path, ical_data)
+        if written:
+            logger.info(f"✅ ICS file written: {output_path} ({len(ical_data)} bytes)")
+        else:
+            logger.info(f"ICS unchanged, not rewritten: {output_path}")
     except Exception as e:
         logger.error(f"Failed to write ICS: {e}")
         sys.exit(1)
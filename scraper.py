@@ -5,18 +5,47 @@ import logging
 import re
 import time
 from datetime import date, datetime, timedelta
-from typing import List, Optional
+from typing import Iterator, List, Optional
 
 import cloudscraper
-from bs4 import BeautifulSoup
+
+from kobo_ical.archive import HTMLArchive
+from kobo_ical.config import Settings
+from kobo_ical.extraction import EBOOK_HREF_RE
+from kobo_ical.cookies import CookieStore
+from kobo_ical.http_cache import HTTPCache
+from kobo_ical.metrics import RunMetrics
+from kobo_ical.negative_cache import EMPTY, FAILED, NOT_FOUND, NegativeCache
+from kobo_ical.parsing import article_scope, make_soup
+from kobo_ical.pipeline import fetch_stage, parse_stage, week_jobs
+from kobo_ical.retry import RETRY_AFTER_STATUSES, RetryPolicy, is_retryable, parse_retry_after
+from kobo_ical.weeks import WEEKS, weekly_url
 
 logger = logging.getLogger(__name__)
 
+# 解析結果快取的版本標記；解析邏輯改變輸出時需遞增（v2：raw_text 改為選用）
+PARSE_CACHE_KEY = "scraper:v2"
+
+# Strict Regex Pattern
+# Pattern: {Date}{星期}Kobo99選書：{書名}
+# Matches: "12/20週六Kobo99選書：《破咒師...》" or "12/20週六Kobo99選書：破咒師..."
+# Note: Allow optional whitespace around colon.
+BOOK_LINE_RE = re.compile(r'(\d{1,2}/\d{1,2}).*?Kobo99選書\s*[：:]\s*(?:《(.*?)》|([^。]+))')
+MARKER_RE = re.compile(r"Kobo99選書")
+
 
 class Scraper:
     """Kobo 99 元書單爬蟲 (Cloudscraper version)"""
 
-    def __init__(self):
+    def __init__(self, settings: Optional[Settings] = None, keep_raw_text: bool = False,
+                 metrics: Optional[RunMetrics] = None):
+        self.settings = settings or Settings()
+        # 本次執行的指標（請求數、下載量、重試、各階段耗時），由 main.py 輸出
+        self.metrics = metrics or RunMetrics("scraper")
+        # raw_text 只供除錯檢視，輸出 ICS 用不到，預設不放進書籍字典
+        self.keep_raw_text = keep_raw_text
+        # 是否含 raw_text 的解析結果分開快取
+        self.parse_cache_key = f"{PARSE_CACHE_KEY}:raw" if keep_raw_text else PARSE_CACHE_KEY
         # Create a cloudscraper instance to bypass Cloudflare
         self.scraper = cloudscraper.create_scraper(
             browser={
@@ -25,7 +54,32 @@ class Scraper:
                 'desktop': True
             }
         )
-        self.max_retries = 3
+        # Backoff, Retry-After, per-host circuit breaker and run deadline (shared with KoboCrawler)
+        self.retry = RetryPolicy.from_settings(self.settings)
+        self.replay = self.settings.replay
+        # 跨執行保存的 cookie（含 cf_clearance），與 KoboCrawler / Playwright 共用
+        self.cookie_store = None
+        if self.settings.cookie_store_path and not self.replay:
+            self.cookie_store = CookieStore(self.settings.cookie_store_path)
+            self.cookie_store.apply_to_jar(self.scraper.cookies)
+            if self.cookie_store.user_agent:
+                self.scraper.headers["User-Agent"] = self.cookie_store.user_agent
+        self.archive = HTMLArchive(self.settings.archive_dir, self.settings.archive_max_versions) if self.settings.archive_dir else None
+        if self.replay and not self.archive:
+            raise ValueError("Replay mode requires archive_dir")
+        self.http_cache = None
+        if self.settings.http_cache_dir and not self.replay:
+            self.http_cache = HTTPCache(
+                self.settings.http_cache_dir,
+                self.settings.http_cache_immutable_weeks,
+            )
+        self.negative_cache = None
+        if self.settings.negative_cache_path and not self.replay:
+            self.negative_cache = NegativeCache(
+                self.settings.negative_cache_path,
+                self.settings.negative_cache_base_hours,
+                self.settings.negative_cache_max_days,
+            )
 
     def __enter__(self):
         return self
@@ -34,43 +88,113 @@ class Scraper:
         pass
 
     def fetch_page(self, url: str) -> Optional[str]:
-        """抓取頁面內容"""
+        """抓取頁面內容（重播模式下改讀 HTML 封存）"""
+        if self.replay:
+            html = self.archive.latest(url)
+            if not html:
+                logger.info(f"No archived copy for {url}")
+            self.metrics.incr("archive_reads")
+            return html
+        html = self._fetch_page(url)
+        if not html and self.negative_cache and self._url_failed(url):
+            self.negative_cache.record(url, FAILED)
+        return html
+
+    def _url_failed(self, url: str) -> bool:
+        """失敗是否屬於這個 URL：期限到達或主機斷路時略過的 URL 不記入負向快取"""
+        return not self.retry.expired() and not self.retry.is_open(url) and not self.negative_cache.is_blocked(url)
+
+    def _fetch_page(self, url: str) -> Optional[str]:
+        cached = self.http_cache.get(url) if self.http_cache else None
+        if cached and self.http_cache.is_immutable(url):
+            logger.info(f"Using cached article (immutable): {url}")
+            self.metrics.incr("http_cache_hits")
+            return cached.body
+        if self.retry.expired():
+            self.metrics.incr("deadline_skips")
+            return None
+        if not self.retry.allow(url):
+            logger.info(f"Circuit open, not requesting {url}")
+            self.metrics.incr("circuit_open_skips")
+            return None
         logger.info(f"Fetching URL: {url}")
-        for attempt in range(self.max_retries):
+        for attempt in range(self.retry.attempts):
+            if self.retry.expired():
+                self.metrics.incr("deadline_skips")
+                return None
             try:
-                response = self.scraper.get(url)
+                headers = HTTPCache.conditional_headers(cached) if cached else {}
+                response = self.scraper.get(url, headers=headers)
+                self.metrics.record_response(response.status_code, len(response.content))
+                if self.cookie_store:
+                    self.cookie_store.update_from_jar(self.scraper.cookies, self.scraper.headers.get("User-Agent"))
+                if response.status_code == 304 and cached:
+                    logger.info(f"Not modified, using cached article: {url}")
+                    self.retry.record_success(url)
+                    self.http_cache.touch(cached)
+                    return cached.body
                 if response.status_code == 200:
+                    self.retry.record_success(url)
 
                     # Force encoding to avoid garbled text
                     if response.encoding == 'ISO-8859-1':
                         response.encoding = response.apparent_encoding or 'utf-8'
+                    if self.http_cache:
+                        self.http_cache.store(
+                            url,
+                            response.text,
+                            response.headers.get("ETag"),
+                            response.headers.get("Last-Modified"),
+                        )
                     return response.text
                 elif response.status_code == 404:
                     logger.warning(f"Page not found: {url}")
+                    self.retry.record_success(url)
+                    if self.negative_cache:
+                        self.negative_cache.record(url, NOT_FOUND)
+                    return None
+                elif not is_retryable(response.status_code):
+                    logger.error(f"Status {response.status_code} for {url}, not retrying")
                     return None
                 else:
-                    logger.warning(f"Status {response.status_code} for {url}, retrying...")
-                    time.sleep(2)
+                    logger.warning(f"Status {response.status_code} for {url}")
+                    if self.retry.record_failure(url, response.status_code):
+                        self.metrics.incr("circuits_opened")
+                    retry_after = None
+                    if response.status_code in RETRY_AFTER_STATUSES:
+                        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                    if not self._backoff(url, attempt, retry_after):
+                        break
             except Exception as e:
                 logger.error(f"Error fetching {url}: {e}")
-                time.sleep(2)
-        
-        logger.error(f"Failed to fetch {url} after {self.max_retries} attempts")
+                self.metrics.record_response("error")
+                if self.retry.record_failure(url):
+                    self.metrics.incr("circuits_opened")
+                if not self._backoff(url, attempt):
+                    break
+
+        logger.error(f"Failed to fetch {url} after {attempt + 1} attempts")
         return None
 
+    def _backoff(self, url: str, attempt: int, retry_after: Optional[float] = None) -> bool:
+        """重試前依策略等待；不再重試（次數用完、斷路、期限不足）時回傳 False"""
+        if self.retry.is_open(url):
+            return False
+        delay = self.retry.delay(attempt, retry_after)
+        if delay is None:
+            return False
+        self.metrics.incr("retries")
+        self.metrics.incr("backoff_seconds", delay)
+        time.sleep(delay)
+        return True
+
     def parse_weekly_article(self, html: str, article_url: str, year: int, week: int) -> List[dict]:
         """解析週次文章"""
-        soup = BeautifulSoup(html, "html.parser")
+        soup = make_soup(html, self.settings.html_parser)
         books = []
         
-        # Strict Regex Pattern
-        # Pattern: {Date}{星期}Kobo99選書：{書名}
-        # Matches: "12/20週六Kobo99選書：《破咒師...》" or "12/20週六Kobo99選書：破咒師..."
-        # Note: Allow optional whitespace around colon.
-        pattern = re.compile(r'(\d{1,2}/\d{1,2}).*?Kobo99選書\s*[：:]\s*(?:《(.*?)》|([^。]+))')
-        
         # Find all text nodes containing "Kobo99選書"
-        text_nodes = soup.find_all(string=re.compile(r"Kobo99選書"))
+        text_nodes = article_scope(soup).find_all(string=MARKER_RE)
         processed_parents = set()
 
         for node in text_nodes:
@@ -85,7 +209,7 @@ class Scraper:
             processed_parents.add(parent)
             full_text = parent.get_text(strip=True)
             
-            match = pattern.search(full_text)
+            match = BOOK_LINE_RE.search(full_text)
             if not match:
                 continue
 
@@ -112,7 +236,7 @@ class Scraper:
                 book_url = parent.get('href')
             # 2. Link inside parent
             if not book_url:
-                link = parent.find('a', href=re.compile(r'/ebook/'))
+                link = parent.find('a', href=EBOOK_HREF_RE)
                 if link:
                     book_url = link.get('href')
 
@@ -125,7 +249,7 @@ class Scraper:
                 if "查看電子書" in title:
                      title = title.replace("查看電子書", "").strip()
 
-                books.append({
+                book = {
                     "title": title,
                     "book_url": book_url,
                     "article_url": article_url,
@@ -133,8 +257,10 @@ class Scraper:
                     "day": day,
                     "week": week,
                     "year_context": year,  # Base year from URL
-                    "raw_text": full_text
-                })
+                }
+                if self.keep_raw_text:
+                    book["raw_text"] = full_text
+                books.append(book)
                 logger.debug(f"Parsed: {title} ({month}/{day})")
 
         if not books:
@@ -142,23 +268,49 @@ class Scraper:
             
         return books
 
+    def weekly_urls(self, start_year: int, start_week: int, end_year: int, end_week: int) -> Iterator[str]:
+        """範圍內實際存在的 ISO 週次文章 URL"""
+        for year, week in WEEKS.iter_weeks(start_year, start_week, end_year, end_week):
+            yield weekly_url(year, week)
+
+    def fetch_week(self, url: str) -> Optional[str]:
+        """抓取週次文章；負向快取中的 URL 不發請求"""
+        if self.negative_cache and self.negative_cache.is_blocked(url):
+            logger.info(f"Skipping {url} (negative cache)")
+            self.metrics.incr("negative_cache_skips")
+            return None
+        with self.metrics.stage("fetch"):
+            return self.fetch_page(url)
+
+    def parse_week(self, url: str, year: int, week: int, content: Optional[str]) -> List[dict]:
+        """解析週次文章；內容未變動時沿用快取的解析結果"""
+        if not content:
+            return []
+        with self.metrics.stage("parse"):
+            items = self.http_cache.get_parsed(url, self.parse_cache_key, content) if self.http_cache else None
+            if items is None:
+                items = self.parse_weekly_article(content, url, year, week)
+                if self.http_cache:
+                    self.http_cache.put_parsed(url, self.parse_cache_key, content, items)
+            else:
+                self.metrics.incr("parse_cache_hits")
+        self.metrics.record_article(url, len(items))
+        # 只封存解析出書籍的頁面：Cloudflare 驗證頁等同樣是 200，不應進入封存
+        if items and self.archive and not self.replay:
+            self.archive.put(url, content)
+        if self.negative_cache:
+            if items:
+                self.negative_cache.clear(url)
+            else:
+                self.negative_cache.record(url, EMPTY)
+        return items
+
+    def iter_weekly_books(self, start_year: int, start_week: int, end_year: int, end_week: int) -> Iterator[dict]:
+        """逐本產出範圍內週次的書籍；解析目前週次時下一週已在背景抓取"""
+        jobs = week_jobs(self.weekly_urls(start_year, start_week, end_year, end_week))
+        pages = fetch_stage(jobs, lambda job: self.fetch_week(job[0]))
+        yield from parse_stage(pages, lambda job, content: self.parse_week(*job, content))
+
     def crawl_weekly_books(self, start_year: int, start_week: int, end_year: int, end_week: int) -> List[dict]:
         """爬取範圍內的週次"""
-        all_books = []
-        curr_y, curr_w = start_year, start_week
-        target_y, target_w = end_year, end_week
-        
-        while (curr_y < target_y) or (curr_y == target_y and curr_w <= target_w):
-            url = f"https://www.kobo.com/zh/blog/weekly-dd99-{curr_y}-w{curr_w}"
-            content = self.fetch_page(url)
-            
-            if content:
-                items = self.parse_weekly_article(content, url, curr_y, curr_w)
-                all_books.extend(items)
-            
-            curr_w += 1
-            if curr_w > 54:
-                curr_w = 1
-                curr_y += 1
-                
-        return all_books
+        return list(self.iter_weekly_books(start_year, start_week, end_year, end_week))
@@ -0,0 +1,25 @@
+"""共用 fixture"""
+from datetime import date
+
+import pytest
+
+from kobo_ical.models import BookItem
+
+
+@pytest.fixture
+def make_book():
+    """以簡短的 slug 建立 BookItem；其餘欄位可覆寫"""
+    def factory(slug: str, d: date = date(2025, 12, 1), **fields) -> BookItem:
+        values = dict(
+            title=f"書 {slug}",
+            book_url=f"https://www.kobo.com/tw/zh/ebook/{slug}",
+            article_url="https://www.kobo.com/zh/blog/weekly-dd99-2025-w49",
+            date=d,
+            week=49,
+            year=2025,
+            article_title="一週99書單",
+            content=f"內容 {slug}",
+        )
+        values.update(fields)
+        return BookItem(**values)
+    return factory
@@ -0,0 +1,47 @@
+"""HTMLArchive：內容定址、版本上限，以及只封存解析出書籍的頁面"""
+from kobo_ical.archive import HTMLArchive
+from kobo_ical.config import Settings
+from kobo_ical.crawler import KoboCrawler
+
+URL = "https://www.kobo.com/zh/blog/weekly-dd99-2026-w10"
+
+
+def objects(archive):
+    return sorted(p.name for p in archive.objects.rglob("*.html.gz"))
+
+
+def test_put_dedups_consecutive_identical_bodies(tmp_path):
+    archive = HTMLArchive(str(tmp_path))
+    sha = archive.put(URL, "<html>1</html>")
+    assert archive.put(URL, "<html>1</html>") == sha
+    assert len(archive.index["2026-w10"]) == 1
+    assert archive.latest(URL) == "<html>1</html>"
+    assert archive.put("https://example.com/other", "x") is None
+
+
+def test_max_versions_prunes_old_objects(tmp_path):
+    archive = HTMLArchive(str(tmp_path), max_versions=2)
+    other = URL.replace("w10", "w11")
+    archive.put(other, "<html>1</html>")  # 與 URL 的第一版內容相同，物件共用
+    for i in range(1, 5):
+        archive.put(URL, f"<html>{i}</html>")
+    assert [r["size"] for r in archive.index["2026-w10"]] == [14, 14]
+    assert archive.latest(URL) == "<html>4</html>"
+    # 第 2 版已無引用而刪除；第 1 版仍被 other 引用
+    assert len(objects(archive)) == 3
+    assert archive.latest(other) == "<html>1</html>"
+    # 重新載入後索引一致
+    assert HTMLArchive(str(tmp_path), max_versions=2).index == archive.index
+
+
+def test_crawler_archives_only_pages_with_books(tmp_path, make_book, monkeypatch):
+    settings = Settings(archive_dir=str(tmp_path / "archive"), http_cache_dir="", negative_cache_path="",
+                        cookie_store_path="", _env_file=None)
+    with KoboCrawler(settings) as crawler:
+        monkeypatch.setattr(crawler, "parse_weekly_article", lambda html, *args: [])
+        assert crawler.parse_week(URL, 2026, 10, "<html>Just a moment...</html>") == []
+        assert crawler.archive.latest(URL) is None
+
+        monkeypatch.setattr(crawler, "parse_weekly_article", lambda html, *args: [make_book("a")])
+        assert len(crawler.parse_week(URL, 2026, 10, "<html>書單</html>")) == 1
+        assert crawler.archive.latest(URL) == "<html>書單</html>"
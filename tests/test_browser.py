@@ -0,0 +1,23 @@
+"""BrowserPool：啟動失敗後本次執行不再重試啟動"""
+import pytest
+
+from kobo_ical.browser import BrowserPool
+
+
+def test_failed_launch_fails_fast(monkeypatch):
+    pool = BrowserPool()
+    launches = []
+
+    async def broken_start():
+        launches.append(1)
+        raise OSError("chromium executable not found")
+
+    monkeypatch.setattr(pool, "_start", broken_start)
+    with pytest.raises(OSError):
+        pool.fetch("https://www.kobo.com/zh/blog/weekly-dd99-2026-w10")
+    for _ in range(3):
+        with pytest.raises(RuntimeError, match="failed to start earlier"):
+            pool.fetch("https://www.kobo.com/zh/blog/weekly-dd99-2026-w11")
+    assert launches == [1]
+    assert not pool.started
+    pool.close()
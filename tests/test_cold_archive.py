@@ -0,0 +1,40 @@
+"""ColdArchive：年度壓縮檔合併，以及熱資料移入冷資料時的覆蓋索引計數"""
+from datetime import date
+
+from kobo_ical.cold_archive import ColdArchive, split_tiers
+from kobo_ical.coverage import CoverageIndex
+
+
+def test_add_merges_by_product_id(tmp_path, make_book):
+    cold = ColdArchive(str(tmp_path / "cold"))
+    assert cold.add([make_book("a", date(2024, 3, 1)), make_book("b", date(2025, 1, 2))]) == 2
+    # 內容相同時不改寫
+    assert cold.add([make_book("a", date(2024, 3, 1))]) == 0
+    assert cold.add([make_book("a", date(2024, 3, 1), title="新標題")]) == 1
+    assert cold.years() == [2024, 2025]
+    assert [b.title for b in cold.load(2024)] == ["新標題"]
+
+
+def test_migration_keeps_coverage_consistent(tmp_path, make_book):
+    """模擬服務的遷移流程：增量更新後的索引須與由熱資料 + 冷資料重建的結果相同"""
+    cold = ColdArchive(str(tmp_path / "cold"))
+    old = date(2024, 3, 1)
+    # 冷資料已有 a（之後原樣再次移入）與 b（之後以新內容移入）
+    cold.add([make_book("a", old), make_book("b", old)])
+    existing = [
+        make_book("a", old),
+        make_book("b", old, title="更新"),
+        make_book("c", old),
+        make_book("d", date(2026, 10, 1)),
+    ]
+    coverage = CoverageIndex(str(tmp_path / "coverage.json"))
+    coverage.rebuild([b.date for b in existing] + [b.date for b in cold.iter_all()])
+
+    hot, cold_books = split_tiers(existing, date(2026, 1, 1))
+    cold.add(cold_books, coverage)
+    coverage.update(before=(b.date for b in existing), after=(b.date for b in hot))
+
+    expected = CoverageIndex(str(tmp_path / "expected.json"))
+    expected.rebuild([b.date for b in hot] + [b.date for b in cold.iter_all()])
+    assert coverage.counts == expected.counts
+    assert coverage.counts[old.toordinal()] == 3
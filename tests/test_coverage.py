@@ -0,0 +1,115 @@
+"""CoverageIndex：多重集合差異更新、缺口區間、稀疏週次與持久化，以及 main.py --coverage"""
+import json
+from datetime import date, timedelta
+
+import main
+from kobo_ical.config import Settings
+from kobo_ical.coverage import CoverageIndex
+from kobo_ical.storage import Storage
+
+
+def days(start, n):
+    return [start + timedelta(days=i) for i in range(n)]
+
+
+def test_update_counts_and_merges_intervals(tmp_path):
+    coverage = CoverageIndex(str(tmp_path / "coverage.json"))
+    assert not coverage.exists
+    d = date(2026, 3, 2)
+    assert coverage.update(after=[d, d + timedelta(days=2)]) == 2
+    assert coverage._starts == [d.toordinal(), d.toordinal() + 2]
+    # 補上中間一天，兩個區間合併
+    assert coverage.update(after=[d + timedelta(days=1)]) == 1
+    assert list(zip(coverage._starts, coverage._ends)) == [(d.toordinal(), d.toordinal() + 2)]
+    # 同一天第二本書不改變覆蓋狀態
+    assert coverage.update(after=[d]) == 0
+    assert coverage.counts[d.toordinal()] == 2
+    # 搬移日期：舊日期仍有一本，新日期新增覆蓋
+    assert coverage.update(before=[d], after=[d + timedelta(days=5)]) == 1
+    assert coverage.is_covered(d)
+    # 移除中間一天，區間分裂
+    assert coverage.update(before=[d + timedelta(days=1)]) == 1
+    assert coverage.gaps(d, d + timedelta(days=5)) == [
+        (d + timedelta(days=1), d + timedelta(days=1)),
+        (d + timedelta(days=3), d + timedelta(days=4)),
+    ]
+    # 計數不會低於零，None 日期略過
+    assert coverage.update(before=[date(2020, 1, 1), None]) == 0
+    assert date(2020, 1, 1).toordinal() not in coverage.counts
+
+
+def test_update_matches_rebuild(tmp_path):
+    incremental = CoverageIndex(str(tmp_path / "a.json"))
+    dates = [date(2026, 1, 1) + timedelta(days=(i * 7) % 40) for i in range(60)]
+    for i in range(0, len(dates), 7):
+        incremental.update(after=dates[i:i + 7])
+    incremental.update(before=dates[:20])
+    rebuilt = CoverageIndex(str(tmp_path / "b.json"))
+    rebuilt.rebuild(dates[20:])
+    assert incremental.counts == rebuilt.counts
+    assert (incremental._starts, incremental._ends) == (rebuilt._starts, rebuilt._ends)
+
+
+def test_gaps():
+    coverage = CoverageIndex("/nonexistent/coverage.json")
+    start = date(2026, 3, 1)
+    assert coverage.gaps(start, start + timedelta(days=9)) == [(start, start + timedelta(days=9))]
+    coverage.update(after=days(start + timedelta(days=2), 3) + [start + timedelta(days=9)])
+    assert coverage.gaps(start, start + timedelta(days=9)) == [
+        (start, start + timedelta(days=1)),
+        (start + timedelta(days=5), start + timedelta(days=8)),
+    ]
+    # 查詢範圍從區間中間開始或結束
+    assert coverage.gaps(start + timedelta(days=3), start + timedelta(days=6)) == [
+        (start + timedelta(days=5), start + timedelta(days=6)),
+    ]
+    assert coverage.gaps(start + timedelta(days=2), start + timedelta(days=4)) == []
+
+
+def test_sparse_weeks():
+    coverage = CoverageIndex("/nonexistent/coverage.json")
+    # 2026-W10 自 3/2 起；W10 全滿，W11 缺一天，W12 全空
+    coverage.update(after=days(date(2026, 3, 2), 7) + days(date(2026, 3, 9), 6))
+    start, end = date(2026, 3, 2), date(2026, 3, 22)
+    assert coverage.sparse_weeks(start, end) == [(2026, 11), (2026, 12)]
+    assert coverage.sparse_weeks(start, end, min_days=6) == [(2026, 12)]
+    # extra 中的日期視為已覆蓋
+    assert coverage.sparse_weeks(start, end, extra={date(2026, 3, 15)}) == [(2026, 12)]
+    # 週在範圍邊緣時只要求範圍內的天數
+    assert coverage.sparse_weeks(date(2026, 3, 9), date(2026, 3, 14)) == []
+    assert coverage.sparse_weeks(date(2026, 3, 14), date(2026, 3, 16)) == [(2026, 11), (2026, 12)]
+
+
+def test_save_and_load(tmp_path):
+    path = tmp_path / "coverage.json"
+    coverage = CoverageIndex(str(path))
+    coverage.update(after=days(date(2026, 12, 28), 10))
+    assert coverage.save()
+    assert not coverage.save()  # 內容相同時不改寫
+    loaded = CoverageIndex(str(path))
+    assert loaded.exists
+    assert loaded.counts == coverage.counts
+    assert loaded.summary(date(2026, 12, 20), date(2027, 1, 10))["gaps"] == [
+        ["2026-12-20", "2026-12-27"], ["2027-01-07", "2027-01-10"]]
+
+
+def test_print_coverage_builds_index_from_stored_events(tmp_path, make_book, capsys):
+    today = date.today()
+    settings = Settings(
+        data_store=str(tmp_path / "events.json"),
+        event_db_path=str(tmp_path / "events.db"),
+        content_store_path="",
+        coverage_path=str(tmp_path / "coverage.json"),
+        cold_dir="",
+        ics_fragment_dir="",
+        _env_file=None,
+    )
+    Storage(settings.data_store).save([make_book(f"b{i}", today - timedelta(days=i)) for i in range(3)])
+    main.print_coverage(settings)
+    summary = json.loads(capsys.readouterr().out)
+    assert summary["end"] == today.isoformat()
+    assert summary["covered_days"] == 3
+    assert summary["gaps"][-1][1] == (today - timedelta(days=3)).isoformat()
+    # 查詢不建立索引檔或資料庫
+    assert not (tmp_path / "coverage.json").exists()
+    assert not (tmp_path / "events.db").exists()
@@ -0,0 +1,60 @@
+"""爬蟲在本次執行的單次抓取記憶：提前中止串流時的登記釋放"""
+import threading
+import time
+
+from kobo_ical.config import Settings
+from kobo_ical.crawler import KoboCrawler
+
+URLS = [f"https://www.kobo.com/zh/blog/weekly-dd99-2025-w{w}" for w in (49, 50, 51)]
+
+
+def make_crawler():
+    settings = Settings(
+        crawl_concurrency=2,
+        http_cache_dir="",
+        negative_cache_path="",
+        cookie_store_path="",
+        archive_dir="",
+        _env_file=None,
+    )
+    return KoboCrawler(settings)
+
+
+def test_abandoned_stream_lets_waiters_refetch(make_book):
+    crawler = make_crawler()
+    fetched = []
+
+    def fetch_week(url, use_random_delay=False):
+        fetched.append(url)
+        time.sleep(0.05)
+        return "<html>" + url
+
+    crawler.fetch_week = fetch_week
+    crawler.parse_week = lambda url, year, week, html: [make_book(f"w{week}", week=week)]
+
+    stream = crawler.iter_urls(URLS)
+    assert next(stream).week == 49
+
+    result = {}
+
+    def wait_for_shared_url():
+        try:
+            result["books"] = crawler.crawl_week(URLS[1], 2025, 50)
+        except BaseException as exc:
+            result["error"] = exc
+
+    waiter = threading.Thread(target=wait_for_shared_url)
+    waiter.start()
+    deadline = time.monotonic() + 5
+    while crawler.memo_hits == 0 and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert crawler.memo_hits == 1
+
+    stream.close()
+    waiter.join(5)
+
+    assert "error" not in result
+    assert [b.week for b in result["books"]] == [50]
+    assert fetched.count(URLS[1]) == 2
+    # 釋放後的 URL 可以重新登記
+    assert [b.week for b in crawler.crawl_week(URLS[2], 2025, 51)] == [51]
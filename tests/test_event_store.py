@@ -0,0 +1,108 @@
+"""EventStore：sync 只改寫變動的列、保留順序、索引查詢與 JSON 匯入匯出"""
+from datetime import date
+
+from kobo_ical.content_store import ContentStore
+from kobo_ical.event_store import EventStore
+from kobo_ical.storage import Storage
+
+
+def test_sync_writes_only_changes(tmp_path, make_book):
+    with EventStore(str(tmp_path / "events.db")) as store:
+        a, b, c = make_book("a"), make_book("b"), make_book("c")
+        assert store.sync([a, b]) == {"items": 2, "written": 2, "deleted": 0}
+        assert store.sync([a, b]) == {"items": 2, "written": 0, "deleted": 0}
+        assert store.sync([a.replace(title="A2"), c]) == {"items": 2, "written": 2, "deleted": 1}
+        assert [x.title for x in store.load()] == ["A2", "書 c"]
+
+
+def test_sync_keeps_list_order(tmp_path, make_book):
+    with EventStore(str(tmp_path / "events.db")) as store:
+        a, b, c = make_book("a"), make_book("b"), make_book("c")
+        store.sync([c, a, b])
+        assert [x.book_url for x in store.load()] == [c.book_url, a.book_url, b.book_url]
+        store.sync([b, c, a])
+        assert [x.book_url for x in store.load()] == [b.book_url, c.book_url, a.book_url]
+
+
+def test_sync_keeps_seq_when_the_head_is_dropped(tmp_path, make_book):
+    """移出開頭的舊書或在最後附加新書時，其餘的列不被改寫"""
+    with EventStore(str(tmp_path / "events.db")) as store:
+        a, b, c, d = (make_book(x) for x in "abcd")
+        store.sync([a, b, c])
+        assert store.sync([b, c]) == {"items": 2, "written": 0, "deleted": 1}
+        assert store.sync([b, c, d]) == {"items": 3, "written": 1, "deleted": 0}
+        # 插入中間時，只有其後順序必須改變的列取新的 seq
+        assert store.sync([b, a, c, d]) == {"items": 4, "written": 3, "deleted": 0}
+        assert [x.book_url for x in store.load()] == [b.book_url, a.book_url, c.book_url, d.book_url]
+
+
+def test_upsert_appends_new_items(tmp_path, make_book):
+    with EventStore(str(tmp_path / "events.db")) as store:
+        a, b = make_book("a"), make_book("b")
+        store.sync([a])
+        assert store.upsert([b, a.replace(title="A2")]) == 2
+        assert [x.title for x in store.load()] == ["A2", "書 b"]
+        assert store.upsert([b]) == 0
+
+
+def test_queries(tmp_path, make_book):
+    with EventStore(str(tmp_path / "events.db")) as store:
+        store.sync([
+            make_book("a", date(2025, 12, 1)),
+            make_book("b", date(2025, 12, 3)),
+            make_book("c", date(2026, 1, 2), week=1, year=2026),
+        ])
+        assert [x.title for x in store.range(date(2025, 12, 2), date(2026, 1, 2))] == ["書 b", "書 c"]
+        assert store.dates(date(2025, 12, 1), date(2025, 12, 31)) == {date(2025, 12, 1), date(2025, 12, 3)}
+        assert [x.title for x in store.by_week(2026, 1)] == ["書 c"]
+        assert [x.title for x in store.by_product("a")] == ["書 a"]
+        assert store.get(make_book("b").book_url).date == date(2025, 12, 3)
+        assert store.get("https://missing") is None
+        assert store.count() == 3
+
+
+def test_import_and_export_json(tmp_path, make_book):
+    json_path = str(tmp_path / "events.json")
+    books = [make_book("a"), make_book("b")]
+    Storage(json_path).save(books)
+    with EventStore(str(tmp_path / "events.db"), import_json=json_path) as store:
+        assert [x.record() for x in store.load()] == [b.record() for b in books]
+        out = str(tmp_path / "out.json")
+        assert store.export_json(out)
+        assert not store.export_json(out)
+        assert [x.record() for x in Storage(out).load()] == [b.record() for b in books]
+
+
+def test_content_lives_in_content_store(tmp_path, make_book):
+    contents = ContentStore(str(tmp_path / "content.db"))
+    with EventStore(str(tmp_path / "events.db"), contents=contents) as store:
+        book = make_book("a", content="很長的內容")
+        contents.put_many([book])
+        store.sync([book])
+        row = store.conn.execute("SELECT content FROM events").fetchone()
+        assert row[0] == ""
+        loaded = store.load()[0]
+        assert not loaded.content_loaded
+        assert loaded.content == "很長的內容"
+    contents.close()
+
+
+def test_export_keeps_content_for_a_fresh_store(tmp_path, make_book):
+    """CI 每次由 events.json 重建資料庫、content.db 不存在：匯出檔必須自帶 content"""
+    json_path = str(tmp_path / "events.json")
+    contents = ContentStore(str(tmp_path / "content.db"))
+    with EventStore(str(tmp_path / "events.db"), contents=contents) as store:
+        book = make_book("a", content="很長的內容")
+        contents.put_many([book])
+        store.sync([book])
+        assert store.export_json(json_path)
+    contents.close()
+    with open(json_path, encoding="utf-8") as f:
+        assert "很長的內容" in f.read()
+
+    fresh = ContentStore(str(tmp_path / "fresh" / "content.db"))
+    with EventStore(str(tmp_path / "fresh" / "events.db"), import_json=json_path, contents=fresh) as store:
+        loaded = store.load()[0]
+        assert not loaded.content_loaded
+        assert loaded.content == "很長的內容"
+    fresh.close()
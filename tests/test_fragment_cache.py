@@ -0,0 +1,50 @@
+"""FragmentCache：沿用未變動的 VEVENT 區塊，每次輸出後只保留用到的片段"""
+import json
+from datetime import date, timedelta
+
+from kobo_ical.config import Settings
+from kobo_ical.fragment_cache import FragmentCache
+from kobo_ical.ics import FRAGMENT_FILE, ICSGenerator
+
+
+def saved_keys(path):
+    with open(path, encoding="utf-8") as f:
+        return set(json.load(f)["fragments"])
+
+
+def test_reused_generator_drops_fragments_of_removed_books(tmp_path, make_book):
+    settings = Settings(ics_fragment_dir=str(tmp_path), _env_file=None)
+    generator = ICSGenerator(settings)
+    today = date.today()
+    books = [make_book(slug, today - timedelta(days=i)) for i, slug in enumerate("abc")]
+    path = tmp_path / FRAGMENT_FILE
+
+    first = generator.generate_ics(books)
+    assert len(saved_keys(path)) == 3
+
+    # 同一個生成器（如長駐伺服器）再輸出一次：b 已移除、c 的標題改變
+    second = generator.generate_ics([books[0], books[2].replace(title="新標題")])
+    assert generator.fragments.hits == 1 and generator.fragments.misses == 1
+    keys = saved_keys(path)
+    assert len(keys) == 2
+    assert "書 b" in first and "書 b" not in second
+    assert keys <= set(generator.fragments.fragments)
+
+    # 從檔案載入的新實例輸出結果相同
+    again = ICSGenerator(settings).generate_ics([books[0], books[2].replace(title="新標題")])
+    assert again == second
+
+
+def test_begin_resets_used(tmp_path):
+    cache = FragmentCache(str(tmp_path / "f.json"))
+    cache.put("a", b"A")
+    cache.save()
+    cache.begin()
+    assert cache.get("a") == b"A"
+    cache.put("b", b"B")
+    cache.begin()
+    cache.put("b", b"B")
+    cache.save()
+    assert saved_keys(tmp_path / "f.json") == {"b"}
+    # 記憶體中的片段仍可使用
+    assert cache.get("a") == b"A"
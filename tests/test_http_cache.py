@@ -0,0 +1,54 @@
+"""HTTPCache：條件式標頭、不可變判定與解析結果快取"""
+from datetime import date
+
+from kobo_ical.http_cache import HTTPCache
+
+URL = "https://www.kobo.com/zh/blog/weekly-dd99-2025-w49"
+
+
+def test_store_and_conditional_headers(tmp_path):
+    cache = HTTPCache(str(tmp_path))
+    assert cache.get(URL) is None
+    cache.store(URL, "<html>1</html>", etag='"abc"', last_modified="Mon, 01 Dec 2025 00:00:00 GMT")
+    entry = HTTPCache(str(tmp_path)).get(URL)
+    assert entry.body == "<html>1</html>"
+    assert HTTPCache.conditional_headers(entry) == {
+        "If-None-Match": '"abc"',
+        "If-Modified-Since": "Mon, 01 Dec 2025 00:00:00 GMT",
+    }
+    cache.store(URL, "<html>1</html>")
+    assert HTTPCache.conditional_headers(cache.get(URL)) == {}
+
+
+def test_parsed_results_follow_the_body(tmp_path):
+    cache = HTTPCache(str(tmp_path))
+    cache.store(URL, "v1")
+    cache.put_parsed(URL, "crawler:v2", "v1", [{"title": "a"}])
+    assert cache.get_parsed(URL, "crawler:v2", "v1") == [{"title": "a"}]
+    assert cache.get_parsed(URL, "crawler:v3", "v1") is None
+    assert cache.get_parsed(URL, "crawler:v2", "v2") is None
+
+    # 相同內容重新儲存（例如 200 但未變動）保留解析結果；內容改變則丟棄
+    cache.store(URL, "v1", etag='"new"')
+    assert cache.get_parsed(URL, "crawler:v2", "v1") == [{"title": "a"}]
+    cache.store(URL, "v2")
+    assert cache.get_parsed(URL, "crawler:v2", "v2") is None
+
+
+def test_put_parsed_ignores_stale_body(tmp_path):
+    cache = HTTPCache(str(tmp_path))
+    cache.store(URL, "v2")
+    cache.put_parsed(URL, "p", "v1", [{"title": "old"}])
+    assert cache.get_parsed(URL, "p", "v1") is None
+    cache.put_parsed("https://not-cached.example/", "p", "v1", [])
+
+
+def test_is_immutable(tmp_path):
+    cache = HTTPCache(str(tmp_path), immutable_after_weeks=4)
+    # 2025-W49 從 12/1 開始，4 週後（12/29）起不再重新驗證
+    assert not cache.is_immutable(URL, today=date(2025, 12, 28))
+    assert cache.is_immutable(URL, today=date(2025, 12, 29))
+    assert not cache.is_immutable("https://www.kobo.com/zh/blog/other", today=date(2030, 1, 1))
+    assert not cache.is_immutable("https://www.kobo.com/zh/blog/weekly-dd99-2025-w53", today=date(2030, 1, 1))
+    cache.immutable_after_weeks = 0
+    assert not cache.is_immutable(URL, today=date(2030, 1, 1))
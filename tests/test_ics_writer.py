@@ -0,0 +1,85 @@
+"""ICSWriter：TEXT 跳脫與 75 octets 折行，以 icalendar 解析驗證往返一致"""
+import io
+from datetime import date, datetime, timezone
+
+import pytest
+
+from kobo_ical.ics_writer import MAX_LINE_OCTETS, ICSWriter, escape_text, fold_line
+
+icalendar = pytest.importorskip("icalendar")
+
+DTSTAMP = datetime(2025, 12, 1, tzinfo=timezone.utc)
+
+TEXTS = [
+    "純 ASCII " + "x" * 200,
+    "繁體中文書名《" + "長" * 80 + "》",
+    "表情符號 " + "📚🎉👩‍👩‍👧" * 30,
+    "混合 a中b📚c" * 20,
+    "逗號,分號;反斜線\\結尾\\",
+    "第一行\n第二行\n\n第四行",
+    "Windows 換行\r\n之後",
+    "",
+]
+
+
+def physical_lines(data: bytes):
+    assert data.endswith(b"\r\n")
+    return data[:-2].split(b"\r\n")
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_fold_never_splits_multibyte_sequences(text):
+    for offset in range(4):
+        line = "SUMMARY:" + "a" * offset + escape_text(text)
+        folded = fold_line(line)
+        parts = physical_lines(folded)
+        for i, part in enumerate(parts):
+            assert len(part) <= MAX_LINE_OCTETS
+            part.decode("utf-8")  # 每一行本身都是完整的 UTF-8
+            if i:
+                assert part.startswith(b" ")
+        unfolded = b"".join(p[1:] if i else p for i, p in enumerate(parts))
+        assert unfolded.decode("utf-8") == line
+
+
+def test_escape_text():
+    assert escape_text("a,b;c\\d\ne\r\nf") == r"a\,b\;c\\d\ne\nf"
+
+
+def write_events(texts):
+    buffer = io.BytesIO()
+    with ICSWriter(buffer, prodid="-//Test//zh-TW//", calname="測試日曆") as writer:
+        for i, text in enumerate(texts):
+            writer.all_day_event(
+                uid=f"uid-{i};x,y",
+                start=date(2025, 12, 1 + i % 28),
+                summary=text,
+                dtstamp=DTSTAMP,
+                description=f"書名：{text}\n查看電子書：https://www.kobo.com/tw/zh/ebook/a-b?c=1,2",
+                url="https://www.kobo.com/tw/zh/ebook/a-b",
+            )
+    return buffer.getvalue()
+
+
+def test_round_trip_through_icalendar():
+    data = write_events(TEXTS)
+    for line in physical_lines(data):
+        assert len(line) <= MAX_LINE_OCTETS
+    cal = icalendar.Calendar.from_ical(data)
+    assert str(cal["X-WR-CALNAME"]) == "測試日曆"
+    events = list(cal.walk("VEVENT"))
+    assert len(events) == len(TEXTS)
+    for i, (event, text) in enumerate(zip(events, TEXTS)):
+        expected = text.replace("\r", "")
+        assert str(event["SUMMARY"]) == expected
+        assert str(event["UID"]) == f"uid-{i};x,y"
+        assert str(event["DESCRIPTION"]) == (
+            f"書名：{expected}\n查看電子書：https://www.kobo.com/tw/zh/ebook/a-b?c=1,2")
+        assert event.decoded("DTSTART") == date(2025, 12, 1 + i % 28)
+        assert str(event["URL"]) == "https://www.kobo.com/tw/zh/ebook/a-b"
+
+
+def test_output_matches_icalendar_serialization_of_same_values():
+    data = write_events(TEXTS[:3])
+    reparsed = icalendar.Calendar.from_ical(icalendar.Calendar.from_ical(data).to_ical())
+    assert [str(e["SUMMARY"]) for e in reparsed.walk("VEVENT")] == TEXTS[:3]
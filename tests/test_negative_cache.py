@@ -0,0 +1,77 @@
+"""NegativeCache：過去週次的指數退避，以及尚未發布週次不記錄"""
+from datetime import date, datetime, timedelta
+
+from kobo_ical.negative_cache import EMPTY, FAILED, NOT_FOUND, NegativeCache, is_recent_week
+from kobo_ical.weeks import WEEKS, weekly_url
+
+NOW = datetime(2026, 3, 4, 12, 0)
+
+
+def week_url(d: date) -> str:
+    return weekly_url(*WEEKS.week_of(d))
+
+
+def test_past_week_ttl_doubles(tmp_path):
+    cache = NegativeCache(str(tmp_path / "neg.json"), base_hours=6, max_days=30)
+    url = week_url(NOW.date() - timedelta(days=60))
+    expected = [6, 12, 24, 48]
+    for hours in expected:
+        cache.record(url, NOT_FOUND, now=NOW)
+        assert datetime.fromisoformat(cache.entries[url]["until"]) == NOW + timedelta(hours=hours)
+    assert cache.is_blocked(url, now=NOW)
+    assert not cache.is_blocked(url, now=NOW + timedelta(hours=49))
+
+
+def test_ttl_is_capped(tmp_path):
+    cache = NegativeCache(str(tmp_path / "neg.json"), base_hours=6, max_days=1)
+    url = week_url(NOW.date() - timedelta(days=60))
+    for _ in range(10):
+        cache.record(url, EMPTY, now=NOW)
+    assert datetime.fromisoformat(cache.entries[url]["until"]) == NOW + timedelta(days=1)
+
+
+def test_unpublished_weeks_are_not_cached(tmp_path):
+    cache = NegativeCache(str(tmp_path / "neg.json"))
+    for d in (NOW.date(), NOW.date() + timedelta(days=14), NOW.date() - timedelta(days=1)):
+        url = week_url(d)
+        for _ in range(5):
+            cache.record(url, NOT_FOUND, now=NOW)
+            cache.record(url, EMPTY, now=NOW)
+        assert url not in cache.entries
+        assert not cache.is_blocked(url, now=NOW)
+
+
+def test_unpublished_week_failures_still_back_off(tmp_path):
+    cache = NegativeCache(str(tmp_path / "neg.json"))
+    url = week_url(NOW.date())
+    cache.record(url, FAILED, now=NOW)
+    assert cache.is_blocked(url, now=NOW)
+
+
+def test_old_entries_for_recent_weeks_do_not_block(tmp_path):
+    cache = NegativeCache(str(tmp_path / "neg.json"))
+    url = week_url(NOW.date() + timedelta(days=7))
+    cache.entries[url] = {"failures": 6, "reason": NOT_FOUND, "until": (NOW + timedelta(days=8)).isoformat()}
+    assert not cache.is_blocked(url, now=NOW)
+
+
+def test_entries_persist_and_clear(tmp_path):
+    path = str(tmp_path / "neg.json")
+    url = week_url(NOW.date() - timedelta(days=60))
+    NegativeCache(path).record(url, NOT_FOUND, now=NOW)
+    reloaded = NegativeCache(path)
+    assert reloaded.is_blocked(url, now=NOW)
+    reloaded.clear(url)
+    assert not NegativeCache(path).is_blocked(url, now=NOW)
+
+
+def test_is_recent_week():
+    today = date(2026, 3, 4)
+    assert is_recent_week(week_url(today), today)
+    # 2026-03-04 往前 7 天為 2/25：2/23 起的那週已超出，3/2 起的本週仍算近期
+    assert is_recent_week(weekly_url(2026, 10), today)
+    assert not is_recent_week(weekly_url(2026, 9), today)
+    assert not is_recent_week(week_url(today - timedelta(days=21)), today)
+    assert not is_recent_week("https://www.kobo.com/zh/blog/other", today)
+    # 52 週年份的 w53 不存在，不算尚未發布
+    assert not is_recent_week(weekly_url(2025, 53), today)
@@ -0,0 +1,91 @@
+"""串流管線各階段：順序、預先抓取上限、提前停止與去重"""
+import threading
+import time
+
+from kobo_ical.pipeline import dedup_stage, fetch_stage, map_stage, parse_stage, week_jobs
+
+
+def test_week_jobs_skips_other_urls():
+    urls = [
+        "https://www.kobo.com/zh/blog/weekly-dd99-2025-w49",
+        "https://www.kobo.com/zh/blog/something-else",
+        "https://www.kobo.com/zh/blog/weekly-dd99-2026-w1",
+    ]
+    assert list(week_jobs(urls)) == [(urls[0], 2025, 49), (urls[2], 2026, 1)]
+
+
+def test_fetch_stage_keeps_input_order():
+    def fetch(n):
+        time.sleep(0.02 if n % 2 == 0 else 0)
+        return n * 10
+
+    assert list(fetch_stage(range(6), fetch, prefetch=3)) == [(n, n * 10) for n in range(6)]
+
+
+def test_fetch_stage_limits_in_flight_work():
+    lock = threading.Lock()
+    running = 0
+    peak = 0
+
+    def fetch(n):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.01)
+        with lock:
+            running -= 1
+        return n
+
+    assert [n for n, _ in fetch_stage(range(10), fetch, prefetch=2)] == list(range(10))
+    assert peak <= 2
+
+
+def test_fetch_stage_stops_early():
+    fetched = []
+
+    def fetch(n):
+        fetched.append(n)
+        return n
+
+    stream = fetch_stage(range(100), fetch, prefetch=1)
+    assert next(stream) == (0, 0)
+    stream.close()
+    # 只有目前與預先抓取的少數工作被執行
+    assert len(fetched) <= 3
+
+
+def test_parse_and_map_stages():
+    pages = [("w1", "a b"), ("w2", ""), ("w3", "c")]
+    words = parse_stage(pages, lambda job, text: text.split())
+    assert list(map_stage(words, lambda w: None if w == "b" else w.upper())) == ["A", "C"]
+
+
+def test_dedup_stage_replace_and_order():
+    items = [("x", 3), ("y", 1), ("x", 1), ("z", 2), ("x", 5)]
+    # 保留每個鍵的最小值，依首次出現順序產出
+    kept = list(dedup_stage(items, key=lambda i: i[0], replace=lambda new, prev: new[1] < prev[1]))
+    assert kept == [("x", 1), ("y", 1), ("z", 2)]
+    ordered = list(dedup_stage(items, key=lambda i: i[0], replace=lambda new, prev: False,
+                               order=lambda i: i[1]))
+    assert ordered == [("y", 1), ("z", 2), ("x", 3)]
+
+
+def test_merge_books_consumes_a_generator(make_book):
+    from datetime import date
+
+    from kobo_ical.service import Kobo99ICalService
+
+    existing = [make_book("a", date(2025, 12, 1)), make_book("b", date(2025, 12, 2))]
+    consumed = []
+
+    def crawled():
+        for book in (make_book("b", date(2025, 12, 9)), make_book("c"), make_book("b", date(2025, 12, 3))):
+            consumed.append(book.book_url)
+            yield book
+
+    merged = Kobo99ICalService.merge_books(crawled(), existing)
+    assert consumed == []  # 直到取用結果才開始消耗爬取串流
+    result = list(merged)
+    assert [b.book_url for b in result] == [existing[0].book_url, existing[1].book_url, make_book("c").book_url]
+    assert result[1].date == date(2025, 12, 9)
@@ -0,0 +1,38 @@
+"""TokenBucket / HostRateLimiter：突發上限、補充間隔與每主機獨立"""
+import time
+
+from kobo_ical.ratelimit import HostRateLimiter, TokenBucket
+
+
+def test_burst_then_wait():
+    bucket = TokenBucket(interval=0.05, capacity=2)
+    assert bucket.acquire() == 0.0
+    assert bucket.acquire() == 0.0
+    start = time.monotonic()
+    waited = bucket.acquire()
+    assert waited > 0
+    assert time.monotonic() - start >= 0.04
+
+
+def test_zero_interval_never_waits():
+    bucket = TokenBucket(interval=0, capacity=1)
+    assert all(bucket.acquire() == 0.0 for _ in range(100))
+
+
+def test_tokens_refill_up_to_capacity():
+    bucket = TokenBucket(interval=0.01, capacity=2)
+    bucket.acquire()
+    bucket.acquire()
+    time.sleep(0.1)
+    # 閒置再久也只累積 capacity 個
+    assert bucket.acquire() == 0.0
+    assert bucket.acquire() == 0.0
+    assert bucket.acquire() > 0
+
+
+def test_hosts_have_separate_buckets():
+    limiter = HostRateLimiter(interval=10, capacity=1)
+    assert limiter.acquire("https://www.kobo.com/a") == 0.0
+    assert limiter.acquire("https://other.example/a") == 0.0
+    assert limiter.bucket("https://WWW.kobo.com/b") is limiter.bucket("https://www.kobo.com/c")
+    assert limiter.bucket("https://www.kobo.com/b") is not limiter.bucket("https://other.example/b")
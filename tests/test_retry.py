@@ -0,0 +1,157 @@
+"""RetryPolicy：退避、Retry-After、半開斷路器，以及斷路時的瀏覽器後備"""
+from datetime import datetime, timezone
+
+import httpx
+import pytest
+
+from kobo_ical import retry as retry_module
+from kobo_ical.config import Settings
+from kobo_ical.crawler import KoboCrawler
+from kobo_ical.retry import CircuitBreaker, RetryPolicy, is_retryable, parse_retry_after
+
+URL = "https://www.kobo.com/zh/blog/weekly-dd99-2026-w10"
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(retry_module.time, "monotonic", clock)
+    return clock
+
+
+@pytest.mark.parametrize("status, expected", [
+    (403, True), (408, True), (429, True), (500, True), (503, True),
+    (200, False), (304, False), (404, False), (400, False),
+])
+def test_is_retryable(status, expected):
+    assert is_retryable(status) is expected
+
+
+def test_parse_retry_after():
+    now = datetime(2026, 3, 1, 12, 0, tzinfo=timezone.utc)
+    assert parse_retry_after("120") == 120.0
+    assert parse_retry_after("Sun, 01 Mar 2026 12:00:30 GMT", now) == 30.0
+    assert parse_retry_after("Sun, 01 Mar 2026 11:00:00 GMT", now) == 0.0
+    assert parse_retry_after("") is None
+    assert parse_retry_after("soon") is None
+
+
+def test_delay(monkeypatch):
+    monkeypatch.setattr(retry_module.random, "uniform", lambda lo, hi: hi)
+    policy = RetryPolicy(attempts=4, base_delay=2.0, max_delay=5.0, max_retry_after=60.0)
+    assert [policy.delay(a) for a in range(4)] == [2.0, 4.0, 5.0, None]
+    assert policy.delay(0, retry_after=30.0) == 30.0
+    assert policy.delay(0, retry_after=61.0) is None
+
+
+def test_deadline(clock):
+    policy = RetryPolicy(base_delay=2.0, deadline_seconds=10.0)
+    assert policy.remaining() == 10.0
+    assert policy.delay(0, retry_after=9.0) == 9.0
+    assert policy.delay(0, retry_after=10.0) is None
+    assert not policy.expired()
+    clock.now += 10.0
+    assert policy.expired()
+    assert RetryPolicy().remaining() is None
+
+
+def test_breaker_opens_after_threshold(clock):
+    breaker = CircuitBreaker(threshold=3, cooldown=60.0)
+    assert not breaker.failure(500)
+    assert not breaker.failure(500)
+    assert breaker.failure(403)
+    assert breaker.opened_status == 403
+    assert breaker.is_open() and not breaker.allow()
+    # 已斷開時的失敗不算新斷開
+    assert not breaker.failure(500)
+
+
+def test_breaker_half_open_admits_one_probe(clock):
+    breaker = CircuitBreaker(threshold=1, cooldown=60.0)
+    breaker.failure(503)
+    clock.now += 60.0
+    assert not breaker.is_open()
+    assert breaker.allow()  # 試探請求
+    assert breaker.is_open()
+    assert not breaker.allow()  # 試探尚未回報，其他請求擋下
+    breaker.success()
+    assert breaker.allow() and breaker.allow()
+    assert breaker.opened_status is None
+
+
+def test_breaker_failed_probe_reopens(clock):
+    breaker = CircuitBreaker(threshold=2, cooldown=60.0)
+    breaker.failure()
+    breaker.failure()
+    clock.now += 60.0
+    assert breaker.allow()
+    assert not breaker.failure(500)
+    assert breaker.opened_status == 500
+    clock.now += 59.0
+    assert not breaker.allow()
+    clock.now += 1.0
+    assert breaker.allow()
+
+
+def test_breaker_lost_probe_expires(clock):
+    breaker = CircuitBreaker(threshold=1, cooldown=60.0)
+    breaker.failure()
+    clock.now += 60.0
+    assert breaker.allow()
+    clock.now += 59.0
+    assert not breaker.allow()
+    # 試探請求沒有回報結果（例如不可重試的狀態碼）：超過冷卻時間後放行下一個
+    clock.now += 1.0
+    assert breaker.allow()
+
+
+def test_policy_breakers_are_per_host(clock):
+    policy = RetryPolicy(breaker_threshold=1, breaker_cooldown=60.0)
+    assert policy.record_failure(URL, 403)
+    assert policy.is_open(URL) and not policy.allow(URL)
+    assert policy.opened_on_forbidden(URL)
+    other = "https://example.com/page"
+    assert policy.allow(other) and not policy.is_open(other)
+    assert not policy.opened_on_forbidden(other)
+    clock.now += 60.0
+    # is_open 不佔用試探名額
+    assert not policy.is_open(URL)
+    assert policy.allow(URL)
+    assert not policy.allow(URL)
+    policy.record_success(URL)
+    assert not policy.opened_on_forbidden(URL)
+
+
+def make_crawler(status):
+    settings = Settings(
+        retries=0, circuit_breaker_failures=1, circuit_breaker_cooldown_seconds=600,
+        rate_limit_seconds=0, cookie_store_path="", http_cache_dir="", negative_cache_path="",
+        archive_dir="", _env_file=None,
+    )
+    crawler = KoboCrawler(settings)
+    crawler.client.close()
+    crawler.client = httpx.Client(transport=httpx.MockTransport(lambda request: httpx.Response(status)))
+    crawler.fallbacks = []
+    crawler._browser_fallback = lambda url: crawler.fallbacks.append(url) or "<html></html>"
+    return crawler
+
+
+@pytest.mark.parametrize("status, fallback", [(403, True), (503, False)])
+def test_open_circuit_uses_browser_only_after_403(status, fallback):
+    with make_crawler(status) as crawler:
+        crawler._fetch_page(URL)
+        assert crawler.retry.is_open(URL)
+        crawler.fallbacks.clear()
+        html = crawler._fetch_page(URL + "1")
+        assert crawler.metrics.counters["circuit_open_skips"] == 1
+        assert crawler.metrics.counters["requests"] == 1
+        assert (html is not None) is fallback
+        assert crawler.fallbacks == ([URL + "1"] if fallback else [])
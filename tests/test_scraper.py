@@ -0,0 +1,63 @@
+"""Scraper 的解析結果快取：含 / 不含 raw_text 的結果分開保存"""
+import pytest
+
+pytest.importorskip("cloudscraper")
+
+from kobo_ical.config import Settings  # noqa: E402
+from scraper import Scraper  # noqa: E402
+
+URL = "https://www.kobo.com/zh/blog/weekly-dd99-2025-w51"
+HTML = """<html><body><article>
+<p><a href="https://www.kobo.com/tw/zh/ebook/some-book?x=1">12/20週六Kobo99選書：《一本書》</a></p>
+</article></body></html>"""
+
+
+def make_scraper(tmp_path, keep_raw_text):
+    settings = Settings(
+        http_cache_dir=str(tmp_path / "http_cache"),
+        negative_cache_path="",
+        cookie_store_path="",
+        archive_dir="",
+        _env_file=None,
+    )
+    return Scraper(settings, keep_raw_text=keep_raw_text)
+
+
+def test_raw_text_is_opt_in(tmp_path):
+    plain = make_scraper(tmp_path, False)
+    plain.http_cache.store(URL, HTML)
+    items = plain.parse_week(URL, 2025, 51, HTML)
+    assert [b["title"] for b in items] == ["一本書"]
+    assert "raw_text" not in items[0]
+
+
+def test_cached_parses_do_not_leak_between_modes(tmp_path):
+    plain = make_scraper(tmp_path, False)
+    plain.http_cache.store(URL, HTML)
+    assert "raw_text" not in plain.parse_week(URL, 2025, 51, HTML)[0]
+
+    raw = make_scraper(tmp_path, True)
+    assert "raw_text" in raw.parse_week(URL, 2025, 51, HTML)[0]
+    # 兩種結果都已快取，各自命中自己的版本
+    assert "raw_text" not in plain.parse_week(URL, 2025, 51, HTML)[0]
+    assert "raw_text" in raw.parse_week(URL, 2025, 51, HTML)[0]
+    assert plain.metrics.counters["parse_cache_hits"] == 1
+    assert raw.metrics.counters["parse_cache_hits"] == 1
+
+
+def test_results_cached_by_older_versions_are_ignored(tmp_path):
+    plain = make_scraper(tmp_path, False)
+    plain.http_cache.store(URL, HTML)
+    stale = [{"title": "一本書", "raw_text": "old"}]
+    plain.http_cache.put_parsed(URL, "scraper:v1", HTML, stale)
+    assert "raw_text" not in plain.parse_week(URL, 2025, 51, HTML)[0]
+
+
+def test_only_pages_with_books_are_archived(tmp_path):
+    settings = Settings(http_cache_dir="", negative_cache_path="", cookie_store_path="",
+                        archive_dir=str(tmp_path / "archive"), _env_file=None)
+    scraper = Scraper(settings)
+    assert scraper.parse_week(URL, 2025, 51, "<html><body>Just a moment...</body></html>") == []
+    assert scraper.archive.latest(URL) is None
+    assert scraper.parse_week(URL, 2025, 51, HTML)
+    assert scraper.archive.latest(URL) == HTML
@@ -0,0 +1,72 @@
+"""FeedServer：依 Accept-Encoding 選擇的表示、強 ETag 與 304"""
+import threading
+from http.client import HTTPConnection
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from kobo_ical.config import Settings
+from kobo_ical.server import FULL_FEED_PATH, FeedServer, RenderedFeed, etag_matches
+
+BODY = "BEGIN:VCALENDAR\r\nEND:VCALENDAR\r\n".encode("utf-8") * 50
+
+
+@pytest.fixture
+def server(tmp_path):
+    ics = tmp_path / "kobo99.ics"
+    ics.write_bytes(BODY)
+    settings = Settings(ics_path=str(ics), feed_dir="", refresh_interval_hours=24, _env_file=None)
+    feeds = FeedServer(settings, render=lambda: BODY)
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), feeds.make_handler())
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd.server_address[1]
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def get(port, headers):
+    conn = HTTPConnection("127.0.0.1", port)
+    conn.request("GET", FULL_FEED_PATH, headers=headers)
+    response = conn.getresponse()
+    body = response.read()
+    conn.close()
+    return response, body
+
+
+def test_etag_matches():
+    assert etag_matches('"a", W/"b"', ['"b"'])
+    assert etag_matches("*", ['"a"'])
+    assert not etag_matches('"a-gz"', ['"a"'])
+
+
+def test_variants_have_distinct_etags():
+    feed = RenderedFeed(BODY, "text/calendar")
+    etags = [etag for _, etag in feed.variants.values()]
+    assert len(set(etags)) == len(etags)
+    assert feed.select("gzip")[0] == "gzip"
+    assert feed.select("")[0] == "identity"
+
+
+def test_conditional_get_uses_selected_representation(server):
+    identity, body = get(server, {"Accept-Encoding": "identity"})
+    assert identity.status == 200 and body == BODY
+    gzipped, _ = get(server, {"Accept-Encoding": "gzip"})
+    assert gzipped.getheader("Content-Encoding") == "gzip"
+    identity_etag, gzip_etag = identity.getheader("ETag"), gzipped.getheader("ETag")
+    assert identity_etag != gzip_etag
+
+    response, body = get(server, {"Accept-Encoding": "gzip", "If-None-Match": gzip_etag})
+    assert response.status == 304 and body == b""
+    assert response.getheader("ETag") == gzip_etag
+
+    # 用戶端只快取了 identity，這次選出 gzip：不能以 gzip 的 ETag 回 304
+    response, body = get(server, {"Accept-Encoding": "gzip", "If-None-Match": identity_etag})
+    assert response.status == 200
+    assert response.getheader("ETag") == gzip_etag
+
+    # 快取了多份表示時，304 帶的是相符且被選出的那一份
+    response, _ = get(server, {"Accept-Encoding": "identity",
+                               "If-None-Match": f"{gzip_etag}, {identity_etag}"})
+    assert response.status == 304
+    assert response.getheader("ETag") == identity_etag
@@ -0,0 +1,40 @@
+"""Kobo99ICalService.clean_existing_data：w49 日期校正跨行程穩定"""
+import os
+import subprocess
+import sys
+from datetime import date
+
+from kobo_ical.models import BookItem
+from kobo_ical.storage import Storage
+
+W49 = "https://www.kobo.com/zh/blog/weekly-dd99-2025-w49"
+
+SCRIPT = """
+import sys
+from kobo_ical.config import Settings
+from kobo_ical.service import Kobo99ICalService
+settings = Settings(data_store=sys.argv[1], path_cleaned=sys.argv[2], event_db_path="", content_store_path="",
+                    cold_dir="", coverage_path="", ics_fragment_dir="", _env_file=None)
+for b in Kobo99ICalService(settings).clean_existing_data():
+    print(b.book_url, b.date.isoformat())
+"""
+
+
+def test_clean_existing_data_dates_are_stable_across_processes(tmp_path):
+    data = tmp_path / "events.json"
+    Storage(str(data)).save([
+        BookItem(title=f"書 {i}", book_url=f"https://www.kobo.com/tw/zh/ebook/b{i}", article_url=W49,
+                 date=date(2025, 12, 1), week=49, year=2025)
+        for i in range(10)
+    ])
+    outputs = set()
+    for seed in ("1", "2", "3"):
+        env = dict(os.environ, PYTHONHASHSEED=seed, PYTHONPATH=os.getcwd())
+        result = subprocess.run(
+            [sys.executable, "-c", SCRIPT, str(data), str(tmp_path / "cleaned.json")],
+            env=env, capture_output=True, text=True, check=True)
+        outputs.add(result.stdout)
+    assert len(outputs) == 1
+    dates = [line.split()[1] for line in outputs.pop().splitlines()]
+    assert len(dates) == 10
+    assert all("2025-12-04" <= d <= "2025-12-10" for d in dates)
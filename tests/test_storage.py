@@ -0,0 +1,112 @@
+"""Storage：JSON 快照 + 追加式 JSONL 日誌的重播、壓實與中斷復原"""
+import json
+
+from kobo_ical.storage import Storage
+
+
+def titles(items):
+    return [b.title for b in items]
+
+
+def log_lines(storage):
+    if not storage.log_path.exists():
+        return []
+    return storage.log_path.read_text(encoding="utf-8").splitlines()
+
+
+def test_plain_save_round_trip(tmp_path, make_book):
+    storage = Storage(str(tmp_path / "events.json"))
+    books = [make_book("a"), make_book("b")]
+    assert storage.save(books)
+    assert not storage.save(books)
+    loaded = Storage(str(tmp_path / "events.json")).load()
+    assert [b.record() for b in loaded] == [b.record() for b in books]
+    assert not storage.log_path.exists()
+
+
+def test_put_and_del_are_appended_and_replayed(tmp_path, make_book):
+    path = str(tmp_path / "events.json")
+    storage = Storage(path, append_log=True)
+    a, b, c = make_book("a"), make_book("b"), make_book("c")
+    storage.save([a, b])
+    # 第一次儲存：兩筆 put
+    assert [json.loads(l)["op"] for l in log_lines(storage)] == ["put", "put"]
+
+    storage.save([a.replace(title="A2"), c])
+    ops = [(r["op"], r["id"]) for r in map(json.loads, log_lines(storage))]
+    assert ops[2:] == [("del", "b"), ("put", "a"), ("put", "c")]
+
+    loaded = Storage(path, append_log=True).load()
+    assert titles(loaded) == ["A2", "書 c"]
+    assert not (tmp_path / "events.json").exists()
+
+
+def test_unchanged_save_appends_nothing(tmp_path, make_book):
+    storage = Storage(str(tmp_path / "events.json"), append_log=True)
+    books = [make_book("a"), make_book("b")]
+    assert storage.save(books)
+    assert not storage.save(books)
+    assert len(log_lines(storage)) == 2
+
+
+def test_reorder_falls_back_to_compaction(tmp_path, make_book):
+    path = str(tmp_path / "events.json")
+    storage = Storage(path, append_log=True)
+    a, b = make_book("a"), make_book("b")
+    storage.save([a, b])
+    storage.save([b, a])
+    # 日誌無法表達順序變動：改寫快照並清空日誌
+    assert not storage.log_path.exists()
+    assert titles(Storage(path, append_log=True).load()) == ["書 b", "書 a"]
+
+
+def test_duplicate_ids_fall_back_to_compaction(tmp_path, make_book):
+    path = str(tmp_path / "events.json")
+    storage = Storage(path, append_log=True)
+    a = make_book("a")
+    storage.save([a, a.replace(title="again")])
+    assert not storage.log_path.exists()
+    assert len(json.loads((tmp_path / "events.json").read_text(encoding="utf-8"))) == 2
+
+
+def test_torn_last_line_is_skipped_and_next_append_survives(tmp_path, make_book):
+    path = str(tmp_path / "events.json")
+    storage = Storage(path, append_log=True)
+    a, b = make_book("a"), make_book("b")
+    storage.save([a])
+    # 寫到一半中斷：最後一行沒有換行、JSON 不完整
+    with storage.log_path.open("a", encoding="utf-8") as f:
+        f.write('{"op": "put", "id": "b", "item": {"tit')
+
+    reopened = Storage(path, append_log=True)
+    assert titles(reopened.load()) == ["書 a"]
+    reopened.save([a, b])
+    lines = log_lines(reopened)
+    assert lines[-1].startswith('{"op": "put", "id": "b"')
+    assert titles(Storage(path, append_log=True).load()) == ["書 a", "書 b"]
+
+
+def test_compacts_after_threshold(tmp_path, make_book):
+    path = str(tmp_path / "events.json")
+    storage = Storage(path, append_log=True, compact_records=3)
+    a = make_book("a")
+    storage.save([a])
+    storage.save([a.replace(title="A1")])
+    assert len(log_lines(storage)) == 2
+    storage.save([a.replace(title="A2")])
+    # 第 3 筆紀錄達到門檻：寫出快照、刪除日誌
+    assert not storage.log_path.exists()
+    snapshot = json.loads((tmp_path / "events.json").read_text(encoding="utf-8"))
+    assert [r["title"] for r in snapshot] == ["A2"]
+    storage.save([a.replace(title="A3")])
+    assert len(log_lines(storage)) == 1
+    assert titles(Storage(path, append_log=True).load()) == ["A3"]
+
+
+def test_compact_without_items_folds_the_log(tmp_path, make_book):
+    path = str(tmp_path / "events.json")
+    storage = Storage(path, append_log=True)
+    storage.save([make_book("a"), make_book("b")])
+    Storage(path, append_log=True).compact()
+    assert not storage.log_path.exists()
+    assert titles(Storage(path).load()) == ["書 a", "書 b"]
@@ -0,0 +1,120 @@
+"""WeekCalendar：與 date.isocalendar() 逐日比對，以及 53 週年、跨年書單與無效日期"""
+from datetime import date, timedelta
+
+import pytest
+
+from kobo_ical.weeks import WEEKS, WeekCalendar, weekly_url
+
+
+def iso_weeks_in_year(year):
+    return date(year, 12, 28).isocalendar()[1]
+
+
+@pytest.mark.parametrize("year, weeks", [
+    (2015, 53), (2019, 52), (2020, 53), (2021, 52), (2024, 52), (2025, 52), (2026, 53), (2032, 53),
+])
+def test_weeks_in_year(year, weeks):
+    assert iso_weeks_in_year(year) == weeks
+    assert WEEKS.weeks_in_year(year) == weeks
+    assert WEEKS.exists(year, weeks)
+    assert not WEEKS.exists(year, weeks + 1)
+
+
+def test_week_of_and_ranges_match_isocalendar():
+    calendar = WeekCalendar(2018, 2022)
+    d = date(2018, 1, 1)
+    while d <= date(2028, 1, 7):  # 超出預建範圍的部分會自動擴充
+        y, w, weekday = d.isocalendar()
+        assert calendar.week_of(d) == (y, w)
+        assert calendar.week_range(y, w) == (d - timedelta(days=weekday - 1), d + timedelta(days=7 - weekday))
+        d += timedelta(days=1)
+
+
+@pytest.mark.parametrize("year, week, start", [
+    (2020, 53, date(2020, 12, 28)),
+    (2021, 1, date(2021, 1, 4)),
+    (2025, 1, date(2024, 12, 30)),
+    (2026, 53, date(2026, 12, 28)),
+    (2027, 1, date(2027, 1, 4)),
+    (2014, 1, date(2013, 12, 30)),  # 早於索引範圍，直接計算
+    (2025, 53, None),
+    (2025, 0, None),
+])
+def test_week_start(year, week, start):
+    assert WEEKS.week_start(year, week) == start
+
+
+@pytest.mark.parametrize("start, end, expected", [
+    ((2020, 52), (2021, 2), [(2020, 52), (2020, 53), (2021, 1), (2021, 2)]),
+    ((2026, 52), (2027, 1), [(2026, 52), (2026, 53), (2027, 1)]),
+    # 52 週年份的 w53 視為下一年第 1 週
+    ((2025, 53), (2026, 2), [(2026, 1), (2026, 2)]),
+    ((2025, 52), (2025, 53), [(2025, 52)]),
+    ((2024, 51), (2025, 1), [(2024, 51), (2024, 52), (2025, 1)]),
+    ((2025, 0), (2025, 2), [(2025, 1), (2025, 2)]),
+    ((2026, 3), (2026, 2), []),
+])
+def test_iter_weeks(start, end, expected):
+    assert list(WEEKS.iter_weeks(*start, *end)) == expected
+
+
+def test_iter_weeks_matches_isocalendar_over_years():
+    weeks = list(WEEKS.iter_weeks(2019, 1, 2027, 53))
+    expected = []
+    d = date.fromisocalendar(2019, 1, 1)
+    while d.isocalendar()[0] <= 2027:
+        expected.append(tuple(d.isocalendar())[:2])
+        d += timedelta(weeks=1)
+    assert weeks == expected
+
+
+@pytest.mark.parametrize("year, week, weeks, expected", [
+    (2020, 53, 1, (2021, 1)),
+    (2021, 1, -1, (2020, 53)),
+    (2025, 52, 1, (2026, 1)),
+    (2026, 1, -1, (2025, 52)),
+])
+def test_shift(year, week, weeks, expected):
+    assert WEEKS.shift(year, week, weeks) == expected
+
+
+def test_shift_rejects_missing_week():
+    with pytest.raises(ValueError):
+        WEEKS.shift(2025, 53, 1)
+
+
+@pytest.mark.parametrize("year, week, month, day, expected", [
+    # 週內日期
+    (2025, 49, 12, 3, date(2025, 12, 3)),
+    # 跨年書單：2025-W1 自 2024-12-30 起
+    (2025, 1, 12, 30, date(2024, 12, 30)),
+    (2025, 1, 1, 5, date(2025, 1, 5)),
+    # 2026-W53 延伸到 2027-01-03
+    (2026, 53, 12, 31, date(2026, 12, 31)),
+    (2026, 53, 1, 2, date(2027, 1, 2)),
+    # 年底文章提到下週的元旦
+    (2025, 52, 1, 1, date(2026, 1, 1)),
+    # 年初文章提到上週的日期
+    (2021, 1, 12, 31, date(2020, 12, 31)),
+    # 閏年 2/29
+    (2024, 9, 2, 29, date(2024, 2, 29)),
+    # 非閏年的 2/29：前後年份都離文章超過半年
+    (2025, 9, 2, 29, None),
+    (2023, 9, 2, 29, None),
+    # 不存在的月/日
+    (2025, 9, 2, 30, None),
+    (2025, 9, 13, 1, None),
+])
+def test_resolve_date(year, week, month, day, expected):
+    assert WEEKS.resolve_date(year, week, month, day) == expected
+
+
+def test_resolve_date_picks_nearest_year():
+    for week in range(1, WEEKS.weeks_in_year(2026) + 1):
+        start, _ = WEEKS.week_range(2026, week)
+        d = start + timedelta(days=3)
+        assert WEEKS.resolve_date(2026, week, d.month, d.day) == d
+
+
+def test_weekly_url():
+    assert weekly_url(2026, 53) == "https://www.kobo.com/zh/blog/weekly-dd99-2026-w53"